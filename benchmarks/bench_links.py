@@ -0,0 +1,72 @@
+"""
+Benchmark: cost of link detection per keystroke vs. note length.
+
+Compares the old full-buffer scan with TrackedText.retag_dirty_lines().
+Run from the project folder (needs a display):  python benchmarks/bench_links.py
+"""
+import os
+import sys
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from note_widgets import TrackedText, URL_PATTERN  # noqa: E402
+
+LINE = "some notes about the topic, see https://example.com/page for details\n"
+KEYSTROKES = 200
+
+
+def full_scan(text):
+    """The previous _detect_links: remove the tag everywhere and rescan every line."""
+    text.tag_remove("link", "1.0", tk.END)
+    line_index = 1
+    while True:
+        line_start = f"{line_index}.0"
+        if text.compare(line_start, ">=", tk.END):
+            break
+        line_text = text.get(line_start, f"{line_index}.end")
+        for match in URL_PATTERN.finditer(line_text):
+            text.tag_add("link", f"{line_index}.{match.start()}", f"{line_index}.{match.end()}")
+        line_index += 1
+
+
+def incremental_scan(text):
+    """The current _detect_links."""
+    text.retag_dirty_lines("link", URL_PATTERN)
+
+
+def time_keystrokes(text, lines, scan):
+    """Return average milliseconds per keystroke (insert one char + scan)."""
+    text.delete("1.0", tk.END)
+    text.insert("1.0", LINE * lines)
+    scan(text)  # initial full highlight is not part of the per-keystroke cost
+    middle = f"{lines // 2}.5"
+    start = time.perf_counter()
+    for _ in range(KEYSTROKES):
+        text.insert(middle, "x")
+        scan(text)
+    return (time.perf_counter() - start) * 1000 / KEYSTROKES
+
+
+def main():
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"Skipped: no display available ({e})")
+        return
+    root.withdraw()
+    text = TrackedText(root)
+
+    print(f"{'lines':>8} {'full scan ms':>14} {'incremental ms':>16}")
+    for lines in (100, 1000, 10000):
+        full = time_keystrokes(text, lines, full_scan)
+        incremental = time_keystrokes(text, lines, incremental_scan)
+        print(f"{lines:>8} {full:>14.3f} {incremental:>16.3f}")
+    # The full scan is too slow to be worth timing on very long notes
+    incremental = time_keystrokes(text, 50000, incremental_scan)
+    print(f"{50000:>8} {'-':>14} {incremental:>16.3f}")
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: memory used per Note, before and after the compact representation.
+
+Builds a synthetic corpus (100k notes by default), deserializes it note by
+note with the previous plain-attribute Note and with note_model.Note, and
+reports the bytes held per note (tracemalloc).
+Run from the project folder:  python benchmarks/bench_memory.py [notes]
+"""
+import gc
+import os
+import sys
+import json
+import random
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from note_model import Note  # noqa: E402
+
+TAG_POOL = ["Practice", "Note", "Keyword", "Tips", "Exam", "Lecture", "Lab", "Todo"]
+WORDS = "the os kernel memory process thread file system network course lecture page".split()
+
+
+class LegacyNote:
+    """The previous Note layout: plain attributes, lists and one dict per block."""
+
+    def __init__(self, title):
+        self._title = title
+        self._content_blocks = []
+        self._tags = []
+        self._link = []
+
+    @staticmethod
+    def from_dict(data):
+        n = LegacyNote(data.get("title", ""))
+        n._content_blocks = data.get("content_blocks", [])
+        n._tags = data.get("tags", [])
+        n._link = data.get("link", [])
+        return n
+
+
+def make_corpus(count, seed=1):
+    """Return serialized notes (JSON strings) of a synthetic corpus."""
+    rng = random.Random(seed)
+    corpus = []
+    for number in range(count):
+        blocks = []
+        for _ in range(rng.randint(1, 4)):
+            text = " ".join(rng.choices(WORDS, k=rng.randint(5, 30))) + "\n"
+            blocks.append({"type": "text", "content": text})
+            if rng.random() < 0.2:
+                blocks.append({"type": "image", "path": f"C:/Pictures/shot_{rng.randint(0, 999)}.png"})
+        note = {
+            "type": "note",
+            "title": f"Note {number}",
+            "content_blocks": blocks,
+            "tags": rng.sample(TAG_POOL, rng.randint(0, 4)),
+            "link": [],
+        }
+        corpus.append(json.dumps(note))
+    return corpus
+
+
+def measure(note_class, corpus):
+    """Return bytes allocated per note to hold the deserialized corpus."""
+    gc.collect()
+    tracemalloc.start()
+    notes = [note_class.from_dict(json.loads(text)) for text in corpus]
+    gc.collect()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Notes list itself is the same for both layouts; keep it out of the result
+    return (used - sys.getsizeof(notes)) / len(notes)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    corpus = make_corpus(count)
+    before = measure(LegacyNote, corpus)
+    after = measure(Note, corpus)
+    print(f"notes: {count}")
+    print(f"plain Note:   {before:8.0f} bytes/note")
+    print(f"compact Note: {after:8.0f} bytes/note  ({(1 - after / before) * 100:.0f}% less)")
+
+
+if __name__ == "__main__":
+    main()
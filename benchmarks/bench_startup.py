@@ -0,0 +1,130 @@
+"""
+Startup benchmark: how long until the NoteApp can be used, checked against a budget.
+
+Every measurement runs in a fresh Python process (nothing cached in memory):
+  - import.note          time to import note.py (all modules the app loads at start)
+  - import.note_core     time to import the headless core (command line, benchmarks)
+  - startup.first_paint  imports + NoteApp() until its window is first shown, on a generated
+                         data file of --notes notes (skipped without a display)
+It also checks that the modules deferred to first use (Pillow, webbrowser,
+cProfile/pstats) are not imported at start.
+
+Budgets (p50 in ms) are in benchmarks/startup_budget.json; a case over budget or
+an eagerly imported module gives exit code 1.
+Run from the project folder:
+  python benchmarks/bench_startup.py [--repeat 7] [--notes 1000]
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_suite import make_corpus, percentile  # noqa: E402
+
+PROJECT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_budget.json")
+DEFERRED_MODULES = ["PIL", "webbrowser", "cProfile", "pstats"]  # imported on first use only
+
+IMPORT_SCRIPT = """
+import sys, time, json
+sys.path.insert(0, {project!r})
+start = time.perf_counter()
+import {module}
+ms = (time.perf_counter() - start) * 1000
+print(json.dumps({{"ms": ms, "loaded": [name for name in {deferred!r} if name in sys.modules]}}))
+"""
+
+FIRST_PAINT_SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+sys.path.insert(0, {project!r})
+import tkinter as tk
+import note
+root = tk.Tk()
+root.withdraw()
+def painted(ms):
+    print(json.dumps({{"ms": (time.perf_counter() - start) * 1000}}))
+    root.after_idle(root.quit)
+app = note.NoteApp(master=root, on_first_paint=painted)
+root.after(20000, root.quit)  # give up if the window never shows
+root.mainloop()
+app.on_close()
+"""
+
+
+# ================== Measuring ================== #
+
+def run_script(script, cwd):
+    """Run a measuring script in a fresh interpreter; returns its JSON output."""
+    result = subprocess.run([sys.executable, "-c", script], cwd=cwd, capture_output=True, text=True, timeout=60)
+    if result.returncode != 0 or not result.stdout.strip():
+        raise RuntimeError(result.stderr.strip() or "no output")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def has_display():
+    """Return True if Tk can open a window here."""
+    try:
+        run_script("import tkinter; tkinter.Tk().destroy(); print('{}')", PROJECT)
+    except (RuntimeError, subprocess.TimeoutExpired):
+        return False
+    return True
+
+
+def measure(script, cwd, repeat):
+    """Run script repeat times; returns (p50 ms, max ms, outputs)."""
+    outputs = [run_script(script, cwd) for _ in range(repeat)]
+    timings = sorted(output["ms"] for output in outputs)
+    return round(percentile(timings, 0.5), 1), round(timings[-1], 1), outputs
+
+
+# ================== Report ================== #
+
+def main():
+    parser = argparse.ArgumentParser(description="NoteApp startup benchmark")
+    parser.add_argument("--repeat", type=int, default=7, help="fresh processes per case")
+    parser.add_argument("--notes", type=int, default=1000, help="notes in the data file of the first paint case")
+    parser.add_argument("--budget", default=BUDGET_FILE, help="budget file (p50 ms per case)")
+    args = parser.parse_args()
+
+    with open(args.budget, "r", encoding="utf-8") as file:
+        budget = json.load(file)
+
+    results = {}
+    eager = set()
+    for module in ("note", "note_core"):
+        script = IMPORT_SCRIPT.format(project=PROJECT, module=module, deferred=DEFERRED_MODULES)
+        p50, longest, outputs = measure(script, PROJECT, args.repeat)
+        results[f"import.{module}"] = (p50, longest)
+        for output in outputs:
+            eager.update(output["loaded"])
+
+    if has_display():
+        with tempfile.TemporaryDirectory() as workdir:
+            with open(os.path.join(workdir, "notes_data.json"), "w", encoding="utf-8") as file:
+                json.dump(make_corpus(args.notes), file)
+            script = FIRST_PAINT_SCRIPT.format(project=PROJECT)
+            run_script(script, workdir)  # first start writes the index files
+            p50, longest, _ = measure(script, workdir, args.repeat)
+            results["startup.first_paint"] = (p50, longest)
+    else:
+        print("No display: startup.first_paint skipped")
+
+    failed = False
+    print(f"{'case':28} {'p50 ms':>9} {'max ms':>9} {'budget':>9}")
+    for case, (p50, longest) in results.items():
+        limit = budget.get(case)
+        over = limit is not None and p50 > limit
+        failed = failed or over
+        print(f"{case:28} {p50:9.1f} {longest:9.1f} {limit if limit is not None else '-':>9}{'  OVER BUDGET' if over else ''}")
+    if eager:
+        failed = True
+        print(f"Imported at start although deferred: {', '.join(sorted(eager))}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
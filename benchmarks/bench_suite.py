@@ -0,0 +1,289 @@
+"""
+Benchmark suite: load, save, search and editor block building on synthetic corpora.
+
+For every corpus size it generates a data file (folders of notes with a varying
+number of text/image blocks and tags) and times:
+  - load          NoteLibrary.load() (what NoteApp.load_from_file runs), lazy and full
+  - save          NoteLibrary.save_to_file() (full rewrite) and one-note saves (journal)
+  - from_dict     Note.from_dict() / Note.to_dict() per note
+  - search        find_notes() (Notes search box), find_folders() (Folders search box),
+                  search_all_notes() (Search All) and find_notes() with typos (trigram index)
+  - blocks        blocks_from_dump() on editor dumps (EditorFrame.save_note_content)
+                  and editor_segments() on note blocks (EditorFrame.open_note)
+Each case reports throughput, latency percentiles (p50/p90/p99) and peak memory
+(tracemalloc, measured in one extra run so it does not slow the timings).
+
+Results are compared with benchmarks/baseline.json: a case is flagged when its
+p50 or peak memory is more than --tolerance above the baseline (exit code 1).
+Run from the project folder:
+  python benchmarks/bench_suite.py [--notes 1000 10000 ...] [--save-baseline]
+"""
+import gc
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from note_model import Note  # noqa: E402
+from note_blocks import blocks_from_dump, editor_segments, normalize_blocks  # noqa: E402
+from note_core import NoteLibrary  # noqa: E402
+from note_storage import JournalStore  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+TAG_POOL = ["Practice", "Note", "Keyword", "Tips", "Exam", "Lecture", "Lab", "Todo",
+            "Project", "Reading", "Math", "Physics", "History", "Draft", "Idea", "Review"]
+WORDS = ("the os kernel memory process thread file system network course lecture page "
+         "scheduler paging cache disk socket packet router compiler parser tree graph "
+         "matrix vector proof theorem lemma essay chapter summary deadline exam").split()
+QUERIES = ["kernel", "mem", "page", "network packet", "\"file system\"", "theorem OR lemma",
+           "cache -disk", "sched", "Practice", "xyzzy"]
+FOLDER_QUERIES = ["folder", "1", "lec", "course 7", "zz"]
+TYPO_QUERIES = ["kernl", "memroy", "schedluer note", "compilr", "Practise", "netwrok 12"]
+
+
+# ================== Synthetic corpus ================== #
+
+def make_note(rng, number):
+    """Return the data of one synthetic note (1-8 blocks, some images, 0-4 tags)."""
+    blocks = []
+    for _ in range(rng.randint(1, 8)):
+        text = " ".join(rng.choices(WORDS, k=rng.randint(5, 60))) + "\n"
+        blocks.append({"type": "text", "content": text})
+        if rng.random() < 0.15:
+            blocks.append({"type": "image", "path": f"C:/Pictures/shot_{rng.randint(0, 9999)}.png"})
+    link = []
+    if rng.random() < 0.1:
+        link.append(f"https://example.com/page/{number}")
+    return {
+        "type": "note",
+        "id": f"{number:032x}",
+        "title": f"{rng.choice(WORDS).title()} note {number}",
+        "content_blocks": blocks,
+        "tags": rng.sample(TAG_POOL, rng.randint(0, 4)),
+        "link": link,
+    }
+
+
+def make_corpus(count, seed=1):
+    """Return {folder: [note data]} with count notes in about sqrt(count) folders."""
+    rng = random.Random(seed)
+    folder_count = max(1, int(count ** 0.5) // 4)
+    folders = {f"Course {number} folder": [] for number in range(folder_count)}
+    names = list(folders)
+    for number in range(count):
+        folders[names[number % folder_count]].append(make_note(rng, number))
+    return folders
+
+
+def make_dump(data):
+    """
+    Return a tk.Text dump of a note as the editor would produce it
+    (text split into tagged runs, embedded images) and the image name -> path map.
+    """
+    dump = []
+    image_paths = {}
+    for block in data["content_blocks"]:
+        if block["type"] == "text":
+            content = block["content"]
+            # Link and search tags split the text into several runs
+            for start in range(0, len(content), 40):
+                dump.append(("text", content[start:start + 40], "1.0"))
+        elif block["type"] == "image":
+            name = f"pyimage{len(image_paths) + 1}"
+            image_paths[name] = block["path"]
+            dump.append(("image", name, "1.0"))
+    return dump, image_paths
+
+
+# ================== Measuring ================== #
+
+def percentile(sorted_values, fraction):
+    """Return the nearest-rank percentile of sorted values."""
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(timings, items):
+    """
+    Build the result of a case.
+    :param timings: Seconds of every timed call.
+    :param items: Number of items (notes, queries) handled by one call.
+    """
+    timings = sorted(timings)
+    total = sum(timings)
+    return {
+        "ops_per_s": round(items * len(timings) / total, 1) if total else None,
+        "p50_ms": round(percentile(timings, 0.50) * 1000, 4),
+        "p90_ms": round(percentile(timings, 0.90) * 1000, 4),
+        "p99_ms": round(percentile(timings, 0.99) * 1000, 4),
+    }
+
+
+def peak_memory(run):
+    """Return the peak memory (KiB) allocated while run() executes."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def run_case(run, repeat, items=1):
+    """Time run() repeat times, then measure its peak memory; returns the case result."""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    result = summarize(timings, items)
+    result["peak_kib"] = peak_memory(run)
+    return result
+
+
+def run_per_item(func, values):
+    """Time func(value) for every value; peak memory covers the whole loop."""
+    timings = []
+    perf_counter = time.perf_counter
+    for value in values:
+        start = perf_counter()
+        func(value)
+        timings.append(perf_counter() - start)
+    result = summarize(timings, 1)
+
+    def run_all():
+        for value in values:
+            func(value)
+    result["peak_kib"] = peak_memory(run_all)
+    return result
+
+
+# ================== Cases ================== #
+
+def bench_corpus(count, repeat, workdir):
+    """Run every case on a corpus of count notes; returns {case: result}."""
+    corpus = make_corpus(count)
+    path = os.path.join(workdir, f"notes_{count}.json")
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(corpus, file)
+    note_data = [data for notes in corpus.values() for data in notes]
+    sample = note_data[:min(len(note_data), 20000)]
+    results = {}
+
+    # Serialization of single notes
+    notes = [Note.from_dict(data) for data in sample]
+    results["note.from_dict"] = run_per_item(Note.from_dict, sample)
+    results["note.to_dict"] = run_per_item(Note.to_dict, notes)
+
+    # Loading (first load writes the index and search cache, as on a real first start)
+    for lazy in (True, False):
+        library = NoteLibrary(JournalStore(path), lazy_load=lazy)
+        library.load()
+        library.close()
+        name = "load.lazy" if lazy else "load.full"
+        results[name] = run_case(lambda: NoteLibrary(JournalStore(path), lazy_load=lazy).load(), repeat, count)
+
+    library = NoteLibrary(JournalStore(path))
+    library.load()
+
+    # Searching (each call is one query, like one debounced keystroke)
+    folders = library.list_folders()
+    busiest = max(folders, key=lambda folder: len(library.get_folders()[folder]))
+    results["search.find_notes"] = run_per_item(
+        lambda query: library.find_notes(busiest, query), QUERIES * repeat)
+    results["search.find_folders"] = run_per_item(library.find_folders, FOLDER_QUERIES * repeat)
+    results["search.all_notes"] = run_per_item(library.search_all_notes, QUERIES * repeat)
+    results["search.typos"] = run_per_item(
+        lambda query: library.find_notes(busiest, query), TYPO_QUERIES * repeat)
+
+    # Saving: one edited note (journal append) and a full rewrite
+    rng = random.Random(2)
+    edits = [(data["id"], make_note(rng, 0)["content_blocks"])
+             for data in rng.sample(note_data, min(len(note_data), 50 * repeat))]
+    results["save.note"] = run_per_item(
+        lambda edit: library.update_note(edit[0], content_blocks=edit[1]), edits)
+    results["save.full"] = run_case(library.save_to_file, repeat, count)
+    library.close()
+
+    # Editor: text widget dump -> content blocks
+    dumps = [make_dump(data) for data in sample[:5000]]
+    results["editor.blocks_from_dump"] = run_per_item(lambda dump: blocks_from_dump(*dump), dumps)
+    results["editor.segments"] = run_per_item(
+        lambda data: editor_segments(normalize_blocks(data["content_blocks"]), bool), sample[:5000])
+    return results
+
+
+# ================== Report ================== #
+
+def compare(results, baseline, tolerance):
+    """Return the regressions: (key, metric, baseline value, new value)."""
+    regressions = []
+    for key, result in results.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        for metric in ("p50_ms", "peak_kib"):
+            if old.get(metric) and result[metric] > old[metric] * (1 + tolerance):
+                regressions.append((key, metric, old[metric], result[metric]))
+    return regressions
+
+
+def print_results(results, baseline):
+    """Print one row per case, with the change of p50 against the baseline."""
+    print(f"{'case':40} {'ops/s':>12} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'peak KiB':>11} {'vs base':>8}")
+    for key, result in results.items():
+        old = baseline.get(key)
+        change = ""
+        if old and old.get("p50_ms"):
+            change = f"{(result['p50_ms'] / old['p50_ms'] - 1) * 100:+.0f}%"
+        print(f"{key:40} {result['ops_per_s'] or 0:12,.0f} {result['p50_ms']:10.3f} {result['p90_ms']:10.3f} "
+              f"{result['p99_ms']:10.3f} {result['peak_kib']:11,.0f} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NoteApp benchmark suite")
+    parser.add_argument("--notes", type=int, nargs="+", default=[1000, 10000],
+                        help="corpus sizes (e.g. 1000 10000 100000 1000000)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each whole-corpus case")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed slowdown / memory growth before flagging (0.5 = 50%%)")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for count in args.notes:
+            for case, result in bench_corpus(count, args.repeat, workdir).items():
+                results[f"{case}@{count}"] = result
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for key, metric, old, new in regressions:
+        print(f"REGRESSION {key} {metric}: {old} -> {new}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
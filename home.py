@@ -1,19 +1,38 @@
 import tkinter as tk
 from tkinter import messagebox
 import subprocess
+import importlib
+import time
+import sys
 import os
 
 # ==================== Home UI ==================== #
+
+# Projects that can run inside the launcher process: file -> (module, start function).
+# The start function takes master= and on_first_paint= and returns the app, or None
+# if the project already runs elsewhere (it then brings that window to the front).
+HOSTED_PROJECTS = {
+    "note.py": ("note", "open_app"),
+}
+PREWARM_MS = 300  # import hosted projects this long after the home window is shown
+
+
 class HomeUI:
     """
     Main home screen with buttons to open different projects.
     Acts as a launcher for multiple Python apps.
+    - Hosted projects (HOSTED_PROJECTS) open in this process: Python, Tk and
+      their imports are already loaded, so they show up much faster
+    - A project that is already open is brought to the front, not opened twice
+    - The status line shows the time from the click to the first paint
+    Other files still start as a separate Python process.
     """
 
     def __init__(self, root):
         self.root = root
         self.root.title("Home UI")
         self.root.geometry("400x300")
+        self._running = {}  # file name -> hosted app
 
         # Title label
         title_label = tk.Label(root, text="Welcome to Our Projects", font=("Arial", 16, "bold"))
@@ -29,6 +48,17 @@ class HomeUI:
         btn3 = tk.Button(root, text="Project 3", font=("Arial", 12), width=20, command=self.open_project3)
         btn3.pack(pady=10)
 
+        # Launch timings
+        self.status_var = tk.StringVar(value="")
+        status_label = tk.Label(root, textvariable=self.status_var, fg="gray")
+        status_label.pack(side="bottom", pady=5)
+
+        # Close hosted projects properly (they save their data) before the launcher
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Import hosted projects while the user looks at the home screen
+        self.root.after(PREWARM_MS, self.prewarm)
+
     def open_project1(self):
         """Open Notes Organizer project."""
         self.run_file("note.py")   # change file name if needed
@@ -41,15 +71,60 @@ class HomeUI:
         """Open Project 3."""
         self.run_file("project3.py")
 
+    def prewarm(self):
+        """Import the hosted projects now so the first click does not wait for it."""
+        for module_name, _ in HOSTED_PROJECTS.values():
+            try:
+                importlib.import_module(module_name)
+            except Exception:
+                pass  # reported when the project is opened
+
     def run_file(self, filename):
-        """Run another Python file as a subprocess."""
+        """Open a project: in this process if it can be hosted, otherwise as a subprocess."""
         base_path = os.path.dirname(os.path.abspath(__file__))  # folder of home.py
         filepath = os.path.join(base_path, filename)
 
-        if os.path.exists(filepath):
-            subprocess.Popen(["python", filepath])
-        else:
+        if not os.path.exists(filepath):
             messagebox.showerror("Error", f"{filename} not found!\nChecked path: {filepath}")
+            return
+        if filename in HOSTED_PROJECTS:
+            self.host_project(filename)
+        else:
+            subprocess.Popen([sys.executable, filepath])
+            self.status_var.set(f"{filename}: started as a separate process")
+
+    def host_project(self, filename):
+        """Open a hosted project in this process (or bring its open window to the front)."""
+        app = self._running.get(filename)
+        if app is not None and app.is_open():
+            app.bring_to_front()
+            self.status_var.set(f"{filename}: already open")
+            return
+
+        clicked = time.perf_counter()
+
+        def on_first_paint(ms):
+            total_ms = (time.perf_counter() - clicked) * 1000
+            self.status_var.set(f"{filename}: first paint after {total_ms:.0f} ms")
+
+        module_name, start_name = HOSTED_PROJECTS[filename]
+        try:
+            start = getattr(importlib.import_module(module_name), start_name)
+            app = start(master=self.root, on_first_paint=on_first_paint)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to open {filename}: {e}")
+            return
+        if app is None:
+            self.status_var.set(f"{filename}: already running, brought to the front")
+            return
+        self._running[filename] = app
+
+    def on_close(self):
+        """Close the hosted projects (letting them save), then the launcher."""
+        for app in self._running.values():
+            if app.is_open():
+                app.on_close()
+        self.root.destroy()
 
 # Run the app
 if __name__ == "__main__":
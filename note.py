@@ -1,93 +1,21 @@
 import tkinter as tk
 from tkinter import simpledialog, messagebox
 from tkinter import filedialog
-from PIL import Image, ImageTk  # use to setup the picture
-import json
-import webbrowser
 import os
-import re
-
-# ================== Note Data Classes ================== #
-
-class Note:
-    """
-    Represents a single note object.
-    Each note has:
-      - title (string)
-      - content blocks (text, images, links)
-      - tags (list of labels for categorization)
-      - links (list of external references/URLs)
-    """
-
-    def __init__(self, title):
-        """
-        Initialize a note with a given title.
-        Content blocks, tags, and links are initialized as empty lists.
-        """
-        self._title = title   # Note title (private)
-        self._content_blocks = []  # Stores text, images, links in structured format
-        self._tags = []  # Stores tags for categorization
-        self._link = []  # Stores note-specific links
-
-    # ===== Encapsulation: getter and setter methods ===== #
-
-    def get_title(self):
-        """Return the note title."""
-        return self._title
-    
-    def set_title(self, title):
-        """Update the note title."""
-        self._title = title
-
-    def get_content_blocks(self):
-        """Return all content blocks (text, images, links)."""
-        return self._content_blocks
-
-    def set_content_blocks(self, blocks):
-        """Update content blocks for the note."""
-        self._content_blocks = blocks
-
-    def get_tags(self):
-        """Return the list of tags associated with the note."""
-        return self._tags
-
-    def set_tags(self, tags):
-        """Update the note's tags."""
-        self._tags = tags
-
-    def get_link(self):
-        """Return stored links for the note."""
-        return self._link
-
-    def set_link(self, link):
-        """Update the note's links."""
-        self._link = link
-
-    # ===== Polymorphism support (serialization) ===== #
-    def to_dict(self):
-        """
-        Convert note object into a dictionary for JSON storage.
-        Includes title, content blocks, tags, and links.
-        """
-        return {
-            "type": "note",
-            "title": self._title,
-            "content_blocks": self._content_blocks,
-            "tags": self._tags,
-            "link": self._link
-        }
-
-    @staticmethod
-    def from_dict(data):
-        """
-        Create a Note object from dictionary data (deserialization).
-        Ensures backward compatibility with missing fields.
-        """
-        n = Note(data.get("title", ""))
-        n.set_content_blocks(data.get("content_blocks", []))
-        n.set_tags(data.get("tags", []))
-        n.set_link(data.get("link", []))   
-        return n
+import time
+from note_core import NoteLibrary
+from note_storage import WriteBehind, data_folder, load_settings
+from note_search import SearchScheduler
+from note_widgets import VirtualList, TrackedText, DebugOverlay, URL_PATTERN
+from note_images import ImageLoader, ThumbnailCache, make_placeholder
+from note_blocks import blocks_from_dump, normalize_blocks, editor_segments, split_text
+from note_profile import PROFILER, TkCallCounter, debug_enabled
+from note_instance import SingleInstance
+
+LOAD_STEP_MS = 30  # time spent loading notes between two UI updates
+EDITOR_CHUNK_CHARS = 20000  # text inserted into the editor at once (about a few screenfuls)
+EDITOR_CHUNK_IMAGES = 20  # images inserted into the editor at once
+LOAD_MARK = "loading"  # editor mark where the rest of a loading note goes
 
 
 class NoteApp:
@@ -95,51 +23,86 @@ class NoteApp:
     Main application class for the NoteApp.
     Handles:
       - Initialization of the Tkinter root window
-      - Folder and note data management
+      - Folder and note data management (through NoteLibrary, see note_core.py)
       - File persistence (loading/saving notes)
       - Frame switching between Folder, Note, and Editor views
     """
 
-    def __init__(self):
+    def __init__(self, lazy_load=True, master=None, instance=None, on_first_paint=None):
         """
         Initialize the NoteApp:
           - Creates Tkinter root window
           - Loads stored data from file (if available)
+            (with lazy_load, note bodies are only read when a note is opened)
           - Sets up frames for folder, note, and editor
           - Starts the main Tkinter event loop
+        Files are written by a background thread; closing the window waits for it.
+        :param master: Tk window of a launcher hosting the app (see home.py): the app
+            opens as a Toplevel of it and uses its event loop.
+        :param instance: SingleInstance held for the data folder (released on close).
+        :param on_first_paint: Called with the ms from start to the first shown window.
         """
-        self.root = tk.Tk()
+        started = time.perf_counter()
+        self._hosted = master is not None
+        self.root = tk.Toplevel(master) if self._hosted else tk.Tk()
         self.root.title("Note APP")
         self.root.geometry("500x700")
+        if debug_enabled():
+            # Count Tk calls per operation (widgets share the root's interpreter)
+            self.root.tk = TkCallCounter(self.root.tk, PROFILER)
 
         # Private-like attributes (encapsulation applied via getters/setters)
-        self._folders = {}  # Stores folders and their notes
         self._current_folder = None  # Tracks currently selected folder
-        self._current_note_index = None  # Tracks index of selected note
+        self._current_note_id = None  # Tracks id of selected note
+        # Folders, notes, search and saving (writes happen off the UI thread)
+        try:
+            self._library = NoteLibrary(
+                lazy_load=lazy_load,
+                make_writer=lambda store, on_error: WriteBehind(store, self.root, on_error=on_error),
+                on_error=self._show_save_error)
+        except ImportError as e:
+            # e.g. notes_data.msgpack without msgpack: never open an empty app over the data
+            if not self._hosted:
+                messagebox.showerror("Error", f"Failed to load notes: {e}")
+            self.root.destroy()
+            raise
+
+        # Frame setup (main screens of the app): each one is built the first time it
+        # is used, so only the folder list is built before the window shows up
+        self._frames = {}  # frame name -> frame built so far
+
+        # Start with folder view
+        self.show_folder_frame()
 
-        # Load data from file on startup
+        # Load data from file on startup (the folder list fills while the file is read)
+        self._loader = None
         self.load_from_file()
 
-        # Frame setup (three main screens of the app)
-        self.folder_frame = FolderFrame(self.root, self)   # Folder selection UI
-        self.editor_frame = EditorFrame(self.root, self)   # Note editor UI
-        self.note_frame = NoteFrame(self.root, self)       # Notes list UI
+        # Write queued saves before the window closes
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
-        # Start with folder view
-        self.show_folder_frame()
+        # Timings of recent operations (slow ones highlighted), cProfile and log export
+        self.debug_overlay = None
+        self.root.bind("<F12>", lambda event: self.show_debug_overlay())
 
-        # Run the Tkinter event loop
-        self.root.mainloop()
+        # Another launch asks this window to come to the front instead of opening a copy
+        self._instance = instance
+        if instance is not None:
+            instance.listen(self.root, self.bring_to_front)
 
-    # ===== Getter / Setter methods (Encapsulation) ===== #
+        # Launch-to-first-paint time (when the window is first shown)
+        self._first_paint = (started, on_first_paint)
+        self.root.bind("<Map>", self._on_first_paint, add="+")
 
-    def get_folders(self):
-        """Return all folders with their notes."""
-        return self._folders
+        # Run the Tkinter event loop (a hosting launcher runs its own)
+        if not self._hosted:
+            self.root.mainloop()
 
-    def set_folders(self, folders):
-        """Update the folder collection."""
-        self._folders = folders
+    # ===== Getter / Setter methods (Encapsulation) ===== #
+
+    def get_library(self):
+        """Return the notes library (all folders and notes)."""
+        return self._library
 
     def get_current_folder(self):
         """Return the currently selected folder name."""
@@ -149,53 +112,158 @@ class NoteApp:
         """Set the currently selected folder name."""
         self._current_folder = folder
 
-    def get_current_note_index(self):
-        """Return the index of the currently selected note."""
-        return self._current_note_index
+    def get_current_note_id(self):
+        """Return the id of the currently selected note."""
+        return self._current_note_id
 
-    def set_current_note_index(self, index):
-        """Set the index of the currently selected note."""
-        self._current_note_index = index
+    def set_current_note_id(self, note_id):
+        """Set the id of the currently selected note."""
+        self._current_note_id = note_id
 
     # ================== File handling ================== #
 
     def load_from_file(self):
         """
-        Load data from 'notes_data.json'.
-        - Deserializes saved notes into Note objects.
+        Load data from 'notes_data.json' (or the configured storage) and its change journal.
+        - The file is read note by note in short steps between UI events, so the
+          window and the first folders appear before the whole file is parsed
         - Handles file corruption with error message.
         """
-        if os.path.exists("notes_data.json"):
-            try:
-                with open("notes_data.json", "r") as file:
-                    raw_data = json.load(file)
-                    # Reconstruct folders and notes from saved JSON
-                    self._folders = {
-                        folder: [Note.from_dict(note) for note in notes]
-                        for folder, notes in raw_data.items()
-                    }
-            except json.JSONDecodeError:
-                # Handle corrupted JSON file gracefully
-                messagebox.showerror("Error", "Failed to load data. The file may be corrupted.")
-                self.folders = {}
-
-    def save_to_file(self):
-        """
-        Save notes data into 'notes_data.json'.
-        - Converts Note objects into dictionary form for JSON.
-        - Handles file I/O errors gracefully.
-        """
-        try: 
-            with open("notes_data.json", "w") as file:
-                # Convert notes into serializable dict format
-                folders_to_save = {
-                    folder: [note.to_dict() for note in notes]
-                    for folder, notes in self._folders.items()
-                }
-                json.dump(folders_to_save, file, indent=4)
-        except (OSError, PermissionError) as e:
-            # Handle write permission issues or OS errors
-            messagebox.showerror("Error", f"Failed to save notes: {e}")
+        self._loader = self._library.load_progressively()
+        self.folder_frame.show_loading(0.0)
+        self.root.after_idle(self._load_step)
+
+    def _load_step(self):
+        """Load notes for up to LOAD_STEP_MS, then let the UI update."""
+        if self._loader is None:
+            return
+        deadline = time.perf_counter() + LOAD_STEP_MS / 1000
+        progress = 0.0
+        finished = False
+        try:
+            with PROFILER.span("load_step"):
+                for progress in self._loader:
+                    if time.perf_counter() >= deadline:
+                        break
+                else:
+                    finished = True
+        except ValueError:
+            # Handle corrupted data file (JSON or msgpack) gracefully
+            messagebox.showerror("Error", "Failed to load data. The file may be corrupted.")
+            finished = True
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to load notes: {e}")
+            finished = True
+
+        if finished:
+            self._loader = None
+            self.folder_frame.show_loading(None)
+        else:
+            self.folder_frame.show_loading(progress)
+            self.root.after(1, self._load_step)
+
+    def is_loading(self):
+        """Return True while notes are still being loaded."""
+        return self._loader is not None
+
+    def _show_save_error(self, error):
+        """Report a failed background write."""
+        # Handle write permission issues or OS errors
+        messagebox.showerror("Error", f"Failed to save notes: {error}")
+
+    def on_close(self):
+        """Write every queued change, then close the window."""
+        if self._loader is not None:
+            self._loader.close()  # stop loading; nothing was changed yet
+            self._loader = None
+        if "editor_frame" in self._frames:
+            self.editor_frame.shutdown()
+        self._library.close()
+        if self._instance is not None:
+            self._instance.release(self.root)
+        self.root.destroy()
+
+    def is_open(self):
+        """Return True until the window has been closed."""
+        try:
+            return bool(self.root.winfo_exists())
+        except tk.TclError:
+            return False
+
+    def bring_to_front(self):
+        """Show the window above the others (a second launch was requested)."""
+        self.root.deiconify()
+        self.root.lift()
+        self.root.focus_force()
+
+    def _on_first_paint(self, event):
+        """Report the time from start to the first time the window is shown."""
+        if event.widget is not self.root or self._first_paint is None:
+            return
+        started, on_first_paint = self._first_paint
+        self._first_paint = None
+        ms = (time.perf_counter() - started) * 1000
+        PROFILER.record("launch.first_paint", ms)
+        if on_first_paint is not None:
+            on_first_paint(ms)
+
+    def open_note_in_editor(self, note_id):
+        """Open a note of any folder in the editor."""
+        folder = self._library.get_note_folder(note_id)
+        if folder is None:
+            return  # note was deleted meanwhile
+        self.set_current_folder(folder)
+        self.note_frame.refresh_note_list()
+        self.editor_frame.open_note(note_id)
+
+    def show_debug_overlay(self):
+        """Show the debug overlay (created on first use)."""
+        if self.debug_overlay is None:
+            self.debug_overlay = DebugOverlay(self.root, PROFILER)
+        else:
+            self.debug_overlay.show()
+
+    # ================ Frames (built on first use) ================= #
+
+    def _get_frame(self, name):
+        """Return a frame of FRAME_CLASSES, building it on first use."""
+        frame = self._frames.get(name)
+        if frame is None:
+            with PROFILER.span(f"build.{name}"):
+                frame = self._frames[name] = FRAME_CLASSES[name](self.root, self)
+        return frame
+
+    @property
+    def folder_frame(self):
+        """Folder selection UI."""
+        return self._get_frame("folder_frame")
+
+    @property
+    def note_frame(self):
+        """Notes list UI."""
+        return self._get_frame("note_frame")
+
+    @property
+    def editor_frame(self):
+        """Note editor UI."""
+        return self._get_frame("editor_frame")
+
+    @property
+    def search_frame(self):
+        """Search across all folders."""
+        return self._get_frame("search_frame")
+
+    @property
+    def tag_frame(self):
+        """Filter notes by tags."""
+        return self._get_frame("tag_frame")
+
+    def _show_only(self, frame):
+        """Hide every other frame built so far and show frame."""
+        for other in self._frames.values():
+            if other is not frame:
+                other.hide()
+        frame.show()
 
     # ================ Frame switching ================= #
 
@@ -206,9 +274,7 @@ class NoteApp:
         - Refreshes folder display
         """
         self.root.config(menu=self.folder_frame.menubar)  # Use folder menu
-        self.note_frame.hide()
-        self.editor_frame.hide()
-        self.folder_frame.show()
+        self._show_only(self.folder_frame)
         self.folder_frame.refresh_folder_list()
 
     def show_note_frame(self):
@@ -218,9 +284,7 @@ class NoteApp:
         - Updates folder title in UI
         """
         self.root.config(menu="")  # Remove menu bar in note view
-        self.note_frame.show()
-        self.editor_frame.hide()
-        self.folder_frame.hide()
+        self._show_only(self.note_frame)
         
         # Update folder title display if available
         if self.get_current_folder():
@@ -235,11 +299,43 @@ class NoteApp:
         - Enables editing of the selected note
         - Updates back button with folder name for easy navigation
         """
-        self.folder_frame.hide()
-        self.note_frame.hide()
-        self.editor_frame.show()
+        self._show_only(self.editor_frame)
         self.editor_frame.back_btn_editor.config(text=f"← {self.get_current_folder()}")
 
+    def show_search_frame(self):
+        """
+        Switch to the global search frame.
+        - Searches notes of every folder at once
+        """
+        self.root.config(menu="")
+        self._show_only(self.search_frame)
+        self.search_frame.search_entry_all.focus_set()
+
+    def show_tag_frame(self):
+        """
+        Switch to the tag frame.
+        - Lists all tags with their note counts
+        """
+        self.root.config(menu="")
+        self._show_only(self.tag_frame)
+        self.tag_frame.refresh_tag_list()
+
+
+# ==================== Helpers ======================= #
+
+def show_search_status(label, results, milliseconds):
+    """Show the result count and search time of a live search in a label."""
+    if results is None:
+        label.config(text="")
+    else:
+        label.config(text=f"{len(results)} result(s) in {milliseconds:.1f} ms")
+
+
+def note_display_text(note):
+    """Return the text shown for a note in lists: title followed by [tags]."""
+    tags_text = f" [{'] ['.join(note.get_tags())}]" if note.get_tags() else ""
+    return f"{note.get_title()}{tags_text}"
+
 
 # ==================== Base Frame ======================= #
 
@@ -260,6 +356,7 @@ class BaseFrame(tk.Frame):
         """
         super().__init__(parent)
         self.app = app  # Store reference to main app for communication
+        self.library = app.get_library()  # Notes data (headless core)
 
     def show(self):
         """
@@ -291,6 +388,8 @@ class FolderFrame(BaseFrame):
         self.menubar = tk.Menu(self.app.root)
         self.menubar.add_command(label="Add Folder", command=self.add_folder)
         self.menubar.add_command(label="Delete Folder", command=self.delete_folder)
+        self.menubar.add_command(label="Search All Notes", command=self.app.show_search_frame)
+        self.menubar.add_command(label="Tags", command=self.app.show_tag_frame)
         self.app.root.config(menu=self.menubar) 
 
         # Top frame (search bar + button)
@@ -300,12 +399,23 @@ class FolderFrame(BaseFrame):
 
         self.search_entry = tk.Entry(self.top_frame, font=('Arial', 10))
         self.search_entry.grid(row=0, column=0, sticky="nsew", padx=(10, 0), pady=5)
-        self.search_entry.bind("<KeyRelease>", lambda event: self.search_folder())  # real-time search
         self.search_button = tk.Button(self.top_frame, text="Search", command=self.search_folder)
         self.search_button.grid(row=0, column=1, sticky="nsew", padx=(0, 10), pady=5)
 
+        # Search status (result count and search time)
+        self.search_status = tk.Label(self.top_frame, text="", font=('Arial', 8), fg="gray")
+        self.search_status.grid(row=1, column=0, columnspan=2, sticky="w", padx=10)
+
+        # Real-time search: coalesced keystrokes, refined from previous results
+        self.search_scheduler = SearchScheduler(
+            self.search_entry, self.find_folders, self.show_folder_results,
+            on_latency=lambda query, results, ms: show_search_status(self.search_status, results, ms))
+        self.search_entry.bind("<KeyRelease>", self.search_scheduler.on_key)
+
         # Folder list
-        self.folder_listbox = tk.Listbox(self, font=('Arial', 10))
+        # Folder list (only visible rows are drawn)
+        self.folder_listbox = VirtualList(self, font=('Arial', 10))
+        self.folder_filtered = False  # True while showing search results
         self.folder_listbox.pack(fill="both", expand=True, padx=10, pady=(5, 10))
         self.folder_listbox.bind("<Double-Button-1>", self.enter_folder)  # open folder
 
@@ -318,20 +428,23 @@ class FolderFrame(BaseFrame):
     def rename_folder(self):
         """Rename selected folder."""
         selection = self.folder_listbox.curselection()
-        if not selection:
+        if not selection or self.app.is_loading():
             return
         old_name = self.folder_listbox.get(selection[0])
         new_name = simpledialog.askstring("Rename Folder", "Enter new name:", initialvalue=old_name)
         if new_name and new_name != old_name:
-            folders = self.app.get_folders()
-            if new_name in folders:
-                messagebox.showerror("Error", "Folder name already exists!")
+            try:
+                self.library.rename_folder(old_name, new_name)
+            except ValueError as e:
+                messagebox.showerror("Error", str(e))
                 return
-            # Move notes to new folder name
-            folders[new_name] = folders.pop(old_name)
-            self.app.set_folders(folders)
-            self.app.save_to_file()
-            self.refresh_folder_list()
+            if self.folder_filtered:
+                self.refresh_folder_list()
+            else:
+                # Renamed folder moves to the end, like in the folder dictionary
+                self.folder_listbox.move(selection[0], tk.END)
+                self.folder_listbox.set(self.folder_listbox.size() - 1, new_name)
+                self.search_scheduler.reset()
 
     def show_folder_menu(self, event):
         """Show right-click menu for folder actions."""
@@ -350,55 +463,84 @@ class FolderFrame(BaseFrame):
         if not selection:
             messagebox.showwarning("Delete Folder", "Please select a folder to delete.")
             return
+        if self.app.is_loading():
+            return
         
         folder_name = self.folder_listbox.get(selection[0])
         confirm = messagebox.askyesno("Confirm Delete", f"Delete folder '{folder_name}' and all its notes?")
         if confirm:
-            folders = self.app.get_folders()
-            del folders[folder_name]
-            self.app.set_folders(folders)
-            self.app.save_to_file()
-            self.refresh_folder_list()
+            self.library.delete_folder(folder_name)
+            if self.folder_filtered:
+                self.refresh_folder_list()
+            else:
+                self.folder_listbox.delete(selection[0])
+                self.search_scheduler.reset()
 
     def add_folder(self):
         """Add new folder (with validation)."""
+        if self.app.is_loading():
+            return
         folderName = simpledialog.askstring("New Folder", "Folder Name: ", parent=self.app.root)
         if not folderName or not folderName.strip():
             messagebox.showwarning("Warning", "Folder name cannot be empty.")
             return
-        folderName = folderName.strip()
+        try:
+            folderName = self.library.add_folder(folderName)  # create empty folder
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
 
-        folders = self.app.get_folders()
-        if folderName in folders:
-            messagebox.showerror("Error", "Folder name already exists!")
+        if self.folder_filtered:
+            self.refresh_folder_list()
+        else:
+            self.folder_listbox.insert(tk.END, folderName)
+            self.search_scheduler.reset()
+
+    def show_loading(self, progress):
+        """
+        Show the loading progress (0.0-1.0, None once loading has finished).
+        Folders read so far are listed right away; actions that change or open
+        notes are disabled until everything is loaded.
+        """
+        state = "normal" if progress is None else "disabled"
+        for label in ("Add Folder", "Delete Folder", "Search All Notes", "Tags"):
+            self.menubar.entryconfig(label, state=state)
+        if progress is None:
+            self.folder_title_label.config(text="📂 Folders")
+            self.refresh_folder_list()
             return
-        
-        folders[folderName] = []  # create empty folder
-        self.app.set_folders(folders)
-        self.refresh_folder_list()
-        self.app.save_to_file()
+        self.folder_title_label.config(text=f"📂 Folders (loading {progress:.0%})")
+        if not self.folder_filtered and self.folder_listbox.size() != len(self.library.get_folders()):
+            self.refresh_folder_list()
 
+    @PROFILER.timed("refresh_folder_list")
     def refresh_folder_list(self, folders=None):
         """Update folder listbox display."""
-        self.folder_listbox.delete(0, tk.END)
-        show_folders = folders if folders is not None else self.app.get_folders()
-        for folder in show_folders:
-            self.folder_listbox.insert(tk.END, folder)
+        if folders is None:
+            self.search_scheduler.reset()  # folders may have changed
+        self.folder_filtered = folders is not None
+        show_folders = folders if folders is not None else self.library.list_folders()
+        self.folder_listbox.set_items(show_folders)
 
     def search_folder(self):
-        """Search folder by keyword (real-time)."""
-        keyword = self.search_entry.get().strip()
-        folders = self.app.get_folders()
-        if not keyword:
-            self.refresh_folder_list()
-            return
-        result = [f for f in folders if keyword.lower() in f.lower()]
+        """Search folder by keyword (Search button)."""
+        self.search_scheduler.run_now(force=True)
+
+    def find_folders(self, keyword, candidates=None):
+        """
+        Return folder names containing keyword (only among candidates if given),
+        or else the names matching it with a few typos.
+        """
+        return self.library.find_folders(keyword, candidates)
+
+    def show_folder_results(self, keyword, result):
+        """Show search results (all folders when result is None)."""
         self.refresh_folder_list(result)
 
     def enter_folder(self, event):
         """Enter selected folder and show its notes."""
         selection = self.folder_listbox.curselection()
-        if selection:
+        if selection and not self.app.is_loading():
             folder_name = self.folder_listbox.get(selection[0])
             self.app.set_current_folder(folder_name)
             self.app.note_frame.refresh_note_list()
@@ -437,15 +579,27 @@ class NoteFrame(BaseFrame):
         # Search bar and button
         self.search_entry_note = tk.Entry(self.top_note, font=('Arial', 10))
         self.search_entry_note.grid(row=1, column=0, sticky="nsew", padx=(10, 0), pady=(10, 5))
-        self.search_entry_note.bind("<KeyRelease>", lambda event: self.search_note())  # real-time search
 
         self.search_button_note = tk.Button(self.top_note, text="Search", command=self.search_note)
         self.search_button_note.grid(row=1, column=1, sticky="nsew", padx=(0, 10), pady=(10, 5))
 
+        # Search status (result count and search time)
+        self.search_status_note = tk.Label(self.top_note, text="", font=('Arial', 8), fg="gray")
+        self.search_status_note.grid(row=2, column=0, columnspan=2, sticky="w", padx=10)
+
+        # Real-time search: coalesced keystrokes, refined from previous results
+        self.search_scheduler = SearchScheduler(
+            self.search_entry_note, self.find_notes, self.show_note_results,
+            on_latency=lambda query, results, ms: show_search_status(self.search_status_note, results, ms))
+        self.search_entry_note.bind("<KeyRelease>", self.search_scheduler.on_key)
+
         # List of notes
-        self.note_list = tk.Listbox(self, font=('Arial', 10))
+        # List of notes (only visible rows are drawn)
+        self.note_list = VirtualList(self, font=('Arial', 10))
+        self.notes_filtered = False  # True while showing search results
+        self.shown_note_ids = []  # id of the note shown in every row
         self.note_list.pack(fill="both", expand=True, padx=10, pady=(0, 10))
-        self.note_list.bind("<Double-Button-1>", self.app.editor_frame.open_note_editor)  # open note editor
+        self.note_list.bind("<Double-Button-1>", lambda event: self.app.editor_frame.open_note_editor(event))  # open note editor
 
         # Right-click menu
         self.note_menu = tk.Menu(self.note_list, tearoff=0)
@@ -463,6 +617,10 @@ class NoteFrame(BaseFrame):
         finally:
             self.note_menu.grab_release()
 
+    def get_note_id_at(self, row):
+        """Return the id of the note shown in a row (also while filtered)."""
+        return self.shown_note_ids[row]
+
     def delete_note(self):
         """Delete selected note with confirmation."""
         selection = self.note_list.curselection()
@@ -470,66 +628,223 @@ class NoteFrame(BaseFrame):
             messagebox.showwarning("Delete Note", "Please select a note to delete.")
             return
     
-        index = selection[0]
-        current_folder = self.app.get_current_folder()
-        folders = self.app.get_folders()
-        note = folders[current_folder][index]
+        row = selection[0]
+        note_id = self.get_note_id_at(row)
+        note = self.library.get_note(note_id)
 
         confirm = messagebox.askyesno("Confirm Delete", f"Delete note '{note.get_title()}'?")
         if confirm:
-            del folders[current_folder][index]
-            self.app.set_folders(folders)
-            self.app.save_to_file()
-            self.refresh_note_list()
+            self.library.delete_note(note_id)
+            # The row maps to the note, so filtered results stay in place too
+            del self.shown_note_ids[row]
+            self.note_list.delete(row)
+            self.search_scheduler.reset()
 
     def add_note(self):
         """Add a new note to the current folder."""
         current_folder = self.app.get_current_folder()
         note_title = simpledialog.askstring("New Note", f"Note for {current_folder}:", parent=self.app.root)
         if note_title:
-            folders = self.app.get_folders()
-            new_note = Note(note_title) 
-            folders[current_folder].append(new_note)
-            self.app.set_folders(folders)
-            self.refresh_note_list()
-            self.app.save_to_file()
-
+            new_note = self.library.add_note(current_folder, note_title)
+            if self.notes_filtered:
+                self.refresh_note_list()
+            else:
+                self.shown_note_ids.append(new_note.get_id())
+                self.note_list.insert(tk.END, note_display_text(new_note))
+                self.search_scheduler.reset()
+
+    @PROFILER.timed("refresh_note_list")
     def refresh_note_list(self, notes=None, highlight_keyword=None):
         """Refresh note list. Optionally highlight search results."""
-        self.note_list.delete(0, tk.END)
+        if notes is None:
+            self.search_scheduler.reset()  # notes or folder may have changed
+        self.notes_filtered = notes is not None
         current_folder = self.app.get_current_folder()
         if not current_folder:
+            self.shown_note_ids = []
+            self.note_list.set_items([])
             return
         
-        folders = self.app.get_folders()
-        notes_to_show = notes if notes is not None else folders.get(current_folder, [])
-        
-        for i, note in enumerate(notes_to_show):
-            tags_text = f" [{'] ['.join(note.get_tags())}]" if note.get_tags() else ""
-            display_text = f"{note.get_title()}{tags_text}"
-            self.note_list.insert(tk.END, display_text)
+        notes_to_show = notes if notes is not None else self.library.list_notes(current_folder)
+        self.shown_note_ids = [note.get_id() for note in notes_to_show]
+        display_texts = [note_display_text(note) for note in notes_to_show]
 
-            # Reset background color
-            self.note_list.itemconfig(i, {'bg': 'SystemWindow'})
-
-            # Highlight if matches keyword
-            if highlight_keyword and highlight_keyword.lower() in display_text.lower():
-                self.note_list.itemconfig(i, {'bg': 'yellow'})
+        # Highlight if matches keyword
+        highlighted = None
+        if highlight_keyword:
+            keyword = highlight_keyword.lower()
+            highlighted = [keyword in text.lower() for text in display_texts]
+        self.note_list.set_items(display_texts, highlighted)
 
     def search_note(self):
-        """Search notes by title or tags."""
-        keyword = self.search_entry_note.get().strip().lower()
-        current_folder = self.app.get_current_folder()
-        if not keyword:
+        """Search notes (Search button)."""
+        self.search_scheduler.run_now(force=True)
+
+    def find_notes(self, query, candidates=None):
+        """
+        Return notes of the current folder matching query by title, tags or content
+        (only among candidates if given).
+        Content queries support "phrases", prefix*, OR and -excluded words;
+        without any match, titles and tags are matched with a few typos.
+        """
+        return self.library.find_notes(self.app.get_current_folder(), query, candidates)
+
+    def show_note_results(self, query, result):
+        """Show search results (all notes when result is None)."""
+        if result is None:
             self.refresh_note_list()
-            return
-        
-        folders = self.app.get_folders()
-        all_note = folders.get(current_folder, [])
-        result = [note for note in all_note if keyword in note.get_title().lower() or any(keyword in t.lower() for t in note.get_tags())]
-        self.refresh_note_list(result, highlight_keyword=keyword)
+        else:
+            self.refresh_note_list(result, highlight_keyword=query.lower())
 
                     
+# ==================== Search Frame ==================== #
+
+class SearchFrame(BaseFrame):
+    """Screen for searching notes of all folders at once (ranked results)."""
+
+    def __init__(self, parent, app):
+        super().__init__(parent, app)
+        self.results = []  # (folder, note, snippet) shown in the list
+
+        # Title
+        self.search_title_label = tk.Label(self, text="🔍 Search All Notes", font=("Arial", 14, "bold"))
+        self.search_title_label.pack(pady=(5, 0))
+
+        # Top section with back button and search bar
+        self.top_search = tk.Frame(self)
+        self.top_search.pack(fill="x")
+        self.top_search.columnconfigure(0, weight=1)
+
+        self.back_btn_search = tk.Button(self.top_search, text="← Folders", command=self.app.show_folder_frame)
+        self.back_btn_search.grid(row=0, column=0, sticky="w", padx=(10, 5))
+
+        self.search_entry_all = tk.Entry(self.top_search, font=('Arial', 10))
+        self.search_entry_all.grid(row=1, column=0, sticky="nsew", padx=(10, 0), pady=(10, 5))
+        self.search_entry_all.bind("<Return>", lambda event: self.search_all())
+
+        self.search_button_all = tk.Button(self.top_search, text="Search", command=self.search_all)
+        self.search_button_all.grid(row=1, column=1, sticky="nsew", padx=(0, 10), pady=(10, 5))
+
+        # Result list (title, folder and a snippet of the matching text)
+        self.result_list = tk.Listbox(self, font=('Arial', 10))
+        self.result_list.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        self.result_list.bind("<Double-Button-1>", self.open_result)
+
+    def search_all(self):
+        """Run a ranked search over every folder and show the results."""
+        query = self.search_entry_all.get().strip()
+        self.result_list.delete(0, tk.END)
+        if not query:
+            self.results = []
+            return
+
+        # Treat the word being typed as a prefix
+        if query[-1].isalnum():
+            query += "*"
+        self.results = self.library.search_all_notes(query)
+        for folder, note, snippet in self.results:
+            display_text = f"{note.get_title()}  ({folder})"
+            if snippet:
+                display_text += f"  —  {snippet}"
+            self.result_list.insert(tk.END, display_text)
+
+    def open_result(self, event):
+        """Open the selected result in the editor."""
+        selection = self.result_list.curselection()
+        if not selection:
+            return
+        folder, note, _ = self.results[selection[0]]
+        self.app.open_note_in_editor(note.get_id())
+
+
+# ==================== Tag Frame ==================== #
+
+class TagFrame(BaseFrame):
+    """Screen listing all tags; filters notes of every folder by one or more tags."""
+
+    def __init__(self, parent, app):
+        super().__init__(parent, app)
+        self.tags = []     # tags shown in the tag list
+        self.results = []  # (folder, note) shown in the note list
+
+        # Title
+        self.tag_title_label = tk.Label(self, text="🏷 Tags", font=("Arial", 14, "bold"))
+        self.tag_title_label.pack(pady=(5, 0))
+
+        # Top section: back, rename and AND/OR choice
+        self.top_tag = tk.Frame(self)
+        self.top_tag.pack(fill="x")
+
+        self.back_btn_tag = tk.Button(self.top_tag, text="← Folders", command=self.app.show_folder_frame)
+        self.back_btn_tag.pack(side="left", padx=(10, 5))
+
+        self.rename_tag_btn = tk.Button(self.top_tag, text="Rename / Merge Tag", command=self.rename_tag)
+        self.rename_tag_btn.pack(side="right", padx=(5, 10))
+
+        self.match_all = tk.BooleanVar(value=True)
+        tk.Radiobutton(self.top_tag, text="Any (OR)", variable=self.match_all, value=False,
+                       command=self.filter_notes).pack(side="right")
+        tk.Radiobutton(self.top_tag, text="All (AND)", variable=self.match_all, value=True,
+                       command=self.filter_notes).pack(side="right")
+
+        # Tag facets (multi-select) with note counts
+        self.tag_list = tk.Listbox(self, font=('Arial', 10), selectmode="multiple", height=8, exportselection=False)
+        self.tag_list.pack(fill="x", padx=10, pady=(10, 5))
+        self.tag_list.bind("<<ListboxSelect>>", lambda event: self.filter_notes())
+
+        # Notes having the selected tags (all folders)
+        self.tag_note_list = VirtualList(self, font=('Arial', 10))
+        self.tag_note_list.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        self.tag_note_list.bind("<Double-Button-1>", self.open_result)
+
+    @PROFILER.timed("refresh_tag_list")
+    def refresh_tag_list(self):
+        """Show every tag with its number of notes, keeping the selection."""
+        selected = set(self.selected_tags())
+        counts = self.library.get_tag_index().counts()
+        self.tags = [tag for tag, count in counts]
+        self.tag_list.delete(0, tk.END)
+        self.tag_list.insert(0, *[f"{tag} ({count})" for tag, count in counts])
+        for i, tag in enumerate(self.tags):
+            if tag in selected:
+                self.tag_list.selection_set(i)
+        self.filter_notes()
+
+    def selected_tags(self):
+        """Return the tags selected in the tag list."""
+        return [self.tags[i] for i in self.tag_list.curselection() if i < len(self.tags)]
+
+    def filter_notes(self):
+        """Show notes of all folders having the selected tags."""
+        tags = self.selected_tags()
+        self.results = self.library.filter_notes_by_tags(tags, self.match_all.get()) if tags else []
+        self.tag_note_list.set_items([f"{note_display_text(note)}  ({folder})" for folder, note in self.results])
+
+    def rename_tag(self):
+        """Rename the selected tag, or merge it into an existing tag."""
+        tags = self.selected_tags()
+        if len(tags) != 1:
+            messagebox.showwarning("Rename Tag", "Please select exactly one tag.")
+            return
+        old_tag = tags[0]
+        new_tag = simpledialog.askstring("Rename Tag", "New tag name:", initialvalue=old_tag)
+        if not new_tag or not new_tag.strip() or new_tag.strip() == old_tag:
+            return
+        new_tag = new_tag.strip()
+        if new_tag in self.tags and not messagebox.askyesno("Merge Tags", f"Merge '{old_tag}' into '{new_tag}'?"):
+            return
+        self.library.rename_tag(old_tag, new_tag)
+        self.tag_list.selection_clear(0, tk.END)
+        self.refresh_tag_list()
+
+    def open_result(self, event):
+        """Open the selected note in the editor."""
+        selection = self.tag_note_list.curselection()
+        if selection:
+            folder, note = self.results[selection[0]]
+            self.app.open_note_in_editor(note.get_id())
+
+
 # ==================== Editor Frame ==================== #
 class EditorFrame(BaseFrame):
     """
@@ -575,7 +890,7 @@ class EditorFrame(BaseFrame):
         self.title_entry.pack(side="left", fill="x", expand=True)
 
         # ===== Main text editor ===== #
-        self.note_text = tk.Text(self, wrap="word", font=('Arial', 11))
+        self.note_text = TrackedText(self, wrap="word", font=('Arial', 11))
         self.note_text.pack(fill="both", expand=True, padx=10, pady=(0, 10))
 
         # Style links inside text
@@ -585,6 +900,26 @@ class EditorFrame(BaseFrame):
         # Detect links automatically when typing
         self.note_text.bind("<<Modified>>", self._detect_links)
 
+        # Images are decoded in the background; a placeholder is shown meanwhile
+        self.note_text.image_refs = []  # keep PhotoImages alive
+        self.note_text.image_name_to_path = {}  # image name in text -> file path
+        self.image_loader = ImageLoader(self, ThumbnailCache(images=self.library.get_images()))
+        self.image_placeholder = make_placeholder()
+        self.image_generation = 0  # changes when another note is opened
+
+        # Large notes are inserted in chunks between UI events (see open_note)
+        self._pending_segments = []  # (kind, value) still to insert, in reverse order
+        self._load_after_id = None
+
+        # Unsaved edits: text edits are counted by TrackedText; loading doesn't count
+        self._clean_changes = 0  # edit count of the text as loaded / last saved
+
+        # Optional autosave ('autosave_seconds' in notes_settings.json, 0 = off)
+        self._autosave_ms = int(float(load_settings().get("autosave_seconds") or 0) * 1000)
+        self._autosave_after_id = None
+        if self._autosave_ms > 0:
+            self._autosave_after_id = self.after(self._autosave_ms, self._autosave)
+
     def edit_tags(self):
         """Open dialog to add/edit tags for the note."""
         current_tags = ", ".join(self.tags) if self.tags else ""
@@ -601,48 +936,63 @@ class EditorFrame(BaseFrame):
         if not os.path.exists(file_path):
             messagebox.showerror("Error", "Invalid image file or path.")
             return
-
+        # Copy it into the image store (same content is stored once); its thumbnail is made right away
         try:
-            # Open and resize image
-            img = Image.open(file_path)
-            img.thumbnail((300, 300))
-            photo = ImageTk.PhotoImage(img)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load image: {e}")
+            stored_path = self.library.ingest_image(file_path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to attach image: {e}")
             return
 
-        # Keep reference so image is not lost
-        if not hasattr(self.note_text, "image_refs"):
-            self.note_text.image_refs = []
-        self.note_text.image_refs.append(photo)
-
-        # Save image path for persistence
-        if not hasattr(self.note_text, "image_name_to_path"):
-            self.note_text.image_name_to_path = {}
-        self.note_text.image_name_to_path[str(photo)] = file_path
+        def on_error(name, error):
+            self._remove_image(name)
+            messagebox.showerror("Error", f"Failed to load image: {error}")
 
         # Insert image at cursor position
-        self.note_text.image_create(tk.INSERT, image=photo)
+        self._insert_image(tk.INSERT, stored_path, on_error)
 
-    def _detect_links(self, event=None):
-        """Scan text for URLs and highlight them as clickable links."""
-        self.note_text.tag_remove("link", "1.0", tk.END)
-        url_pattern = re.compile(r"https?://[^\s]+")
+    def _insert_image(self, index, path, on_error):
+        """
+        Insert an image at index.
+        A placeholder is shown right away and replaced once the image has been
+        decoded in the background; on_error(name, error) is called if that fails.
+        """
+        name = self.note_text.image_create(index, image=self.image_placeholder)
+        # Save image path for persistence
+        self.note_text.image_name_to_path[name] = path
+        generation = self.image_generation
+
+        def show(photo, error):
+            if generation != self.image_generation:
+                return  # another note was opened meanwhile
+            if photo is None:
+                on_error(name, error)
+                return
+            # Keep reference so image is not lost
+            self.note_text.image_refs.append(photo)
+            try:
+                self.note_text.image_configure(name, image=photo)
+            except tk.TclError:
+                pass  # placeholder was deleted by the user
 
-        line_index = 1
-        while True:
-            line_start = f"{line_index}.0"
-            line_end = f"{line_index}.end"
-            if self.note_text.compare(line_start, ">=", tk.END):
-                break
+        self.image_loader.request(path, show)
 
-            line_text = self.note_text.get(line_start, line_end)
-            for match in url_pattern.finditer(line_text):
-                start = f"{line_index}.{match.start()}"
-                end = f"{line_index}.{match.end()}"
-                self.note_text.tag_add("link", start, end)
+    def _remove_image(self, name):
+        """Remove an embedded image; returns its text index (or None)."""
+        self.note_text.image_name_to_path.pop(name, None)
+        try:
+            index = self.note_text.index(name)
+        except tk.TclError:
+            return None
+        self.note_text.delete(index)
+        return index
 
-            line_index += 1
+    @PROFILER.timed("detect_links")
+    def _detect_links(self, event=None):
+        """
+        Scan text for URLs and highlight them as clickable links.
+        Only the lines changed since the last scan are scanned again.
+        """
+        self.note_text.retag_dirty_lines("link", URL_PATTERN)
 
         # Reset modified flag
         self.note_text.edit_modified(False)
@@ -654,6 +1004,7 @@ class EditorFrame(BaseFrame):
         if ranges:
             url = self.note_text.get(ranges[0], ranges[1])
             try:
+                import webbrowser  # deferred: only needed when a link is clicked
                 webbrowser.open(url)
             except Exception as e:
                 messagebox.showerror("Error", f"Cannot open link: {e}")
@@ -663,13 +1014,13 @@ class EditorFrame(BaseFrame):
         selection = self.app.note_frame.note_list.curselection()
         if not selection:
             return
+        self.open_note(self.app.note_frame.get_note_id_at(selection[0]))
 
-        index = selection[0]
-        self.app.set_current_note_index(index)
-
-        current_folder = self.app.get_current_folder()
-        folders = self.app.get_folders()
-        note = folders[current_folder][index]
+    @PROFILER.timed("open_note")
+    def open_note(self, note_id):
+        """Load the note with an id into the editor."""
+        self.app.set_current_note_id(note_id)
+        note = self.library.get_note(note_id)
 
         # Switch to editor view
         self.app.show_editor_frame()
@@ -677,79 +1028,172 @@ class EditorFrame(BaseFrame):
         # Load title and clear text area
         self.note_title_var.set(note.get_title())
         self.note_text.delete("1.0", tk.END)
+        self._clean_changes = self.note_text.get_change_count()
 
         # Prepare for images
         self.note_text.image_refs = []
         self.note_text.image_name_to_path = {}
-
-        # Load note content blocks
-        for block in note.get_content_blocks():
-            if block['type'] == "text":
-                self.note_text.insert(tk.END, block['content'])
-
-            elif block['type'] == "image":
-                if os.path.exists(block['path']):
-                    try:
-                        img = Image.open(block['path'])
-                        img.thumbnail((300, 300))
-                        photo = ImageTk.PhotoImage(img)
-                        self.note_text.image_refs.append(photo)
-                        self.note_text.image_name_to_path[str(photo)] = block['path']
-                        self.note_text.image_create(tk.END, image=photo)
-                    except Exception as e:
-                        self.note_text.insert(tk.END, f"[Error loading image: {e}]")
-                else:
-                    self.note_text.insert(tk.END, f"[Image not found: {block['path']}]")
-
-            elif block['type'] == "link":
-                self.link = note.get_link()
-                start_index = self.note_text.index(tk.END)
-                self.note_text.insert(tk.END, self.link)
-                end_index = self.note_text.index(tk.END)
-                self.note_text.tag_add("link", start_index, end_index)
-                self.note_text.tag_bind("link", "<Button-1>", self._on_link_click)
+        self.image_generation += 1
 
         # Load tags
         self.tags = note.get_tags()
         self.tag_btn.config(text=f"Add Tags ({len(self.tags)})" if self.tags else "Add Tags")
-        
-        # Highlight links
+
+        # Load note content: merged text runs, one insert each; the first screenful
+        # now, the rest in chunks between UI events (links highlighted per chunk)
+        self.cancel_loading()
+        segments = []
+        for kind, value in editor_segments(normalize_blocks(note.get_content_blocks()), os.path.exists):
+            if kind == "text":
+                segments.extend(("text", piece) for piece in split_text(value, EDITOR_CHUNK_CHARS))
+            else:
+                segments.append((kind, value))
+        self._pending_segments = segments[::-1]
+        self.note_text.mark_set(LOAD_MARK, tk.END)
+        self.note_text.mark_gravity(LOAD_MARK, "right")  # stays after the inserted content
+        self._insert_chunk()
+        if self._pending_segments:
+            self._load_after_id = self.after(1, self._load_step)
+
+    def _insert_chunk(self):
+        """Insert up to EDITOR_CHUNK_CHARS characters / EDITOR_CHUNK_IMAGES images of the note."""
+        chars = 0
+        images = 0
+        pending = self._pending_segments
+        changes = self.note_text.get_change_count()
+        while pending and chars < EDITOR_CHUNK_CHARS and images < EDITOR_CHUNK_IMAGES:
+            kind, value = pending.pop()
+            if kind == "image":
+                self._insert_image(LOAD_MARK, value, self._on_image_error)
+                images += 1
+                continue
+            self.note_text.insert(LOAD_MARK, value)
+            chars += len(value)
+        self._clean_changes += self.note_text.get_change_count() - changes  # loading is not an edit
+        # Highlight links (only the lines just inserted are scanned)
         self._detect_links()
 
+    def _load_step(self):
+        """Insert the next chunk of the opened note."""
+        self._load_after_id = None
+        with PROFILER.span("editor.load_step"):
+            self._insert_chunk()
+        if self._pending_segments:
+            self._load_after_id = self.after(1, self._load_step)
+
+    def cancel_loading(self):
+        """Stop inserting the rest of the previously opened note."""
+        if self._load_after_id is not None:
+            self.after_cancel(self._load_after_id)
+            self._load_after_id = None
+        self._pending_segments = []
+
+    def finish_loading(self):
+        """Insert everything not inserted yet (e.g. before saving)."""
+        if self._load_after_id is not None:
+            self.after_cancel(self._load_after_id)
+            self._load_after_id = None
+        while self._pending_segments:
+            self._insert_chunk()
+
+    def _on_image_error(self, name, error):
+        """Replace an image that could not be decoded with an error note."""
+        changes = self.note_text.get_change_count()
+        index = self._remove_image(name)
+        if index is not None:
+            self.note_text.insert(index, f"[Error loading image: {error}]")
+        self._clean_changes += self.note_text.get_change_count() - changes  # not an edit either
+
+    @PROFILER.timed("save_note_content")
     def save_note_content(self):
-        """Save the edited note (title, text, images, links, tags)."""
-        current_folder = self.app.get_current_folder()
-        current_note_index = self.app.get_current_note_index()
-        if current_folder is None or current_note_index is None:
+        """Save the edited note (title, text, images, links, tags) and go back to the note list."""
+        if self.library.get_note(self.app.get_current_note_id()) is None:
             return
+        if self.is_modified():
+            self._write_note()
+        self.app.show_note_frame()
 
-        folders = self.app.get_folders()
-        note = folders[current_folder][current_note_index]
-        note.set_title(self.note_title_var.get())
-
-        if isinstance(note, Note):
-            blocks = []
-            # Dump text widget into structured content blocks
-            for kind, value, index in self.note_text.dump("1.0", "end-1c", text=True, image=True, tag=True):
-                if kind == "text" and value:
-                    blocks.append({"type": "text", "content": value})
-                elif kind == "image":
-                    path = getattr(self.note_text, "image_name_to_path", {}).get(value)
-                    if path:
-                        blocks.append({"type": "image", "path": path})
-                elif kind == "tagon" and value == "link":
-                    url = self.note_text.get(index, f"{index} lineend").strip()
-                    if url.startswith("http"):
-                        blocks.append({"type": "link", "url": url})
-
-        # Save content and tags
-        note.set_content_blocks(blocks)
-        self.app.set_folders(folders)
-        note.set_tags(self.tags)
-        self.app.save_to_file()
+    def is_modified(self):
+        """Return True if the opened note was edited since it was loaded or last saved."""
+        note = self.library.get_note(self.app.get_current_note_id())
+        if note is None:
+            return False
+        return (self.note_text.get_change_count() != self._clean_changes
+                or self.note_title_var.get() != note.get_title()
+                or self.tags != note.get_tags())
+
+    def _write_note(self):
+        """Save the opened note (the text is only dumped here, when something changed)."""
+        current_note_id = self.app.get_current_note_id()
+
+        # Dump text widget into structured content blocks
+        # (merged text runs; links are part of the text and detected on open)
+        self.finish_loading()  # a large note may still be loading
+        if self.note_text.get_change_count() != self._clean_changes:
+            dump = self.note_text.dump("1.0", "end-1c", text=True, image=True)
+            blocks = blocks_from_dump(dump, self.note_text.image_name_to_path)
+        else:
+            blocks = None  # only the title or tags changed
+
+        # Save title, content and tags
+        self.library.update_note(current_note_id, title=self.note_title_var.get(),
+                                 content_blocks=blocks, tags=self.tags)
+        self._clean_changes = self.note_text.get_change_count()
         self.app.note_frame.refresh_note_list()
-        self.app.show_note_frame()
 
+    def _autosave(self):
+        """Save the opened note if it has unsaved edits (every autosave_seconds)."""
+        if self.winfo_ismapped() and not self._pending_segments and self.is_modified():
+            with PROFILER.span("autosave"):
+                self._write_note()
+        self._autosave_after_id = self.after(self._autosave_ms, self._autosave)
 
-NoteApp()
+    def shutdown(self):
+        """
+        Stop loading and autosaving before the app closes (with autosave on, edits are saved).
+        Thumbnails not used for a while are deleted from the cache.
+        """
+        if self._autosave_after_id is not None:
+            self.after_cancel(self._autosave_after_id)
+            self._autosave_after_id = None
+            if self.is_modified():
+                self._write_note()  # inserts what is still loading first
+        self.cancel_loading()
+        self.image_loader.shutdown()
+        self.image_loader.get_cache().prune()
+
+
+# Frames of NoteApp by attribute name (built on first use, see NoteApp._get_frame)
+FRAME_CLASSES = {
+    "folder_frame": FolderFrame,
+    "note_frame": NoteFrame,
+    "editor_frame": EditorFrame,
+    "search_frame": SearchFrame,
+    "tag_frame": TagFrame,
+}
+
+
+# ================== Starting the app ================== #
+
+INSTANCE_NAME = "notes_app"  # lock file 'notes_app.lock' next to the data file
+
+
+def open_app(master=None, on_first_paint=None, lazy_load=True):
+    """
+    Start the NoteApp unless it already runs on this data folder, in which case
+    that window is brought to the front and None is returned.
+    With a master (launcher window) the app opens in the launcher's process.
+    """
+    instance = SingleInstance(INSTANCE_NAME, data_folder())
+    if not instance.acquire():
+        return None
+    try:
+        return NoteApp(lazy_load=lazy_load, master=master, instance=instance, on_first_paint=on_first_paint)
+    except BaseException:
+        instance.release()
+        raise
+
+
+if __name__ == "__main__":
+    open_app()
 
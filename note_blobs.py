@@ -0,0 +1,217 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+
+from note_storage import atomic_write
+from note_profile import PROFILER
+
+# ================== Image Store ================== #
+
+IMAGES_FOLDER = "notes_images"
+REFS_FILE = "refs.json"
+THUMBS_FOLDER = "thumbs"
+HASH_CHUNK = 1 << 20  # bytes hashed / copied at a time
+_BLOB_NAME = re.compile(r"^[0-9a-f]{64}\.[0-9a-z]+$")
+
+
+class ImageStore:
+    """
+    Content-addressed store of the images attached to notes.
+    - An attached image is copied once into folder/<2 hex>/<sha256>.<ext>; image
+      blocks keep that relative path, so notes no longer depend on where the
+      original file was and the same screenshot is stored only once
+    - refs.json remembers which notes use which image ({note id: [image names]}),
+      so the reference count of an image is the number of notes listing it
+    - Thumbnails are kept in folder/thumbs/ (made by note_images.ThumbnailCache)
+    Unused images are only deleted by collect_garbage(), which the library runs
+    when it closes (after every queued save is on disk), so a crash can leave an
+    unused image behind but never lose a used one.
+    Image blocks with other paths (notes made before the store existed) still work.
+    """
+
+    def __init__(self, folder=IMAGES_FOLDER):
+        self._folder = folder
+        self._note_images = None  # note id -> set of image names (read on first use)
+        self._counts = {}  # image name -> number of notes using it
+        self._candidates = set()  # images that may have become unused this session
+
+    # ===== Getter methods ===== #
+
+    def get_folder(self):
+        """Return the folder of the store."""
+        return self._folder
+
+    def get_ref_count(self, path):
+        """Return how many notes use a stored image (0 for other paths)."""
+        name = self.image_name(path)
+        self._read_refs()
+        return self._counts.get(name, 0) if name else 0
+
+    def thumbnail_path(self, path, size):
+        """Return the thumbnail file of a stored image (None for other paths)."""
+        name = self.image_name(path)
+        if name is None:
+            return None
+        return os.path.join(self._folder, THUMBS_FOLDER, f"{name.split('.')[0]}_{size[0]}x{size[1]}.png")
+
+    def image_name(self, path):
+        """Return '<sha256>.<ext>' if path points into the store, otherwise None."""
+        if not path:
+            return None
+        name = os.path.basename(path)
+        if not _BLOB_NAME.match(name):
+            return None
+        parent = os.path.dirname(os.path.dirname(path))
+        if os.path.normcase(os.path.abspath(parent)) != os.path.normcase(os.path.abspath(self._folder)):
+            return None
+        return name
+
+    def _image_path(self, name):
+        """Return the relative path stored in image blocks for an image name."""
+        return "/".join((self._folder.replace(os.sep, "/"), name[:2], name))
+
+    # ================== Adding images ================== #
+
+    @PROFILER.timed("image.ingest")
+    def ingest(self, path):
+        """
+        Copy an image file into the store (unless the same content is already there).
+        Returns the path to put in the image block.
+        Raises OSError if the file cannot be read or copied.
+        """
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(HASH_CHUNK), b""):
+                digest.update(chunk)
+        extension = os.path.splitext(path)[1].lower().lstrip(".") or "img"
+        name = f"{digest.hexdigest()}.{extension}"
+        stored_path = self._image_path(name)
+        if not os.path.exists(stored_path):
+            os.makedirs(os.path.dirname(stored_path), exist_ok=True)
+            tmp_path = f"{stored_path}.{os.getpid()}.tmp"
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, stored_path)
+            # New in the store: deleted again at close if no saved note uses it
+            self._candidates.add(name)
+        return stored_path
+
+    # ================== Reference counts ================== #
+
+    def _read_refs(self):
+        """Read refs.json once (a missing or broken file counts as no references)."""
+        if self._note_images is not None:
+            return
+        self._note_images = {}
+        try:
+            with open(os.path.join(self._folder, REFS_FILE), "r", encoding="utf-8") as file:
+                data = json.load(file)
+            notes = data.get("notes", {})
+        except (OSError, ValueError, AttributeError):
+            notes = {}
+        for note_id, names in notes.items():
+            self._note_images[note_id] = set(names)
+            for name in names:
+                self._counts[name] = self._counts.get(name, 0) + 1
+
+    def _write_refs(self):
+        """Save the references atomically."""
+        os.makedirs(self._folder, exist_ok=True)
+        data = {"version": 1, "notes": {note_id: sorted(names) for note_id, names in self._note_images.items()}}
+        atomic_write(os.path.join(self._folder, REFS_FILE), json.dumps(data).encode("utf-8"))
+
+    def images_of(self, content_blocks):
+        """Return the names of the stored images used by content blocks."""
+        names = set()
+        for block in content_blocks:
+            if block.get("type") == "image":
+                name = self.image_name(block.get("path"))
+                if name:
+                    names.add(name)
+        return names
+
+    def set_note_images(self, note_id, names):
+        """
+        Record the stored images a note uses now (from images_of()).
+        Images the note stopped using are released.
+        """
+        self._read_refs()
+        old = self._note_images.get(note_id, set())
+        if old == names:
+            return
+        if names:
+            self._note_images[note_id] = set(names)
+        else:
+            self._note_images.pop(note_id, None)
+        for name in names - old:
+            self._counts[name] = self._counts.get(name, 0) + 1
+        for name in old - names:
+            self._counts[name] -= 1
+            if self._counts[name] <= 0:
+                del self._counts[name]
+                self._candidates.add(name)
+        self._write_refs()
+
+    def release_note(self, note_id):
+        """Forget the images of a deleted note."""
+        self.set_note_images(note_id, set())
+
+    def rebuild(self, notes):
+        """
+        Recount every reference from (note id, content blocks) pairs of all notes
+        (e.g. after refs.json was lost); returns the number of referenced images.
+        """
+        self._note_images = {}
+        self._counts = {}
+        for note_id, content_blocks in notes:
+            names = self.images_of(content_blocks)
+            if names:
+                self._note_images[note_id] = names
+                for name in names:
+                    self._counts[name] = self._counts.get(name, 0) + 1
+        self._write_refs()
+        return len(self._counts)
+
+    # ================== Garbage collection ================== #
+
+    def _stored_names(self):
+        """Return every image name found in the store folder."""
+        names = set()
+        if not os.path.isdir(self._folder):
+            return names
+        for entry in os.scandir(self._folder):
+            if entry.is_dir() and len(entry.name) == 2:
+                names.update(name for name in os.listdir(entry.path) if _BLOB_NAME.match(name))
+        return names
+
+    def collect_garbage(self, everything=False):
+        """
+        Delete unused images and their thumbnails; returns the number deleted.
+        - Default: only images released or added during this session
+        - everything=True: every image without references (use after rebuild())
+        Call it only once the saves releasing the images are on disk.
+        """
+        self._read_refs()
+        candidates = self._stored_names() if everything else self._candidates
+        deleted = 0
+        for name in list(candidates):
+            if self._counts.get(name, 0) > 0:
+                continue
+            for path in [os.path.join(self._folder, name[:2], name)] + self._thumbnail_files(name):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            deleted += 1
+        self._candidates.clear()
+        return deleted
+
+    def _thumbnail_files(self, name):
+        """Return the thumbnails (any size) of an image."""
+        folder = os.path.join(self._folder, THUMBS_FOLDER)
+        prefix = name.split(".")[0] + "_"
+        try:
+            return [os.path.join(folder, entry) for entry in os.listdir(folder) if entry.startswith(prefix)]
+        except OSError:
+            return []
@@ -0,0 +1,112 @@
+# ================== Content Blocks ================== #
+#
+# A note's content is a list of blocks:
+#   {"type": "text",  "content": "..."}
+#   {"type": "image", "path": "..."}
+#   {"type": "link",  "url": "..."}     (only for links not already in the text)
+#
+# Normalized content never has two text blocks in a row, never has empty
+# text blocks, and has no link block whose URL is already part of the text.
+
+
+def normalize_blocks(blocks):
+    """
+    Return a normalized copy of content blocks.
+    - Adjacent text runs are merged into one block
+    - Empty text blocks are dropped
+    - Link blocks whose URL is already in the surrounding text are dropped
+      (links are highlighted from the text when a note is opened)
+    """
+    normalized = []
+    segment = []
+    for block in blocks:
+        if block.get("type") == "image":
+            normalized.extend(_normalize_segment(segment))
+            normalized.append(block)
+            segment = []
+        else:
+            segment.append(block)
+    normalized.extend(_normalize_segment(segment))
+    return normalized
+
+
+def _normalize_segment(segment):
+    """Normalize the blocks between two images."""
+    text = "".join(block.get("content", "") for block in segment if block.get("type") == "text")
+    result = []
+    for block in segment:
+        kind = block.get("type")
+        if kind == "link" and block.get("url", "") in text:
+            continue  # duplicate of the text
+        if kind == "text":
+            if not block.get("content"):
+                continue
+            if result and result[-1].get("type") == "text":
+                result[-1] = {"type": "text", "content": result[-1]["content"] + block["content"]}
+                continue
+        result.append(block)
+    return result
+
+
+def editor_segments(blocks, image_exists):
+    """
+    Return what the editor inserts for normalized blocks, in as few Tk calls as
+    possible: ("text", str) runs and ("image", path) items.
+    - Text, link URLs and "[Image not found: ...]" notes between two shown
+      images are merged into one text run
+    :param image_exists: image_exists(path) -> True if the image can be shown.
+    """
+    segments = []
+    text = []
+    for block in blocks:
+        kind = block.get("type")
+        if kind == "image" and image_exists(block["path"]):
+            if text:
+                segments.append(("text", "".join(text)))
+                text = []
+            segments.append(("image", block["path"]))
+        elif kind == "image":
+            text.append(f"[Image not found: {block['path']}]")
+        elif kind == "text":
+            text.append(block["content"])
+        elif kind == "link":
+            # Link not contained in the text: show its URL (highlighted as a link)
+            text.append(block.get("url", ""))
+    if text:
+        segments.append(("text", "".join(text)))
+    return segments
+
+
+def split_text(text, size):
+    """
+    Split text into pieces of at most size characters, cut after a newline where possible.
+    Empty text gives no pieces.
+    """
+    pieces = []
+    start = 0
+    while len(text) - start > size:
+        end = text.rfind("\n", start, start + size) + 1
+        if end <= start:
+            end = start + size
+        pieces.append(text[start:end])
+        start = end
+    if start < len(text):
+        pieces.append(text[start:])
+    return pieces
+
+
+def blocks_from_dump(dump, image_paths):
+    """
+    Build normalized blocks from tk.Text.dump(text=True, image=True) output.
+    :param dump: List of (kind, value, index) tuples.
+    :param image_paths: {embedded image name: file path}.
+    """
+    blocks = []
+    for kind, value, index in dump:
+        if kind == "text" and value:
+            blocks.append({"type": "text", "content": value})
+        elif kind == "image":
+            path = image_paths.get(value)
+            if path:
+                blocks.append({"type": "image", "path": path})
+    return normalize_blocks(blocks)
@@ -0,0 +1,808 @@
+import os
+import sys
+import json
+import argparse
+from contextlib import contextmanager
+
+from note_storage import BodyCache, DirectWriter, JournalStore, open_store, load_settings, compact_data_file
+from note_search import InvertedIndex, TagIndex, FuzzyIndex, allows_typos, fuzzy_text, note_fields, note_text, make_snippet
+from note_model import Note
+from note_blobs import ImageStore, IMAGES_FOLDER
+from note_profile import PROFILER
+
+# ================== Note Library (no UI) ================== #
+
+
+class NoteLibrary:
+    """
+    All folders and notes of the NoteApp, without any Tkinter code.
+    Handles:
+      - Loading and saving through a storage engine (JSON journal or SQLite)
+      - Folder and note CRUD, always saved incrementally
+      - Full-text, tag and per-folder searches
+      - Attached images, kept in a deduplicated image store (note_blobs)
+    The Tk app (note.py), the command line below and benchmarks all use it.
+    Invalid changes (duplicate folder names, unknown notes) raise ValueError/KeyError.
+    """
+
+    def __init__(self, store=None, lazy_load=True, make_writer=None, on_error=None, images=None):
+        """
+        :param store: Storage engine (default: the one selected in notes_settings.json).
+        :param lazy_load: Only read note bodies when they are used.
+        :param make_writer: make_writer(store, on_error) -> writer (default: DirectWriter,
+            which writes immediately; the app passes a WriteBehind).
+        :param on_error: Called with the exception when a write fails (default: raise it).
+        :param images: ImageStore of attached images (default: the folder set in notes_settings.json).
+        """
+        self._store = store if store is not None else open_store()
+        self._images = images if images is not None else ImageStore(load_settings().get("images") or IMAGES_FOLDER)
+        self._on_error = on_error
+        self._writer = (make_writer or DirectWriter)(self._store, self._report_error)
+        self._lazy_load = lazy_load
+        self._folders = {}  # Stores folders and their notes ({folder: {note id: Note}})
+        self._notes_by_id = {}  # Note id -> Note (all folders)
+        self._note_folders = {}  # Note id -> name of the folder holding it
+        self._change_seq = 0  # Counts note saves
+        self._note_changes = {}  # Note id -> _change_seq of its last save (not yet in a snapshot)
+        self._folder_changes = {}  # Folder -> _change_seq of its last change (not yet in a snapshot)
+        self._compaction_pending = False  # A full save is queued
+        self._save_failed = False  # A full save failed: it is tried again by close()
+        self._batching = False  # Inside batch(): changes are saved together at the end
+        self._body_cache = BodyCache(self._store)  # Note bodies kept in memory
+        self._search_index = InvertedIndex()  # Full-text index over all notes
+        self._tag_index = TagIndex()  # Tag -> notes having it
+        self._fuzzy_notes = FuzzyIndex()  # Typo-tolerant index of note titles and tags
+        self._fuzzy_folders = FuzzyIndex()  # Typo-tolerant index of folder names
+        self._search_index_snapshot = None  # Data version of the saved search index
+        self._loaded = False  # True once load() has finished
+        self._read_only = False  # Loaded by a command that only reads: write nothing
+        self._migration_pending = False  # Old data file not saved in the new format yet
+
+    # ===== Getter methods ===== #
+
+    def get_store(self):
+        """Return the storage engine."""
+        return self._store
+
+    def get_images(self):
+        """Return the store of attached images."""
+        return self._images
+
+    def get_folders(self):
+        """Return all folders with their notes ({folder: {note id: Note}})."""
+        return self._folders
+
+    def list_folders(self):
+        """Return the folder names, in order."""
+        return list(self._folders)
+
+    def list_notes(self, folder):
+        """Return the notes of a folder, in order."""
+        return list(self._folders.get(folder, {}).values())
+
+    def get_note(self, note_id):
+        """Return the note with an id (any folder), or None if it was deleted."""
+        return self._notes_by_id.get(note_id)
+
+    def get_note_folder(self, note_id):
+        """Return the name of the folder holding a note."""
+        return self._note_folders.get(note_id)
+
+    def get_search_index(self):
+        """Return the full-text search index of all notes."""
+        return self._search_index
+
+    def get_tag_index(self):
+        """Return the tag index of all notes."""
+        return self._tag_index
+
+    def get_fuzzy_index(self):
+        """Return the typo-tolerant index of note titles and tags."""
+        return self._fuzzy_notes
+
+    def get_dirty_folders(self):
+        """Return the folders changed since the last full save (deleted ones included)."""
+        return list(self._folder_changes)
+
+    def is_dirty(self):
+        """Return True if anything changed since the last full save."""
+        return bool(self._folder_changes)
+
+    def is_migration_pending(self):
+        """Return True if the data file is in an old format that a read-only load did not rewrite."""
+        return self._migration_pending
+
+    # ================== Loading / saving ================== #
+
+    @PROFILER.timed("load_from_file")
+    def load(self, read_only=False):
+        """
+        Load every folder and note from the store and build the search indexes.
+        read_only=True writes nothing: an old data file is not migrated (note
+        ids given now are not kept) and no index cache is saved.
+        Raises ValueError if the data is corrupted, OSError if it cannot be read.
+        """
+        for _ in self.load_progressively(read_only=read_only):
+            pass
+
+    def load_progressively(self, batch_size=1000, read_only=False):
+        """
+        Load like load(), reading the file note by note (see JournalStore.iter_load).
+        A generator for progressive UIs: yields the fraction of the file read so
+        far (0.0-1.0) when a folder starts and after every batch_size notes.
+        Folders and notes read so far are already in get_folders(); the journal
+        changes, the indexes and the one-time save of old files come at the end
+        (is_loaded() is True from then on).
+        Raises ValueError if the data is corrupted, OSError if it cannot be read.
+        """
+        self._loaded = False
+        self._read_only = read_only
+        self._folders = {}
+        iter_load = getattr(self._store, "iter_load", None)
+        if iter_load is None:
+            # Storage without streaming (SQLite only reads titles and tags anyway)
+            events = _load_events(self._store.load(lazy=self._lazy_load))
+        else:
+            events = iter_load(lazy=self._lazy_load)
+
+        missing_ids = False
+        records = []
+        count = 0
+        try:
+            for kind, folder, payload, progress in events:
+                if kind == "journal":
+                    records = payload  # changes saved after the snapshot
+                    continue
+                missing_ids = self._add_loaded(folder, payload) or missing_ids
+                count += 1
+                if payload is None or count % batch_size == 0:
+                    yield progress
+        except Exception:
+            self._folders = {}  # never keep (and later save) part of a corrupted file
+            raise
+
+        has_saved_note = getattr(self._store, "has_saved_note", None)
+        if any("index" in record for record in records):
+            # Journal written before notes had ids (positions): replay it on plain data
+            self._folders = {}
+            for kind, folder, payload, progress in _load_events(self._store.load(lazy=self._lazy_load)):
+                missing_ids = self._add_loaded(folder, payload) or missing_ids
+            records = []
+        elif has_saved_note is not None:
+            # Snapshot notes (full load) are clean if the storage can copy their saved bytes
+            for notes in self._folders.values():
+                for note_id, note in notes.items():
+                    if note.is_dirty() and has_saved_note(note_id):
+                        note.mark_clean()
+        for record in records:
+            self._apply_record(record)
+        # Folders holding notes not copied as they are from the snapshot need saving
+        self._folder_changes = {}
+        for folder, notes in self._folders.items():
+            if any(note.is_dirty() for note in notes.values()):
+                self._folder_changes[folder] = 0
+        for record in records:
+            self._folder_changes.setdefault(record.get("folder") or record.get("new"), 0)
+        self._build_search_index()
+
+        # Old data file: save the new note ids (and write the index) once
+        # (after indexing: a synchronous writer reports the save right away)
+        migrate = bool(self._folders) and (missing_ids or (self._lazy_load and not self._store.has_index()))
+        self._migration_pending = migrate and read_only
+        if migrate and not read_only:
+            self.save_to_file()
+        self._loaded = True
+        yield 1.0
+
+    def is_loaded(self):
+        """Return True once loading has finished."""
+        return self._loaded
+
+    def _add_loaded(self, folder, data):
+        """Add a folder (data None) or a note read from the store; returns True if the note had no id."""
+        if data is None:
+            self._folders[folder] = {}
+            return False
+        note = self._note_from_data(data)
+        self._folders[folder][note.get_id()] = note
+        return not data.get("id")
+
+    def _apply_record(self, record):
+        """Apply a journal record (change saved after the snapshot) to the loaded notes."""
+        op = record.get("op")
+        if op == "put":
+            # Edited notes keep their place
+            self._folders.setdefault(record["folder"], {})[record["id"]] = self._note_from_data(record["note"])
+        elif op == "del":
+            self._folders.get(record["folder"], {}).pop(record["id"], None)
+        elif op == "mkdir":
+            self._folders.setdefault(record["folder"], {})
+        elif op == "rmdir":
+            self._folders.pop(record["folder"], None)
+        elif op == "mv":
+            if record["old"] in self._folders:
+                self._folders[record["new"]] = self._folders.pop(record["old"])
+
+    def _note_from_data(self, data):
+        """Build a Note; notes given by the index get their body loaded later."""
+        note = Note.from_dict(data)
+        if "ref" in data:
+            note.set_body_ref(data["ref"], self._body_cache)
+            note.unload_content()
+            note.mark_clean()  # same as its copy in the saved file
+        return note
+
+    @PROFILER.timed("save_to_file")
+    def save_to_file(self):
+        """
+        Save all notes (full rewrite, compact format).
+        - The writer replaces the file atomically and clears the change journal.
+        - Bodies of unloaded notes are copied from the saved file by the writer.
+        - Notes unchanged since the last full save are marked 'saved': the
+          storage copies their saved bytes instead of encoding them again.
+        """
+        # Convert notes into serializable dict format
+        folders_to_save = {
+            folder: [self._save_entry(note) for note in notes.values()]
+            for folder, notes in self._folders.items()
+        }
+        self._compaction_pending = True
+        self._writer.compact(folders_to_save, lambda refs, digest, seq=self._change_seq: self._on_saved(refs, digest, seq))
+
+    @staticmethod
+    def _save_entry(note):
+        """Return what a full save writes for a note (see save_to_file)."""
+        if note.is_dirty():
+            return note.to_dict(with_content=note.is_content_loaded())
+        data = note.to_dict(with_content=False)
+        data["saved"] = True
+        return data
+
+    def _on_saved(self, refs, digest, seq):
+        """
+        Called when a full save is on disk.
+        Notes and folders not changed since it was queued are clean again; in
+        lazy mode, the bodies of those notes can be unloaded.
+        """
+        self._compaction_pending = False
+        self._save_failed = False
+        self._note_changes = {note_id: change for note_id, change in self._note_changes.items() if change > seq}
+        self._folder_changes = {folder: change for folder, change in self._folder_changes.items() if change > seq}
+        for note_id, ref in refs.items():
+            note = self._notes_by_id.get(note_id)
+            if note is None or note_id in self._note_changes:
+                continue  # deleted or edited while the save was written
+            note.mark_clean()
+            if self._lazy_load:
+                note.set_body_ref(ref, self._body_cache)
+                self._body_cache.touch(note)
+        if self._lazy_load:
+            self._save_search_index(digest)
+
+    def _report_error(self, error):
+        """Handle a failed write (reported by the writer)."""
+        if self._compaction_pending:
+            # Changes made in batch() are only in the full save: do not lose them
+            self._save_failed = True
+        self._compaction_pending = False
+        if self._on_error is None:
+            raise error
+        self._on_error(error)
+
+    @contextmanager
+    def batch(self):
+        """
+        Group many changes (e.g. a bulk import) into one full save at the end
+        instead of one journal record each.
+        """
+        self._batching = True
+        try:
+            yield self
+        finally:
+            self._batching = False
+            self.save_to_file()
+
+    def flush(self):
+        """Wait until every queued change is written."""
+        self._writer.flush()
+
+    def close(self):
+        """
+        Write every queued change (and an outdated search index) and stop the writer.
+        Images no saved note uses any more are deleted once the saves are on disk.
+        A full save that failed earlier is tried once more.
+        """
+        self._writer.flush()
+        if self._save_failed:
+            self._save_failed = False
+            self.save_to_file()
+            self._writer.flush()
+        self._images.collect_garbage()
+        if (self._loaded and self._lazy_load and not self._read_only
+                and self._search_index_snapshot != self._store.get_snapshot_digest()):
+            self._save_search_index()
+        self._writer.close()
+
+    # ================ Search index ================ #
+
+    def _build_search_index(self):
+        """
+        Fill the full-text index after loading.
+        - Notes unchanged since the last save reuse the saved index
+        - Other notes are indexed now (and the saved index is refreshed)
+        """
+        self._search_index.clear()
+        self._tag_index.clear()
+        self._fuzzy_notes.clear()
+        self._fuzzy_folders.clear()
+        self._search_index_snapshot = None
+        self._note_folders = {}
+        self._notes_by_id = {}
+        for folder, notes in self._folders.items():
+            self._fuzzy_folders.add(folder, folder)
+            for note_id, note in notes.items():
+                self._note_folders[note_id] = folder
+                self._notes_by_id[note_id] = note
+                self._tag_index.add(note_id, note.get_tags())
+                self._fuzzy_notes.add(note_id, fuzzy_text(note))
+        saved = self._store.read_sidecar(".search") if self._lazy_load else None
+        if saved is not None:
+            # Only notes unchanged since the snapshot can use their saved entry
+            saved_ids = {
+                note_id: note_id
+                for note_id, note in self._notes_by_id.items()
+                if note.get_body_ref() is not None
+            }
+            self._search_index.load_data(saved, saved_ids)
+            self._search_index_snapshot = self._store.get_snapshot_digest()
+
+        outdated = False
+        for note_id, note in self._notes_by_id.items():
+            if note_id not in self._search_index:
+                self._search_index.add(note_id, note_fields(note))
+                outdated = outdated or note.get_body_ref() is not None
+        if outdated and not self._read_only:
+            self._save_search_index()
+
+    def _save_search_index(self, snapshot=None):
+        """
+        Save the index of the notes stored in the snapshot (default: the current one).
+        The index is only a cache: it is rebuilt on next start if missing.
+        """
+        if snapshot is None:
+            if self._compaction_pending:
+                return  # saved once the queued full save is written
+            snapshot = self._store.get_snapshot_digest()
+        saved_keys = {
+            note_id: note_id
+            for note_id, note in self._notes_by_id.items()
+            if note.get_body_ref() is not None
+        }
+        self._writer.write_sidecar(".search", self._search_index.to_data(saved_keys), snapshot)
+        self._search_index_snapshot = snapshot
+
+    def _index_note(self, note, folder):
+        """Add or refresh a note (stored in folder) in the id map and the indexes."""
+        note_id = note.get_id()
+        self._search_index.add(note_id, note_fields(note))
+        self._tag_index.add(note_id, note.get_tags())
+        self._fuzzy_notes.add(note_id, fuzzy_text(note))
+        self._note_folders[note_id] = folder
+        self._notes_by_id[note_id] = note
+
+    def _unindex_note(self, note):
+        """Remove a note from the id map and the indexes."""
+        note_id = note.get_id()
+        self._search_index.remove(note_id)
+        self._tag_index.remove(note_id)
+        self._fuzzy_notes.remove(note_id)
+        self._note_folders.pop(note_id, None)
+        self._notes_by_id.pop(note_id, None)
+        self._body_cache.forget(note)
+
+    # ================== Searching ================== #
+
+    @PROFILER.timed("search_all_notes")
+    def search_all_notes(self, query, limit=50):
+        """
+        Search every folder at once.
+        Returns up to limit (folder, note, snippet) tuples, best match first.
+        """
+        search = getattr(self._store, "search", None)  # indexed query of the SQLite storage
+        if search is not None:
+            self._writer.flush()  # include changes still queued
+            ranked = search(query, limit)
+        else:
+            ranked = self._search_index.rank(query, limit)
+        results = []
+        for note_id, score in ranked:
+            note = self._notes_by_id.get(note_id)
+            if note is None:
+                continue
+            snippet = make_snippet(note_text(note), query)
+            results.append((self._note_folders.get(note_id), note, snippet))
+        return results
+
+    def find_folders(self, keyword, candidates=None):
+        """
+        Return folder names containing keyword (only among candidates if given).
+        If none does, returns the names matching it with a few typos (fewest typos first).
+        """
+        lowered = keyword.lower()
+        folders = candidates if candidates is not None else self._folders
+        found = [folder for folder in folders if lowered in folder.lower()]
+        if not found and allows_typos(keyword):
+            # Typos are looked up in all folders: a longer query can fix a typo
+            found = [folder for folder, _ in self._fuzzy_folders.search(keyword) if folder in self._folders]
+        return found
+
+    @PROFILER.timed("find_notes")
+    def find_notes(self, folder, query, candidates=None):
+        """
+        Return notes of a folder matching query by title, tags or content
+        (only among candidates if given).
+        Content queries support "phrases", prefix*, OR and -excluded words;
+        the word being typed is treated as a prefix.
+        If no note matches a plain word query, returns the notes whose title or
+        tags match it with a few typos (fewest typos first).
+        An empty query matches nothing.
+        """
+        if not query.strip():
+            return []
+        keyword = query.lower()
+
+        # Treat the word being typed as a prefix
+        if query[-1].isalnum():
+            query += "*"
+        content_matches = self._search_index.search(query)
+        tag_matches = self._tag_index.filter(self._tag_index.tags_matching(keyword), match_all=False)
+
+        if candidates is None:
+            candidates = self._folders.get(folder, {}).values()
+        found = [note for note in candidates
+                 if note.get_id() in content_matches or note.get_id() in tag_matches
+                 or keyword in note.get_title().lower()]
+        if not found and allows_typos(keyword):
+            # Typos are looked up in the whole folder: a longer query can fix a typo
+            found = [self._notes_by_id[note_id] for note_id, _ in self._fuzzy_notes.search(keyword)
+                     if self._note_folders.get(note_id) == folder]
+        return found
+
+    def filter_notes_by_tags(self, tags, match_all=True):
+        """
+        Return (folder, note) pairs of every folder having all (or any) of the tags,
+        sorted by folder and title.
+        """
+        note_ids = self._tag_index.filter(tags, match_all)
+        pairs = [(self._note_folders.get(note_id), self._notes_by_id[note_id]) for note_id in note_ids]
+        pairs.sort(key=lambda pair: (pair[0] or "", pair[1].get_title().casefold()))
+        return pairs
+
+    # ================== Folders ================== #
+
+    def add_folder(self, name):
+        """Create an empty folder; returns its (stripped) name."""
+        name = name.strip()
+        if not name:
+            raise ValueError("Folder name cannot be empty.")
+        if name in self._folders:
+            raise ValueError("Folder name already exists!")
+        self._folders[name] = {}
+        self._fuzzy_folders.add(name, name)
+        self._touch_folder(name)
+        self._save_change(self._writer.add_folder, name)
+        return name
+
+    def rename_folder(self, old_name, new_name):
+        """Rename a folder (it moves to the end of the folder order)."""
+        if new_name in self._folders:
+            raise ValueError("Folder name already exists!")
+        # Move notes to new folder name
+        self._folders[new_name] = self._folders.pop(old_name)
+        for note_id in self._folders[new_name]:
+            self._note_folders[note_id] = new_name
+        self._fuzzy_folders.remove(old_name)
+        self._fuzzy_folders.add(new_name, new_name)
+        self._folder_changes.pop(old_name, None)
+        self._touch_folder(new_name)
+        self._save_change(self._writer.rename_folder, old_name, new_name)
+
+    def delete_folder(self, name):
+        """Delete a folder and all its notes."""
+        for note in self._folders[name].values():
+            self._unindex_note(note)
+            self._images.release_note(note.get_id())
+        del self._folders[name]
+        self._fuzzy_folders.remove(name)
+        self._touch_folder(name)  # the saved file still has it
+        self._save_change(self._writer.delete_folder, name)
+
+    # ================== Notes ================== #
+
+    def add_note(self, folder, title, content_blocks=None, tags=None, link=None):
+        """Create a note at the end of a folder; returns the new Note."""
+        if folder not in self._folders:
+            raise KeyError(folder)
+        note = Note(title)
+        note.set_content_blocks(content_blocks or [])
+        note.set_tags(tags or [])
+        note.set_link(link or [])
+        self._folders[folder][note.get_id()] = note
+        self._index_note(note, folder)
+        self._images.set_note_images(note.get_id(), self._images.images_of(note.get_content_blocks()))
+        self._save_note(folder, note)
+        return note
+
+    def update_note(self, note_id, title=None, content_blocks=None, tags=None, link=None):
+        """Change the given fields of a note, re-index and save it; returns the note."""
+        note = self._notes_by_id[note_id]
+        if title is not None:
+            note.set_title(title)
+        if content_blocks is not None:
+            note.set_content_blocks(content_blocks)
+            self._images.set_note_images(note_id, self._images.images_of(content_blocks))
+        if tags is not None:
+            note.set_tags(tags)
+        if link is not None:
+            note.set_link(link)
+        folder = self._note_folders[note_id]
+        self._index_note(note, folder)
+        self._save_note(folder, note)
+        return note
+
+    def delete_note(self, note_id):
+        """Delete a note."""
+        note = self._notes_by_id[note_id]
+        folder = self._note_folders[note_id]
+        self._unindex_note(note)
+        self._images.release_note(note_id)
+        del self._folders[folder][note_id]
+        self._touch_folder(folder)
+        self._save_change(self._writer.delete_note, folder, note_id)
+
+    # ================== Images ================== #
+
+    def ingest_image(self, path):
+        """
+        Copy an image into the image store; returns the path for the image block.
+        Raises OSError if the file cannot be read.
+        """
+        return self._images.ingest(path)
+
+    def ingest_images(self, content_blocks):
+        """
+        Return content blocks whose images point into the image store
+        (images already stored or missing keep their path).
+        """
+        blocks = []
+        for block in content_blocks:
+            path = block.get("path") if block.get("type") == "image" else None
+            if path and self._images.image_name(path) is None and os.path.isfile(path):
+                block = dict(block, path=self._images.ingest(path))
+            blocks.append(block)
+        return blocks
+
+    def collect_images(self):
+        """
+        Recount the image references of every note (reads all note bodies) and
+        delete every stored image no note uses; returns (used, deleted).
+        """
+        self._writer.flush()
+        used = self._images.rebuild((note_id, note.get_content_blocks())
+                                    for note_id, note in self._notes_by_id.items())
+        return used, self._images.collect_garbage(everything=True)
+
+    def rename_tag(self, old_tag, new_tag):
+        """
+        Rename a tag on every note having it (merges into new_tag if it exists).
+        Only the affected notes are updated and saved.
+        Returns the number of changed notes.
+        """
+        note_ids = self._tag_index.notes_with(old_tag)
+        for note_id in note_ids:
+            self.update_note(note_id, tags=self._tag_index.renamed_tags(note_id, old_tag, new_tag))
+        return len(note_ids)
+
+    # ============ Incremental saving (journal) ============ #
+
+    def _save_note(self, folder, note):
+        """Save one new or edited note without rewriting the other notes."""
+        self._change_seq += 1
+        self._note_changes[note.get_id()] = self._change_seq
+        self._folder_changes[folder] = self._change_seq
+        self._save_change(self._writer.put_note, folder, note.to_dict())
+
+    def _touch_folder(self, folder):
+        """Record a change of a folder (its notes, name or existence)."""
+        self._change_seq += 1
+        self._folder_changes[folder] = self._change_seq
+
+    def _save_change(self, write, *args):
+        """
+        Hand one change to the writer (journal record or database row).
+        Falls back to a full save (compaction) once the journal is large.
+        """
+        if self._batching:
+            return  # saved by batch()
+        write(*args)
+        if not self._compaction_pending and self._store.needs_compaction():
+            self.save_to_file()
+
+
+def _load_events(folders_data):
+    """Turn {folder: [note dict, ...]} into iter_load() events (storages read at once)."""
+    for folder, notes in folders_data.items():
+        yield "folder", folder, None, 1.0
+        for data in notes:
+            yield "note", folder, data, 1.0
+
+
+# ================== Command line ================== #
+
+def import_files(library, folder, paths):
+    """
+    Import notes into a folder (created if missing); returns the number of notes.
+    - Text files (.txt, .md, ...) become one note each, titled by the file name
+    - NoteApp JSON data files ({folder: [note, ...]}) are merged folder by folder,
+      their images are copied into the image store
+    """
+    with library.batch():
+        count = _import_paths(library, folder, paths)
+    return count
+
+
+def _import_paths(library, folder, paths):
+    """Add the notes of every path (see import_files)."""
+    count = 0
+    for path in paths:
+        if path.endswith(".json"):
+            data = JournalStore(path).load()
+            for data_folder, notes in data.items():
+                if data_folder not in library.get_folders():
+                    library.add_folder(data_folder)
+                for note in notes:
+                    blocks = library.ingest_images(note.get("content_blocks", []))
+                    library.add_note(data_folder, note.get("title", ""), blocks, note.get("tags", []), note.get("link", []))
+                    count += 1
+            continue
+        if folder not in library.get_folders():
+            library.add_folder(folder)
+        with open(path, "r", encoding="utf-8") as file:
+            text = file.read()
+        title = os.path.splitext(os.path.basename(path))[0]
+        library.add_note(folder, title, [{"type": "text", "content": text}] if text else [])
+        count += 1
+    return count
+
+
+def ingest_all_images(library):
+    """
+    Move the images of older notes (absolute paths) into the image store and
+    make their thumbnails; returns the number of changed notes.
+    """
+    changed = []
+    with library.batch():
+        notes = [note for folder in library.list_folders() for note in library.list_notes(folder)]
+        for note in notes:
+            blocks = note.get_content_blocks()
+            stored = library.ingest_images(blocks)
+            if stored != blocks:
+                library.update_note(note.get_id(), content_blocks=stored)
+                changed.append(stored)
+    try:
+        from note_images import ThumbnailCache  # needs Pillow
+    except ImportError:
+        return len(changed)
+    thumbnails = ThumbnailCache(images=library.get_images())
+    for blocks in changed:
+        for block in blocks:
+            if block["type"] == "image":
+                try:
+                    thumbnails.load_thumbnail(block["path"])
+                except OSError:
+                    pass  # made on first display instead
+    return len(changed)
+
+
+def export_notes(library, path, folders=None):
+    """Write folders (default: all) as a JSON data file; returns the number of notes."""
+    data = {
+        folder: [note.to_dict() for note in library.list_notes(folder)]
+        for folder in (folders or library.list_folders())
+    }
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=4, ensure_ascii=False)
+    return sum(len(notes) for notes in data.values())
+
+
+def main(argv=None):
+    """
+    Command line for batch jobs without a display:
+      python note_core.py list [FOLDER]
+      python note_core.py search QUERY [--limit N]
+      python note_core.py import --folder F FILE...
+      python note_core.py export OUT.json [--folder F ...]
+      python note_core.py compact [--format json|msgpack]
+      python note_core.py images ingest|gc
+    list, search and export open the storage read-only and never change the data files.
+    (Converting between storage engines is done by note_storage.py to-db / from-db.)
+    """
+    parser = argparse.ArgumentParser(description="NoteApp without the user interface")
+    parser.add_argument("--settings", default=None, help="settings file (default: notes_settings.json)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    list_parser = commands.add_parser("list", help="list folders, or the notes of a folder")
+    list_parser.add_argument("folder", nargs="?")
+    search_parser = commands.add_parser("search", help="search all notes")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--limit", type=int, default=20)
+    import_parser = commands.add_parser("import", help="import text files or JSON data files")
+    import_parser.add_argument("files", nargs="+")
+    import_parser.add_argument("--folder", default="Imported", help="folder for text files")
+    export_parser = commands.add_parser("export", help="export notes as a JSON data file")
+    export_parser.add_argument("output")
+    export_parser.add_argument("--folder", action="append", help="only this folder (repeatable)")
+    compact_parser = commands.add_parser("compact", help="rewrite the data file (JSON storage)")
+    compact_parser.add_argument("--format", choices=("json", "msgpack"), default=None, help="convert to this format")
+    images_parser = commands.add_parser("images", help="manage the image store")
+    images_parser.add_argument("action", choices=("ingest", "gc"),
+                               help="ingest: copy images of older notes into the store; gc: delete unused images")
+    args = parser.parse_args(argv)
+
+    # Commands that only read open the storage read-only: nothing is imported, migrated or repaired
+    read_only = args.command in ("list", "search", "export")
+    try:
+        store = open_store(load_settings(args.settings) if args.settings else None, read_only=read_only)
+    except ImportError as e:
+        print(e, file=sys.stderr)  # e.g. a msgpack data file without the package
+        return 1
+    if args.command == "compact":
+        if not isinstance(store, JournalStore):
+            print("This storage writes changes in place; nothing to compact.")
+            return 0
+        before, after, new_path = compact_data_file(store.get_path(), args.format)
+        print(f"{store.get_path()}: {before} bytes -> {new_path}: {after} bytes")
+        return 0
+
+    library = NoteLibrary(store)
+    library.load(read_only=read_only)
+    if library.is_migration_pending():
+        print("Note: the data file has an old format; it is converted the next time "
+              "the app saves (or by 'compact'). Note ids shown now are not kept.", file=sys.stderr)
+    try:
+        if args.command == "list":
+            if args.folder is None:
+                for folder in library.list_folders():
+                    print(f"{folder}\t{len(library.get_folders()[folder])}")
+            else:
+                for note in library.list_notes(args.folder):
+                    print(f"{note.get_id()}\t{note.get_title()}\t{' '.join(note.get_tags())}")
+        elif args.command == "search":
+            for folder, note, snippet in library.search_all_notes(args.query, args.limit):
+                print(f"{folder}\t{note.get_title()}\t{snippet}")
+        elif args.command == "import":
+            count = import_files(library, args.folder, args.files)
+            print(f"Imported {count} notes")
+        elif args.command == "export":
+            count = export_notes(library, args.output, args.folder)
+            print(f"Exported {count} notes to {args.output}")
+        elif args.command == "images" and args.action == "ingest":
+            count = ingest_all_images(library)
+            print(f"Moved the images of {count} notes into {library.get_images().get_folder()}")
+        elif args.command == "images":
+            used, deleted = library.collect_images()
+            print(f"{used} images in use, {deleted} unused images deleted")
+            try:
+                from note_images import ThumbnailCache
+            except ImportError:
+                return 0
+            print(f"{ThumbnailCache().prune()} old thumbnails deleted")
+    except (OSError, ValueError, KeyError) as e:
+        print(f"{args.command} failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        library.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
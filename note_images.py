@@ -0,0 +1,196 @@
+import os
+import time
+import queue
+import hashlib
+import tkinter as tk
+
+from note_profile import PROFILER
+
+# ================== Image Loading ================== #
+# Pillow is imported on first use (when a note with images is opened or an image
+# attached), so starting the app does not pay for it.
+
+THUMBNAIL_SIZE = (300, 300)  # size of images shown in the editor
+CACHE_FOLDER = ".thumbnails"
+CACHE_MAX_BYTES = 50 * 1024 * 1024  # prune() keeps the cache below this size
+CACHE_MAX_DAYS = 30  # prune() deletes thumbnails not used for this long
+
+
+class ThumbnailCache:
+    """
+    On-disk cache of editor thumbnails.
+    - Images of the image store (note_blobs) have their thumbnail next to them,
+      named by content hash: it never goes stale and needs no stat() of the image
+    - Other images are keyed by path + modification time + file size, so an
+      image is only decoded again when the original file changes
+    - Editing or deleting such an image leaves its old thumbnail behind: prune()
+      deletes the thumbnails not used for a while (a used one gets a new mtime)
+    """
+
+    def __init__(self, folder=CACHE_FOLDER, size=THUMBNAIL_SIZE, images=None):
+        """
+        :param images: ImageStore keeping thumbnails of its images (optional).
+        """
+        self._folder = folder
+        self._size = size
+        self._images = images
+
+    def _cache_path(self, path):
+        """Return the cache file of an image (None if the image is missing)."""
+        if self._images is not None:
+            stored_thumbnail = self._images.thumbnail_path(path, self._size)
+            if stored_thumbnail:
+                return stored_thumbnail
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{self._size[0]}x{self._size[1]}"
+        return os.path.join(self._folder, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".png")
+
+    @PROFILER.timed("image.load_thumbnail")
+    def load_thumbnail(self, path):
+        """
+        Return the thumbnail of an image as a PIL image.
+        Runs on worker threads: no Tk calls here.
+        """
+        from PIL import Image
+
+        cache_path = self._cache_path(path)
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with Image.open(cache_path) as cached:
+                    cached.load()
+                    thumbnail = cached.copy()
+                os.utime(cache_path)  # recently used: kept by prune()
+                return thumbnail
+            except OSError:
+                pass  # broken cache file: decode the original again
+
+        with Image.open(path) as img:
+            img.thumbnail(self._size)
+            thumbnail = img.copy()
+
+        if cache_path:
+            self._store(thumbnail, cache_path)
+        return thumbnail
+
+    def _store(self, thumbnail, cache_path):
+        """Save a thumbnail in the cache (errors are ignored, the cache is optional)."""
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            if thumbnail.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+                thumbnail = thumbnail.convert("RGBA")
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            thumbnail.save(tmp_path, "PNG")
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
+
+    def prune(self, max_bytes=CACHE_MAX_BYTES, max_days=CACHE_MAX_DAYS):
+        """
+        Delete the cached thumbnails of the cache folder not used for max_days,
+        then the least recently used ones until the folder is below max_bytes.
+        (Thumbnails of the image store are deleted with their image.)
+        Returns the number of deleted files.
+        """
+        try:
+            entries = [entry for entry in os.scandir(self._folder) if entry.is_file()]
+        except OSError:
+            return 0
+        files = []
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()  # least recently used first
+        too_old = time.time() - max_days * 24 * 3600
+        total = sum(size for _, size, _ in files)
+        deleted = 0
+        for mtime, size, path in files:
+            if mtime >= too_old and total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            deleted += 1
+        return deleted
+
+
+class ImageLoader:
+    """
+    Decodes images on a thread pool and delivers them to Tk on the main thread.
+    Worker threads only produce PIL images; the Tk PhotoImage is created when
+    the main loop polls for finished work.
+    """
+
+    def __init__(self, widget, cache=None, workers=2, poll_ms=30):
+        """
+        :param widget: Any Tk widget (used for after() polling).
+        :param cache: ThumbnailCache to use.
+        :param workers: Number of decoding threads.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        self._widget = widget
+        self._cache = cache or ThumbnailCache()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-loader")
+        self._finished = queue.Queue()  # (future, callback) ready for the main thread
+        self._pending = 0
+        self._poll_ms = poll_ms
+        self._polling = False
+
+    def request(self, path, callback):
+        """
+        Decode an image in the background.
+        callback(photo, error) is called on the main thread with a PhotoImage,
+        or with photo=None and the exception if decoding failed.
+        """
+        future = self._executor.submit(self._cache.load_thumbnail, path)
+        future.add_done_callback(lambda done: self._finished.put((done, callback)))
+        self._pending += 1
+        if not self._polling:
+            self._polling = True
+            self._widget.after(self._poll_ms, self._poll)
+
+    def _poll(self):
+        """Hand finished images to their callbacks (main thread)."""
+        from PIL import ImageTk
+
+        while True:
+            try:
+                future, callback = self._finished.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            try:
+                with PROFILER.span("image.photo"):
+                    photo = ImageTk.PhotoImage(future.result())
+            except Exception as e:
+                callback(None, e)
+            else:
+                callback(photo, None)
+
+        if self._pending > 0:
+            self._widget.after(self._poll_ms, self._poll)
+        else:
+            self._polling = False
+
+    def get_cache(self):
+        """Return the thumbnail cache."""
+        return self._cache
+
+    def shutdown(self):
+        """Stop the worker threads (pending images are dropped)."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def make_placeholder(width=120, height=90):
+    """Return a gray box shown while an image is loading."""
+    placeholder = tk.PhotoImage(width=width, height=height)
+    placeholder.put("#dddddd", to=(0, 0, width, height))
+    return placeholder
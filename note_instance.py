@@ -0,0 +1,141 @@
+import os
+import time
+import socket
+
+# ================== Single instance ================== #
+
+LOCK_SUFFIX = ".lock"
+POLL_MS = 250  # how often the running instance checks for focus requests
+READ_RETRIES = 10  # tries to read a lock that may still be being written
+READ_RETRY_SECONDS = 0.05
+
+
+class SingleInstance:
+    """
+    Makes sure only one copy of an app works on the same data folder.
+    - The first copy listens on a localhost port written to '<name>.lock'
+    - A later copy finds the lock, asks the first one to come to the front and
+      should then exit instead of opening a second window on the same files
+    A lock left behind by a crashed copy is detected (nobody answers) and replaced.
+    The lock appears with its content already written (a complete temp file is
+    linked into place), so another copy never reads a half-written lock.
+    """
+
+    def __init__(self, name, folder="."):
+        """
+        :param name: Name of the lock file (without '.lock').
+        :param folder: Folder of the lock file (the app passes its data folder).
+        """
+        self._path = os.path.join(folder, name + LOCK_SUFFIX)
+        self._server = None  # listening socket while we are the running instance
+        self._after_id = None
+
+    def is_acquired(self):
+        """Return True if this copy is the running instance."""
+        return self._server is not None
+
+    def acquire(self):
+        """
+        Become the running instance; returns False (after asking it to come to
+        the front) if another copy already is.
+        """
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(("127.0.0.1", 0))
+        server.listen(4)
+        server.setblocking(False)
+        content = f"{server.getsockname()[1]} {os.getpid()}".encode("ascii")
+        for _ in range(2):
+            try:
+                self._create_lock(content)
+            except FileExistsError:
+                if self._notify_running():
+                    server.close()
+                    return False
+                self._remove_stale()
+                continue
+            self._server = server
+            return True
+        server.close()
+        return False  # the lock could not be replaced: do not risk two writers
+
+    def _create_lock(self, content):
+        """
+        Create the lock file with its content in one step.
+        Raises FileExistsError if another copy holds it.
+        """
+        tmp_path = f"{self._path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(content)
+        try:
+            os.link(tmp_path, self._path)  # fails if the lock exists
+        except OSError:
+            # No hard links here (e.g. FAT drives): create it exclusively and write it
+            # (this raises FileExistsError too if the lock exists)
+            fd = os.open(self._path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+            with os.fdopen(fd, "wb") as file:
+                file.write(content)
+        finally:
+            os.remove(tmp_path)
+
+    def _read_lock(self):
+        """
+        Return (port, pid) from the lock file, or None if it is unreadable.
+        An empty or partial lock is read again for a moment: without hard links it
+        is created before its content is written.
+        """
+        for attempt in range(READ_RETRIES):
+            try:
+                with open(self._path, "r", encoding="ascii") as file:
+                    port, pid = file.read().split()
+                return int(port), int(pid)
+            except FileNotFoundError:
+                return None
+            except (OSError, ValueError):
+                if attempt < READ_RETRIES - 1:
+                    time.sleep(READ_RETRY_SECONDS)
+        return None
+
+    def _notify_running(self):
+        """Ask the running instance to come to the front; returns False if it does not answer."""
+        lock = self._read_lock()
+        if lock is None:
+            return False
+        try:
+            with socket.create_connection(("127.0.0.1", lock[0]), timeout=1) as connection:
+                connection.sendall(b"focus\n")
+        except OSError:
+            return False
+        return True
+
+    def _remove_stale(self):
+        """Delete a lock whose instance is gone."""
+        try:
+            os.remove(self._path)
+        except FileNotFoundError:
+            pass
+
+    def listen(self, widget, on_focus):
+        """Call on_focus() (on the Tk thread) whenever another copy asks us to come to the front."""
+        if self._server is None:
+            return
+        while True:
+            try:
+                connection, _ = self._server.accept()
+            except (BlockingIOError, OSError):
+                break
+            connection.close()
+            on_focus()
+        self._after_id = widget.after(POLL_MS, lambda: self.listen(widget, on_focus))
+
+    def release(self, widget=None):
+        """Stop being the running instance (removes the lock if it is still ours)."""
+        if self._after_id is not None and widget is not None:
+            widget.after_cancel(self._after_id)
+        self._after_id = None
+        if self._server is None:
+            return
+        self._server.close()
+        self._server = None
+        lock = self._read_lock()
+        if lock is not None and lock[1] == os.getpid():
+            self._remove_stale()
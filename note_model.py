@@ -0,0 +1,224 @@
+import sys
+import uuid
+from array import array
+
+# ================== Note Data Classes ================== #
+
+# Block kinds stored as one byte per block (see Note._encode_blocks)
+BLOCK_TEXT = 0
+BLOCK_IMAGE = 1
+BLOCK_LINK = 2
+BLOCK_OTHER = 255  # unknown block layout, kept as the original dict
+
+BLOCK_FIELDS = {BLOCK_TEXT: ("text", "content"), BLOCK_IMAGE: ("image", "path"), BLOCK_LINK: ("link", "url")}
+BLOCK_CODES = {kind: (code, field) for code, (kind, field) in BLOCK_FIELDS.items()}
+
+EMPTY = ()
+
+
+class TagTable:
+    """
+    Stores every distinct tag string once.
+    Notes keep small integer ids instead of their own copies of "Practice", "Note", ...
+    """
+
+    def __init__(self):
+        self._ids = {}    # tag -> id
+        self._names = []  # id -> tag
+
+    def id_of(self, tag):
+        """Return the id of a tag, registering it if new."""
+        tag_id = self._ids.get(tag)
+        if tag_id is None:
+            tag_id = len(self._names)
+            tag = sys.intern(tag)
+            self._ids[tag] = tag_id
+            self._names.append(tag)
+        return tag_id
+
+    def name_of(self, tag_id):
+        """Return the tag string of an id."""
+        return self._names[tag_id]
+
+    def find(self, tag):
+        """Return the id of a known tag, or None."""
+        return self._ids.get(tag)
+
+
+TAGS = TagTable()  # shared by all notes
+
+
+class Note:
+    """
+    Represents a single note object.
+    Each note has:
+      - id (persistent unique string, never changes)
+      - title (string)
+      - content blocks (text, images, links)
+      - tags (list of labels for categorization)
+      - links (list of external references/URLs)
+
+    Notes are stored compactly (there can be hundreds of thousands of them):
+    __slots__ instead of an attribute dict, tags as ids into the shared TAGS
+    table, and content blocks as one byte string of block kinds plus a tuple
+    of values instead of one dict per block. The getters still return the
+    usual lists/dicts, so callers and to_dict()/from_dict() are unchanged.
+    """
+
+    __slots__ = ("_id", "_title", "_block_kinds", "_block_values", "_tag_ids", "_link", "_body_ref", "_body_cache",
+                 "_dirty")
+
+    def __init__(self, title, note_id=None):
+        """
+        Initialize a note with a given title.
+        A new unique id is generated unless note_id is given (loaded notes).
+        Content blocks, tags, and links are initialized as empty.
+        """
+        self._id = note_id or uuid.uuid4().hex  # Persistent note id
+        self._title = title   # Note title (private)
+        self._block_kinds = b""  # One byte per content block (BLOCK_TEXT, ...), None if unloaded
+        self._block_values = EMPTY  # Text / path / URL of every content block
+        self._tag_ids = EMPTY  # Ids of the note's tags in TAGS
+        self._link = EMPTY  # Stores note-specific links
+        self._body_ref = None  # (offset, length) of this note in the saved file
+        self._body_cache = None  # Loads content blocks on demand (lazy mode)
+        self._dirty = True  # Changed since the last full save (see is_dirty)
+
+    # ===== Encapsulation: getter and setter methods ===== #
+
+    def get_id(self):
+        """Return the persistent id of the note."""
+        return self._id
+
+    def get_title(self):
+        """Return the note title."""
+        return self._title
+
+    def set_title(self, title):
+        """Update the note title."""
+        self._title = title
+        self._dirty = True
+
+    def get_content_blocks(self):
+        """Return all content blocks (text, images, links), loading them if needed."""
+        if self._block_kinds is None:
+            # Body was not loaded yet (or was unloaded): read it from the file
+            self._encode_blocks(self._body_cache.load_body(self._id))
+        if self._body_cache is not None and self._body_ref is not None:
+            self._body_cache.touch(self)
+        return self._decode_blocks()
+
+    def set_content_blocks(self, blocks):
+        """Update content blocks for the note."""
+        self._encode_blocks(blocks)
+        self._body_ref = None  # saved copy is outdated, keep the body in memory
+        self._dirty = True
+
+    def _encode_blocks(self, blocks):
+        """Store blocks as a byte string of kinds and a tuple of values."""
+        kinds = bytearray()
+        values = []
+        for block in blocks:
+            code, field = BLOCK_CODES.get(block.get("type"), (BLOCK_OTHER, None))
+            if code != BLOCK_OTHER and len(block) == 2 and field in block:
+                kinds.append(code)
+                values.append(block[field])
+            else:
+                kinds.append(BLOCK_OTHER)
+                values.append(dict(block))
+        self._block_kinds = bytes(kinds)
+        self._block_values = tuple(values) if values else EMPTY
+
+    def _decode_blocks(self):
+        """Rebuild the list of block dictionaries."""
+        blocks = []
+        for code, value in zip(self._block_kinds, self._block_values):
+            if code == BLOCK_OTHER:
+                blocks.append(dict(value))
+            else:
+                kind, field = BLOCK_FIELDS[code]
+                blocks.append({"type": kind, field: value})
+        return blocks
+
+    # ===== Lazy loading of content blocks ===== #
+
+    def get_body_ref(self):
+        """Return where the note is stored in the saved file (or None)."""
+        return self._body_ref
+
+    def set_body_ref(self, ref, body_cache):
+        """Remember where the note is stored so its body can be unloaded."""
+        self._body_ref = ref
+        self._body_cache = body_cache
+
+    def is_content_loaded(self):
+        """Return True if the content blocks are in memory."""
+        return self._block_kinds is not None
+
+    def unload_content(self):
+        """Free the content blocks; they are read again on next access."""
+        if self._body_ref is not None:
+            self._block_kinds = None
+            self._block_values = EMPTY
+
+    def get_tags(self):
+        """Return the list of tags associated with the note."""
+        return [TAGS.name_of(tag_id) for tag_id in self._tag_ids]
+
+    def set_tags(self, tags):
+        """Update the note's tags."""
+        self._tag_ids = array("I", [TAGS.id_of(tag) for tag in tags]) if tags else EMPTY
+        self._dirty = True
+
+    def get_tag_ids(self):
+        """Return the ids (in TAGS) of the note's tags."""
+        return self._tag_ids
+
+    def get_link(self):
+        """Return stored links for the note."""
+        return list(self._link)
+
+    def set_link(self, link):
+        """Update the note's links."""
+        self._link = tuple(link) if link else EMPTY
+        self._dirty = True
+
+    # ===== Dirty tracking ===== #
+
+    def is_dirty(self):
+        """
+        Return True if the note changed since the last full save (or was never
+        part of one); clean notes are copied from the saved file as they are.
+        """
+        return self._dirty
+
+    def mark_clean(self):
+        """Record that the saved file has this exact note (set by the library)."""
+        self._dirty = False
+
+    # ===== Polymorphism support (serialization) ===== #
+    def to_dict(self, with_content=True):
+        """
+        Convert note object into a dictionary for JSON storage.
+        Includes title, content blocks, tags, and links.
+        (with_content=False leaves out the content blocks)
+        """
+        data = {"type": "note", "id": self._id, "title": self._title}
+        if with_content:
+            data["content_blocks"] = self.get_content_blocks()
+        data["tags"] = self.get_tags()
+        data["link"] = self.get_link()
+        return data
+
+    @staticmethod
+    def from_dict(data):
+        """
+        Create a Note object from dictionary data (deserialization).
+        Ensures backward compatibility with missing fields
+        (notes saved without an id get a new one).
+        """
+        n = Note(data.get("title", ""), data.get("id"))
+        n.set_content_blocks(data.get("content_blocks", []))
+        n.set_tags(data.get("tags", []))
+        n.set_link(data.get("link", []))
+        return n
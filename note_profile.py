@@ -0,0 +1,205 @@
+import io
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# ================== Instrumentation ================== #
+
+SLOW_MS = 50  # operations at least this long are reported as slow
+DEBUG_ENV = "NOTEAPP_DEBUG"  # set to 1 to also count Tk calls (small overhead)
+
+
+class Profiler:
+    """
+    Timing spans and counters for the hot paths (loading, saving, list refreshes,
+    link detection, image loading).
+    - span(name) / @timed(name) record how long an operation took
+    - count(name) increments a counter; spans remember how much their counters
+      grew meanwhile (e.g. Tk calls made by one list refresh)
+    - The last spans are kept in memory, so a "hang" can be looked at afterwards
+      (debug overlay, exported log)
+    - cProfile capture can be switched on and off while the app runs
+    Spans are cheap (two perf_counter calls) and always recorded; safe to use from
+    worker threads.
+    """
+
+    def __init__(self, slow_ms=SLOW_MS, keep=500):
+        self._slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=keep)  # finished spans, oldest first
+        self._stats = {}  # span name -> [count, total ms, max ms]
+        self._counters = {}  # counter name -> value
+        self._capture = None  # cProfile.Profile while capturing
+
+    # ===== Getter methods ===== #
+
+    def get_slow_ms(self):
+        """Return the duration (ms) from which an operation counts as slow."""
+        return self._slow_ms
+
+    def set_slow_ms(self, slow_ms):
+        """Change the duration (ms) from which an operation counts as slow."""
+        self._slow_ms = slow_ms
+
+    def get_counters(self):
+        """Return a copy of all counters."""
+        with self._lock:
+            return dict(self._counters)
+
+    def get_stats(self):
+        """Return {span name: (count, average ms, max ms)}, slowest average first."""
+        with self._lock:
+            stats = {name: (count, total / count, longest) for name, (count, total, longest) in self._stats.items()}
+        return dict(sorted(stats.items(), key=lambda item: -item[1][1]))
+
+    def recent(self, slow_only=False):
+        """Return the last spans (newest first) as dicts: name, ms, end, thread, counters."""
+        with self._lock:
+            spans = list(self._recent)
+        spans.reverse()
+        if slow_only:
+            spans = [span for span in spans if span["ms"] >= self._slow_ms]
+        return spans
+
+    # ================== Spans and counters ================== #
+
+    @contextmanager
+    def span(self, name):
+        """Time the block under name."""
+        counters = self.get_counters() if self._counters else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._finish(name, (time.perf_counter() - start) * 1000, counters)
+
+    def timed(self, name=None):
+        """Decorator: time every call of a function (name defaults to its qualified name)."""
+        def decorate(func):
+            span_name = name or func.__qualname__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def record(self, name, ms):
+        """Record an operation timed elsewhere (e.g. from a launch to the first paint)."""
+        self._finish(name, ms, None)
+
+    def count(self, name, amount=1):
+        """Add amount to a counter."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def _finish(self, name, ms, counters_before):
+        """Record a finished span."""
+        with self._lock:
+            grown = {}
+            if self._counters:
+                before = counters_before or {}
+                grown = {key: value - before.get(key, 0) for key, value in self._counters.items()
+                         if value != before.get(key, 0)}
+            self._recent.append({
+                "name": name,
+                "ms": round(ms, 3),
+                "end": time.time(),
+                "thread": threading.current_thread().name,
+                "counters": grown,
+            })
+            stats = self._stats.get(name)
+            if stats is None:
+                self._stats[name] = [1, ms, ms]
+            else:
+                stats[0] += 1
+                stats[1] += ms
+                stats[2] = max(stats[2], ms)
+
+    def clear(self):
+        """Forget every span, statistic and counter."""
+        with self._lock:
+            self._recent.clear()
+            self._stats.clear()
+            self._counters.clear()
+
+    # ================== cProfile capture ================== #
+
+    def is_capturing(self):
+        """Return True while cProfile is recording."""
+        return self._capture is not None
+
+    def start_capture(self):
+        """Start recording every function call of the calling (UI) thread."""
+        if self._capture is not None:
+            return
+        import cProfile  # deferred: only needed while capturing (keeps startup fast)
+        self._capture = cProfile.Profile()
+        self._capture.enable()
+
+    def stop_capture(self, path=None, top=25):
+        """
+        Stop recording.
+        - Saves the raw profile to path (for pstats/snakeviz) if given
+        - Returns a text report of the top functions by cumulative time
+        """
+        capture, self._capture = self._capture, None
+        if capture is None:
+            return ""
+        capture.disable()
+        if path:
+            capture.dump_stats(path)
+        import pstats
+        report = io.StringIO()
+        pstats.Stats(capture, stream=report).sort_stats("cumulative").print_stats(top)
+        return report.getvalue()
+
+    # ================== Log export ================== #
+
+    def export_log(self, path):
+        """Write statistics, counters and the recent spans as a JSON file."""
+        data = {
+            "exported": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "slow_ms": self._slow_ms,
+            "stats": {name: {"count": count, "avg_ms": round(avg, 3), "max_ms": round(longest, 3)}
+                      for name, (count, avg, longest) in self.get_stats().items()},
+            "counters": self.get_counters(),
+            "recent": self.recent(),
+        }
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=2)
+        return path
+
+
+class TkCallCounter:
+    """
+    Stands in for the Tcl interpreter of a Tk root (root.tk) and counts every
+    call made through it. Widgets created afterwards share it, so the spans of
+    list refreshes, note loading, ... show how many Tk calls they made.
+    """
+
+    def __init__(self, tk_app, profiler, counter="tk.calls"):
+        self._tk_app = tk_app
+        self._profiler = profiler
+        self._counter = counter
+
+    def call(self, *args):
+        """Forward a Tcl command, counting it."""
+        self._profiler.count(self._counter)
+        return self._tk_app.call(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._tk_app, name)
+
+
+def debug_enabled():
+    """Return True if the NOTEAPP_DEBUG environment variable asks for detailed counters."""
+    return os.environ.get(DEBUG_ENV, "") not in ("", "0")
+
+
+PROFILER = Profiler()  # shared by the app, the core library and the storage threads
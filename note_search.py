@@ -0,0 +1,703 @@
+import re
+import math
+import time
+import heapq
+from bisect import bisect_left, bisect_right, insort
+
+# ================== Full-text Search ================== #
+
+TOKEN_PATTERN = re.compile(r"\w+")
+QUERY_PATTERN = re.compile(r'-?"[^"]*"?|\S+')
+
+FIELD_GAP = 16  # position gap between fields, so phrases never span two fields
+FIELD_WEIGHTS = (3.0, 2.0, 1.0, 0.5)  # title, tags, text, link URLs (see note_fields)
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_PREFIX_TERMS = 50  # prefix expansions used for ranking
+INDEX_VERSION = 2
+
+# Keys that never change the text of a search box
+IGNORED_KEYS = {
+    "Up", "Down", "Left", "Right", "Home", "End", "Prior", "Next", "Tab", "Escape",
+    "Shift_L", "Shift_R", "Control_L", "Control_R", "Alt_L", "Alt_R",
+    "Caps_Lock", "Num_Lock", "Meta_L", "Meta_R", "Super_L", "Super_R",
+}
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens."""
+    return [token.casefold() for token in TOKEN_PATTERN.findall(text)]
+
+
+def note_fields(note):
+    """
+    Return the searchable texts of a note:
+    title, tags, text blocks and link URLs.
+    """
+    texts = []
+    urls = []
+    for block in note.get_content_blocks():
+        if block.get("type") == "text":
+            texts.append(block.get("content", ""))
+        elif block.get("type") == "link":
+            urls.append(block.get("url", ""))
+    return [note.get_title(), " ".join(note.get_tags()), "".join(texts), " ".join(urls)]
+
+
+def fuzzy_text(note):
+    """Return the short text of a note searched with typos: title and tags."""
+    return " ".join([note.get_title()] + list(note.get_tags()))
+
+
+def note_text(note):
+    """Return the plain text of a note's text blocks."""
+    return "".join(block.get("content", "") for block in note.get_content_blocks() if block.get("type") == "text")
+
+
+def make_snippet(text, query, width=80):
+    """
+    Return a one-line extract of text around the first query word.
+    Falls back to the start of the text when no word is found.
+    """
+    words = [token for token in tokenize(query) if token not in ("or", "and", "not")]
+    start = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        token = match.group().casefold()
+        if any(token.startswith(word) for word in words):
+            start = max(0, match.start() - width // 4)
+            break
+    snippet = " ".join(text[start:start + width].split())
+    prefix = "..." if start > 0 else ""
+    suffix = "..." if start + width < len(text) else ""
+    return f"{prefix}{snippet}{suffix}"
+
+
+def parse_query(query):
+    """
+    Split a search query into OR groups of (negate, clause) pairs.
+    'linux kernel OR -windows' -> [[(False, 'linux'), (False, 'kernel')], [(True, 'windows')]]
+    """
+    groups = [[]]
+    negate_next = False
+    for part in QUERY_PATTERN.findall(query):
+        if part == "OR":
+            groups.append([])
+        elif part == "AND":
+            continue
+        elif part == "NOT":
+            negate_next = True
+        else:
+            negate = negate_next or (part.startswith("-") and len(part) > 1)
+            groups[-1].append((negate, part.lstrip("-")))
+            negate_next = False
+    return groups
+
+
+class InvertedIndex:
+    """
+    Inverted index over note content: token -> {doc: [positions]}.
+    - Documents are added/updated/removed one at a time (incremental)
+    - search() supports words, prefixes (word*), phrases ("two words"),
+      AND (default), OR and NOT/-word
+    Documents are identified by any hashable key (the library uses note ids).
+    """
+
+    def __init__(self):
+        self._postings = {}     # token -> {doc number: [positions]}
+        self._terms = []        # sorted tokens, used for prefix queries
+        self._doc_terms = {}    # doc number -> tokens of the document
+        self._doc_numbers = {}  # key -> doc number
+        self._keys = {}         # doc number -> key
+        self._doc_lengths = {}  # doc number -> number of tokens
+        self._doc_fields = {}   # doc number -> start position of every field
+        self._total_length = 0
+        self._next_doc = 0
+
+    def __len__(self):
+        """Return the number of indexed documents."""
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._doc_numbers
+
+    # ================== Updating ================== #
+
+    def add(self, key, fields):
+        """
+        Index (or re-index) a document.
+        :param key: Document key.
+        :param fields: List of texts (e.g. from note_fields()).
+        """
+        if key in self._doc_numbers:
+            self.remove(key)
+
+        positions = {}
+        starts = []
+        position = 0
+        length = 0
+        for text in fields:
+            starts.append(position)
+            for token in tokenize(text):
+                positions.setdefault(token, []).append(position)
+                position += 1
+                length += 1
+            position += FIELD_GAP
+        self._add_postings(key, positions, length, tuple(starts))
+
+    def _add_postings(self, key, positions, length, starts):
+        """Register a document given as {token: [positions]}."""
+        doc = self._register(key, length, starts)
+        self._doc_terms[doc] = tuple(positions)
+        for token, token_positions in positions.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                insort(self._terms, token)
+            postings[doc] = token_positions
+
+    def _register(self, key, length, starts):
+        """Give a new document its number and statistics."""
+        doc = self._next_doc
+        self._next_doc += 1
+        self._doc_numbers[key] = doc
+        self._keys[doc] = key
+        self._doc_lengths[doc] = length
+        self._doc_fields[doc] = starts
+        self._total_length += length
+        return doc
+
+    def remove(self, key):
+        """Remove a document from the index (ignored if not indexed)."""
+        doc = self._doc_numbers.pop(key, None)
+        if doc is None:
+            return
+        del self._keys[doc]
+        del self._doc_fields[doc]
+        self._total_length -= self._doc_lengths.pop(doc)
+        for token in self._doc_terms.pop(doc):
+            postings = self._postings[token]
+            del postings[doc]
+            if not postings:
+                del self._postings[token]
+                del self._terms[bisect_left(self._terms, token)]
+
+    def clear(self):
+        """Remove every document."""
+        self.__init__()
+
+    # ================== Searching ================== #
+
+    def search(self, query):
+        """
+        Return the set of keys matching the query.
+        Examples: 'linux kernel', 'oper*', '"operating system"',
+                  'linux OR windows', 'linux -windows', 'linux NOT windows'
+        """
+        return {self._keys[doc] for doc in self._match_query(query)}
+
+    def rank(self, query, limit=50):
+        """
+        Return up to limit (key, score) pairs matching the query, best first.
+        Scores are BM25 over the query words, with title and tag matches
+        weighted higher than text and link matches.
+        Groups with only excluded words match nothing here, as in the SQLite
+        search: there is no word to score them by.
+        """
+        docs = self._match_query(query, exclusions_only=False)
+        if not docs:
+            return []
+
+        doc_count = len(self._keys)
+        average_length = max(self._total_length / doc_count, 1.0)
+        scores = dict.fromkeys(docs, 0.0)
+        for token in self._query_terms(query):
+            postings = self._postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            matched = docs & postings.keys() if len(docs) < len(postings) else postings.keys() & docs
+            for doc in matched:
+                starts = self._doc_fields[doc]
+                tf = sum(FIELD_WEIGHTS[bisect_right(starts, position) - 1] for position in postings[doc])
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_lengths[doc] / average_length)
+                scores[doc] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(self._keys[doc], score) for doc, score in best]
+
+    def _query_terms(self, query):
+        """Return the tokens a query searches for (prefixes expanded), without exclusions."""
+        terms = []
+        negate_next = False
+        for part in QUERY_PATTERN.findall(query):
+            if part in ("OR", "AND"):
+                continue
+            if part == "NOT":
+                negate_next = True
+                continue
+            if negate_next or (part.startswith("-") and len(part) > 1):
+                negate_next = False
+                continue
+            if part.endswith("*") and not part.startswith('"'):
+                prefix = part.rstrip("*").casefold()
+                if not prefix:
+                    continue
+                start = bisect_left(self._terms, prefix)
+                for token in self._terms[start:start + MAX_PREFIX_TERMS]:
+                    if not token.startswith(prefix):
+                        break
+                    terms.append(token)
+            else:
+                terms.extend(tokenize(part))
+        return set(terms)
+
+    def _match_query(self, query, exclusions_only=True):
+        """
+        Return the doc numbers matching a query.
+        exclusions_only=False: groups without a positive clause match nothing
+        (instead of every document without the excluded words).
+        """
+        result = set()
+        for group in parse_query(query):
+            result |= self._match_group(group, exclusions_only)
+        return result
+
+    def _match_group(self, group, exclusions_only=True):
+        """Return doc numbers matching all positive and no negative clauses."""
+        positive = [self._match_clause(clause) for negate, clause in group if not negate]
+        negative = [self._match_clause(clause) for negate, clause in group if negate]
+        if not positive:
+            if not negative or not exclusions_only:
+                return set()
+            docs = set(self._keys)  # only exclusions: start from everything
+        else:
+            positive.sort(key=len)
+            docs = set(positive[0])
+            for matches in positive[1:]:
+                docs &= matches
+                if not docs:
+                    return docs
+        for matches in negative:
+            docs -= matches
+        return docs
+
+    def _match_clause(self, clause):
+        """Return doc numbers matching one word, prefix or phrase."""
+        if clause.startswith('"'):
+            return self._match_phrase(tokenize(clause))
+        if clause.endswith("*"):
+            return self._match_prefix(clause.rstrip("*").casefold())
+
+        tokens = tokenize(clause)
+        if len(tokens) == 1:
+            return set(self._postings.get(tokens[0], ()))
+        return self._match_phrase(tokens)  # e.g. 'e-mail' is read as a phrase
+
+    def _match_prefix(self, prefix):
+        """Return doc numbers containing a token that starts with prefix."""
+        if not prefix:
+            return set()
+        docs = set()
+        start = bisect_left(self._terms, prefix)
+        for token in self._terms[start:]:
+            if not token.startswith(prefix):
+                break
+            docs.update(self._postings[token])
+        return docs
+
+    def _match_phrase(self, tokens):
+        """Return doc numbers containing the tokens next to each other."""
+        if not tokens:
+            return set()
+        postings = [self._postings.get(token) for token in tokens]
+        if not all(postings):
+            return set()
+
+        candidates = set(postings[0])
+        for token_postings in postings[1:]:
+            candidates &= token_postings.keys()
+
+        docs = set()
+        for doc in candidates:
+            following = [set(token_postings[doc]) for token_postings in postings[1:]]
+            for start in postings[0][doc]:
+                if all(start + offset + 1 in positions for offset, positions in enumerate(following)):
+                    docs.add(doc)
+                    break
+        return docs
+
+    # ================== Persistence ================== #
+
+    def to_data(self, saved_keys):
+        """
+        Return the index as JSON-ready data.
+        :param saved_keys: {key: persistent key}; documents without one are skipped.
+        """
+        docs = []
+        numbers = {}
+        for doc, key in self._keys.items():
+            saved_key = saved_keys.get(key)
+            if saved_key is not None:
+                numbers[doc] = len(docs)
+                docs.append([saved_key, self._doc_lengths[doc], self._doc_fields[doc]])
+
+        postings = {}
+        for token, token_postings in self._postings.items():
+            entries = [[numbers[doc], positions] for doc, positions in token_postings.items() if doc in numbers]
+            if entries:
+                postings[token] = entries
+        return {"version": INDEX_VERSION, "docs": docs, "postings": postings}
+
+    def load_data(self, data, keys):
+        """
+        Add the documents of saved index data.
+        :param keys: {persistent key: key}; saved documents without one are skipped.
+        Data saved by an older version is ignored (those documents get re-indexed).
+        """
+        if data.get("version") != INDEX_VERSION:
+            return
+        doc_numbers = []
+        for saved_key, length, starts in data["docs"]:
+            key = keys.get(saved_key)
+            if key is None or key in self._doc_numbers:
+                doc_numbers.append(None)
+                continue
+            doc = self._register(key, length, tuple(starts))
+            self._doc_terms[doc] = []
+            doc_numbers.append(doc)
+
+        for token, entries in data["postings"].items():
+            for number, positions in entries:
+                doc = doc_numbers[number]
+                if doc is not None:
+                    self._postings.setdefault(token, {})[doc] = positions
+                    self._doc_terms[doc].append(token)
+        for doc in doc_numbers:
+            if doc is not None:
+                self._doc_terms[doc] = tuple(self._doc_terms[doc])
+        self._terms = sorted(self._postings)  # one sort instead of many inserts
+
+
+# ================== Tag Index ================== #
+
+class TagIndex:
+    """
+    Maintained index of tags: tag -> set of note ids (the count is the set size).
+    - Filtering by several tags (AND / OR) only touches the notes of those tags
+    - Renaming or merging a tag returns just the notes that have to change
+    """
+
+    def __init__(self):
+        self._notes_by_tag = {}  # tag -> set of note ids
+        self._tags_by_note = {}  # note id -> tuple of its tags
+
+    def __len__(self):
+        """Return the number of distinct tags."""
+        return len(self._notes_by_tag)
+
+    def add(self, note, tags):
+        """Index (or re-index) the tags of a note."""
+        self.remove(note)
+        tags = tuple(dict.fromkeys(tags))  # unique, in order
+        if not tags:
+            return
+        self._tags_by_note[note] = tags
+        for tag in tags:
+            self._notes_by_tag.setdefault(tag, set()).add(note)
+
+    def remove(self, note):
+        """Remove a note from the index (ignored if not indexed)."""
+        for tag in self._tags_by_note.pop(note, ()):
+            notes = self._notes_by_tag[tag]
+            notes.discard(note)
+            if not notes:
+                del self._notes_by_tag[tag]
+
+    def clear(self):
+        """Remove every note."""
+        self._notes_by_tag.clear()
+        self._tags_by_note.clear()
+
+    def counts(self):
+        """Return [(tag, number of notes)], most used tags first."""
+        return sorted(((tag, len(notes)) for tag, notes in self._notes_by_tag.items()),
+                      key=lambda item: (-item[1], item[0].casefold()))
+
+    def tags_matching(self, keyword):
+        """Return the tags containing keyword (case-insensitive)."""
+        keyword = keyword.casefold()
+        return [tag for tag in self._notes_by_tag if keyword in tag.casefold()]
+
+    def notes_with(self, tag):
+        """Return the set of notes having a tag."""
+        return set(self._notes_by_tag.get(tag, ()))
+
+    def filter(self, tags, match_all=True):
+        """
+        Return the notes having all (match_all=True) or any of the tags.
+        """
+        sets = [self._notes_by_tag.get(tag, set()) for tag in tags]
+        if not sets:
+            return set()
+        if not match_all:
+            return set().union(*sets)
+        sets.sort(key=len)
+        result = set(sets[0])
+        for notes in sets[1:]:
+            result &= notes
+            if not result:
+                break
+        return result
+
+    def renamed_tags(self, note, old_tag, new_tag):
+        """Return the tags of a note after renaming/merging old_tag into new_tag."""
+        return list(dict.fromkeys(new_tag if tag == old_tag else tag for tag in self._tags_by_note.get(note, ())))
+
+
+# ================== Fuzzy Search ================== #
+
+FUZZY_MIN_LENGTH = 3  # shorter query words must match exactly (as a prefix)
+
+
+def max_typos(word):
+    """Return how many typos are tolerated in a query word of this length."""
+    if len(word) < FUZZY_MIN_LENGTH:
+        return 0
+    return 1 if len(word) < 6 else 2
+
+
+def trigrams(word, prefix=False):
+    """
+    Return the set of trigrams of a word padded with '$' ('$$w', '$wo', ..., 'rd$').
+    prefix=True leaves out the end so it also matches longer words.
+    """
+    padded = "$$" + word + ("" if prefix else "$")
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def allows_typos(query):
+    """
+    Return True if a query can match with typos: only words (no "phrases",
+    -excluded words, OR or NOT) and at least one long enough to have a typo.
+    """
+    if '"' in query or any(part.startswith("-") or part in ("OR", "NOT") for part in query.split()):
+        return False
+    return any(max_typos(word) for word in tokenize(query))
+
+
+def edit_distance(query, word, limit, prefix=False):
+    """
+    Return the edit distance between query and word (a swap of two neighbouring
+    letters counts as one typo), or None if it is above limit.
+    prefix=True compares with the closest prefix of word instead.
+    """
+    if not prefix and abs(len(query) - len(word)) > limit:
+        return None
+    before = None
+    previous = list(range(len(word) + 1))
+    for i, char in enumerate(query, 1):
+        current = [i] + [0] * len(word)
+        for j, other in enumerate(word, 1):
+            cost = 0 if char == other else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if before is not None and j > 1 and char == word[j - 2] and query[i - 2] == other:
+                value = min(value, before[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return None  # every alignment already has too many typos
+        before, previous = previous, current
+    distance = min(previous) if prefix else previous[-1]
+    return distance if distance <= limit else None
+
+
+class FuzzyIndex:
+    """
+    Trigram index of short texts (titles, tags, folder names) for typo-tolerant search.
+    - Every word is split into trigrams; a query word is only compared with the
+      words sharing enough trigrams with it (each typo changes at most 3 of them)
+    - Those few candidates are checked with a bounded edit distance, so
+      "opertaing" finds "Operating System" without scanning every title
+    - The last query word is matched as a prefix (the word being typed)
+    Entries are added, replaced and removed one at a time as notes change.
+    """
+
+    def __init__(self):
+        self._words_by_key = {}  # key -> tuple of its words
+        self._keys_by_word = {}  # word -> set of keys using it
+        self._words_by_trigram = {}  # trigram -> set of words
+
+    def __len__(self):
+        """Return the number of indexed entries."""
+        return len(self._words_by_key)
+
+    def __contains__(self, key):
+        return key in self._words_by_key
+
+    def add(self, key, text):
+        """Index (or re-index) the text of an entry."""
+        words = tuple(dict.fromkeys(tokenize(text)))
+        if self._words_by_key.get(key) == words:
+            return  # unchanged (e.g. only the content of a note was edited)
+        self.remove(key)
+        if not words:
+            return
+        self._words_by_key[key] = words
+        for word in words:
+            keys = self._keys_by_word.get(word)
+            if keys is None:
+                keys = self._keys_by_word[word] = set()
+                for gram in trigrams(word):
+                    self._words_by_trigram.setdefault(gram, set()).add(word)
+            keys.add(key)
+
+    def remove(self, key):
+        """Remove an entry from the index (ignored if not indexed)."""
+        for word in self._words_by_key.pop(key, ()):
+            keys = self._keys_by_word[word]
+            keys.discard(key)
+            if keys:
+                continue
+            del self._keys_by_word[word]
+            for gram in trigrams(word):
+                words = self._words_by_trigram[gram]
+                words.discard(word)
+                if not words:
+                    del self._words_by_trigram[gram]
+
+    def clear(self):
+        """Remove every entry."""
+        self._words_by_key.clear()
+        self._keys_by_word.clear()
+        self._words_by_trigram.clear()
+
+    def _similar_words(self, query, prefix):
+        """Return {indexed word: typos} for the words close enough to a query word."""
+        limit = max_typos(query)
+        grams = trigrams(query, prefix)
+        needed = max(1, len(grams) - 3 * limit)
+        shared = {}
+        for gram in grams:
+            for word in self._words_by_trigram.get(gram, ()):
+                shared[word] = shared.get(word, 0) + 1
+        similar = {}
+        for word, count in shared.items():
+            if count < needed:
+                continue
+            distance = edit_distance(query, word, limit, prefix)
+            if distance is not None:
+                similar[word] = distance
+        return similar
+
+    def search(self, query, limit=None):
+        """
+        Return [(key, typos)] of the entries matching every query word with few
+        typos, fewest typos first.
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        best = None  # key -> total typos
+        for position, word in enumerate(words):
+            typos = {}
+            for similar, distance in self._similar_words(word, prefix=position == len(words) - 1).items():
+                for key in self._keys_by_word[similar]:
+                    if best is None or key in best:
+                        if distance < typos.get(key, distance + 1):
+                            typos[key] = distance
+            if best is not None:
+                typos = {key: best[key] + distance for key, distance in typos.items()}
+            best = typos
+            if not best:
+                return []
+        ranked = sorted(best.items(), key=lambda item: item[1])
+        return ranked if limit is None else ranked[:limit]
+
+# ================== Live Search ================== #
+
+def is_refinement(old_query, new_query):
+    """
+    Return True if every result of new_query is also a result of old_query,
+    i.e. the user only typed more characters and used no OR/NOT/phrase syntax.
+    """
+    if not old_query or not new_query.casefold().startswith(old_query.casefold()):
+        return False
+    if '"' in new_query or "-" in new_query:
+        return False
+    return not any(word in ("OR", "NOT") for word in new_query.split())
+
+
+class SearchScheduler:
+    """
+    Runs the live search of an Entry without redoing work on every keystroke.
+    - Keys that do not change the text (arrows, shift, ...) are ignored
+    - Keystrokes typed within `delay` ms are coalesced into one search
+    - A pending search is cancelled when a newer keystroke arrives
+    - If the new query refines the previous one, only the previous results are searched
+    - The latency of every search is measured and reported
+    """
+
+    def __init__(self, entry, search, show, delay=150, on_latency=None):
+        """
+        :param entry: Tk Entry holding the query (also used for after()).
+        :param search: search(query, candidates) -> results; candidates is None
+                       or the results of the previous (broader) query.
+        :param show: show(query, results) updates the UI; results is None for an empty query.
+        :param delay: Milliseconds to wait for more keystrokes.
+        :param on_latency: Optional callback(query, results, milliseconds).
+        """
+        self._entry = entry
+        self._search = search
+        self._show = show
+        self._delay = delay
+        self._on_latency = on_latency
+        self._pending = None       # after() id of the scheduled search
+        self._last_query = None
+        self._last_results = None
+        self._last_latency = None  # milliseconds
+
+    def get_last_latency(self):
+        """Return how long the last search took (milliseconds)."""
+        return self._last_latency
+
+    def on_key(self, event=None):
+        """<KeyRelease> handler: schedule a search unless the key is irrelevant."""
+        if event is not None and event.keysym in IGNORED_KEYS:
+            return
+        self.schedule()
+
+    def schedule(self):
+        """Run a search after the delay, replacing any pending one."""
+        self.cancel()
+        self._pending = self._entry.after(self._delay, self.run_now)
+
+    def cancel(self):
+        """Cancel the pending search (if any)."""
+        if self._pending is not None:
+            self._entry.after_cancel(self._pending)
+            self._pending = None
+
+    def reset(self):
+        """Forget previous results (call when the searched data changed)."""
+        self._last_query = None
+        self._last_results = None
+
+    def run_now(self, force=False):
+        """Run the search for the current text immediately."""
+        self.cancel()
+        query = self._entry.get().strip()
+        if query == self._last_query and not force:
+            return  # text did not change since the last search
+
+        start = time.perf_counter()
+        if not query:
+            results = None
+        else:
+            refine = self._last_results is not None and is_refinement(self._last_query, query)
+            results = self._search(query, self._last_results if refine else None)
+        self._show(query, results)
+        self._last_latency = (time.perf_counter() - start) * 1000
+
+        self._last_query = query
+        self._last_results = results
+        if self._on_latency is not None:
+            self._on_latency(query, results, self._last_latency)
@@ -0,0 +1,394 @@
+import os
+import json
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from note_storage import atomic_write
+
+# ================== Sharded Storage ================== #
+
+SHARDS_FOLDER = "notes_data.shards"
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+SHARD_INDEX_VERSION = 1
+LOAD_WORKERS = 4  # shards read in parallel
+
+
+class ShardedStore:
+    """
+    Sharded persistence engine for the NoteApp (same interface as JournalStore).
+    Files in the shards folder:
+      - manifest.json: folder order, the shard file of every folder and a
+        generation number (the data version)
+      - <shard>.json: the notes of one folder, as a compact JSON list
+      - <shard>.index: id, title, tags, link and byte range of every note of the shard
+    Saving a note rewrites only the shard of its folder; adding, renaming or
+    deleting a folder rewrites only the (small) manifest. Shard files are named
+    by a random id, so a rename never touches them.
+
+    The manifest is always written last: a crash in the middle of a change
+    leaves the previous manifest, which still names complete shard files.
+    Shards are read on a thread pool (file reads overlap; decoding still takes
+    turns on the GIL). load(lazy=True) only reads the shard indexes.
+
+    Writes may run on a background thread (see WriteBehind) while the UI thread
+    reads saved note bodies, so shard files and byte ranges are used under a lock.
+    """
+
+    def __init__(self, path=SHARDS_FOLDER, workers=LOAD_WORKERS):
+        """
+        :param path: Shards folder (created on first write).
+        :param workers: Number of shards read at the same time while loading.
+        """
+        self._path = path
+        self._workers = workers
+        self._lock = threading.Lock()  # guards shard files, the manifest and _note_refs
+        self._folders = {}  # folder -> shard name, in folder order (the manifest)
+        self._generation = 0  # bumped by every write
+        self._note_refs = {}  # note id -> (shard, offset, length) in the shard file
+        self._shard_ids = {}  # shard -> ids of its notes
+        self._read_manifest()
+
+    # ===== Getter methods ===== #
+
+    def get_path(self):
+        """Return the shards folder."""
+        return self._path
+
+    def get_snapshot_digest(self):
+        """Return a version of the stored data (changes with every write)."""
+        return str(self._generation)
+
+    def has_index(self):
+        """Return True: every shard has an index of titles and tags."""
+        return True
+
+    def needs_compaction(self):
+        """Return False: changes are written to their shard, nothing to compact."""
+        return False
+
+    def close(self):
+        """Nothing to close (files are only open while used)."""
+
+    # ================== Files ================== #
+
+    def _file(self, name):
+        """Return the path of a file in the shards folder."""
+        return os.path.join(self._path, name)
+
+    def _read_manifest(self):
+        """Read the folder order and shard names (empty if there is no manifest yet)."""
+        try:
+            with open(self._file(MANIFEST_FILE), "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+        except FileNotFoundError:
+            return
+        if manifest.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"Unsupported shards manifest version: {manifest.get('version')}")
+        self._folders = {folder: shard for folder, shard in manifest["folders"]}
+        self._generation = manifest.get("generation", 0)
+
+    def _write_manifest(self):
+        """Save the manifest with a new generation (the commit point of every change)."""
+        self._generation += 1
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "generation": self._generation,
+            "folders": [[folder, shard] for folder, shard in self._folders.items()],
+        }
+        atomic_write(self._file(MANIFEST_FILE), json.dumps(manifest, ensure_ascii=False).encode("utf-8"))
+
+    def _read_shard_index(self, shard):
+        """Return the index rows of a shard, or None if the index is missing or outdated."""
+        try:
+            with open(self._file(shard + ".index"), "rb") as file:
+                index = json.load(file)
+            stat = os.stat(self._file(shard + ".json"))
+        except (OSError, ValueError):
+            return None
+        if index.get("version") != SHARD_INDEX_VERSION:
+            return None
+        if index.get("size") != stat.st_size or index.get("mtime_ns") != stat.st_mtime_ns:
+            return None  # shard was rewritten but its index was not (crash)
+        return index["notes"]
+
+    def _write_shard(self, shard, parts):
+        """
+        Write a shard and its index.
+        :param parts: [(encoded note bytes, index row [id, title, tags, link]), ...]
+        :return: {note id: (offset, length)} of the notes in the shard file.
+        """
+        chunks = [b"["]
+        size = 1
+        rows = []
+        refs = {}
+        for number, (raw, row) in enumerate(parts):
+            if number:
+                chunks.append(b",")
+                size += 1
+            chunks.append(raw)
+            refs[row[0]] = (size, len(raw))
+            rows.append(list(row[:4]) + [size, len(raw)])
+            size += len(raw)
+        chunks.append(b"]")
+
+        os.makedirs(self._path, exist_ok=True)
+        shard_path = self._file(shard + ".json")
+        atomic_write(shard_path, b"".join(chunks))
+        stat = os.stat(shard_path)
+        index = {"version": SHARD_INDEX_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "notes": rows}
+        atomic_write(self._file(shard + ".index"), json.dumps(index, separators=(",", ":")).encode("utf-8"))
+
+        self._set_refs(shard, [row[0] for row in rows], [row[4:] for row in rows])
+        return refs
+
+    def _set_refs(self, shard, note_ids, ranges):
+        """Remember the byte ranges of the notes of a shard (replacing the previous ones)."""
+        for note_id in self._shard_ids.pop(shard, ()):
+            self._note_refs.pop(note_id, None)
+        self._shard_ids[shard] = note_ids
+        for note_id, (offset, length) in zip(note_ids, ranges):
+            self._note_refs[note_id] = (shard, offset, length)
+
+    def _shard_parts(self, shard):
+        """Return the (encoded note, index row) parts of a saved shard, without decoding the notes."""
+        rows = self._read_shard_index(shard)
+        try:
+            with open(self._file(shard + ".json"), "rb") as file:
+                raw = file.read()
+        except FileNotFoundError:
+            return []
+        if rows is None:
+            return [(_encode(note), _index_row(note)) for note in json.loads(raw)]
+        return [(raw[row[4]:row[4] + row[5]], row) for row in rows]
+
+    def _remove_shard(self, shard):
+        """Delete the files (and forget the notes) of a shard that is no longer in the manifest."""
+        self._set_refs(shard, [], [])
+        del self._shard_ids[shard]
+        for suffix in (".json", ".index"):
+            try:
+                os.remove(self._file(shard + suffix))
+            except FileNotFoundError:
+                pass
+
+    # ================== Loading ================== #
+
+    def load(self, lazy=False):
+        """
+        Load all folders as plain dictionaries: {folder: [note dict, ...]}.
+        In lazy mode notes have no 'content_blocks' but a 'ref' entry (offset,
+        length); read_saved_note() returns their body later.
+        """
+        data = {}
+        for kind, folder, payload, progress in self.iter_load(lazy):
+            if kind == "folder":
+                data[folder] = []
+            elif kind == "note":
+                data[folder].append(payload)
+        return data
+
+    def iter_load(self, lazy=False):
+        """
+        Stream the data shard by shard (same events as JournalStore.iter_load).
+        Shards are read in parallel; their notes are yielded in folder order.
+        """
+        folders = list(self._folders.items())
+        with ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="shard-loader") as pool:
+            loaded = pool.map(lambda item: self._load_shard(item[1], lazy), folders)
+            for number, ((folder, shard), notes) in enumerate(zip(folders, loaded)):
+                progress = (number + 1) / len(folders)
+                yield "folder", folder, None, progress
+                for note in notes:
+                    yield "note", folder, note, progress
+        yield "journal", None, [], 1.0
+
+    def _load_shard(self, shard, lazy):
+        """Read the notes of one shard (worker thread)."""
+        rows = self._read_shard_index(shard)
+        if rows is not None and lazy:
+            notes = [
+                {"type": "note", "id": note_id, "title": title, "tags": tags, "link": link, "ref": (offset, length)}
+                for note_id, title, tags, link, offset, length in rows
+            ]
+            with self._lock:
+                self._set_refs(shard, [row[0] for row in rows], [row[4:] for row in rows])
+            return notes
+
+        try:
+            with open(self._file(shard + ".json"), "rb") as file:
+                notes = json.loads(file.read())
+        except FileNotFoundError:
+            return []
+        with self._lock:
+            if rows is None or [row[0] for row in rows] != [note.get("id") for note in notes]:
+                # Missing or outdated index: rewrite the shard to get its byte ranges
+                for note in notes:
+                    note.setdefault("id", uuid.uuid4().hex)
+                self._write_shard(shard, [(_encode(note), _index_row(note)) for note in notes])
+            else:
+                self._set_refs(shard, [row[0] for row in rows], [row[4:] for row in rows])
+        return notes
+
+    def has_saved_note(self, note_id):
+        """Return True if a shard holds a copy of the note that can be read back."""
+        return note_id in self._note_refs
+
+    def read_saved_note(self, note_id):
+        """Read the saved copy of a note (as a dictionary) from its shard."""
+        with self._lock:
+            return self._read_note(note_id)
+
+    def _read_note(self, note_id):
+        """read_saved_note() with the lock already held."""
+        shard, offset, length = self._note_refs[note_id]
+        with open(self._file(shard + ".json"), "rb") as file:
+            file.seek(offset)
+            return json.loads(file.read(length))
+
+    def read_sidecar(self, suffix):
+        """Return sidecar data saved for the current data version, or None if outdated."""
+        try:
+            with open(self._file("sidecar" + suffix), "rb") as file:
+                payload = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if payload.get("snapshot") != self.get_snapshot_digest():
+            return None
+        return payload.get("data")
+
+    def write_sidecar(self, suffix, data, snapshot=None):
+        """Save extra data (e.g. a search index) that belongs to the current data version."""
+        payload = {"snapshot": snapshot or self.get_snapshot_digest(), "data": data}
+        os.makedirs(self._path, exist_ok=True)
+        atomic_write(self._file("sidecar" + suffix), json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+
+    # ================ Incremental writes ================ #
+
+    def put_note(self, folder, note_data):
+        """Store a new or edited note (rewrites only its folder's shard)."""
+        encoded = (_encode(note_data), _index_row(note_data))
+        with self._lock:
+            shard = self._folders.get(folder)
+            if shard is None:
+                shard = self._folders[folder] = uuid.uuid4().hex
+            parts = self._shard_parts(shard)
+            for number, (raw, row) in enumerate(parts):
+                if row[0] == note_data["id"]:
+                    parts[number] = encoded  # edited notes keep their place
+                    break
+            else:
+                parts.append(encoded)
+            self._write_shard(shard, parts)
+            self._write_manifest()
+
+    def delete_note(self, folder, note_id):
+        """Remove a note (rewrites only its folder's shard)."""
+        with self._lock:
+            shard = self._folders.get(folder)
+            if shard is None:
+                return
+            self._write_shard(shard, [part for part in self._shard_parts(shard) if part[1][0] != note_id])
+            self._write_manifest()
+
+    def add_folder(self, folder):
+        """Create a new empty folder (a new shard file and a manifest update)."""
+        with self._lock:
+            if folder in self._folders:
+                return
+            shard = uuid.uuid4().hex
+            self._write_shard(shard, [])
+            self._folders[folder] = shard
+            self._write_manifest()
+
+    def delete_folder(self, folder):
+        """Remove a folder and all its notes (a manifest update, then the shard files are deleted)."""
+        with self._lock:
+            shard = self._folders.pop(folder, None)
+            if shard is None:
+                return
+            self._write_manifest()
+            self._remove_shard(shard)
+
+    def rename_folder(self, old_name, new_name):
+        """Rename a folder (it moves to the end, like a re-inserted dictionary key); only the manifest changes."""
+        with self._lock:
+            if old_name not in self._folders:
+                return
+            self._folders[new_name] = self._folders.pop(old_name)
+            self._write_manifest()
+
+    def compact(self, folders_data):
+        """
+        Write every folder to its shard (full save, e.g. after an import).
+        :param folders_data: {folder: [note dict, ...]} for every folder. Notes
+            without 'content_blocks' keep the body of their saved copy; notes
+            marked 'saved' (unchanged since the last full save) are copied as
+            they are, and a shard whose notes all are is not rewritten at all.
+        :return: {note id: (offset, length)} byte range of every note in its shard.
+        """
+        refs = {}
+        with self._lock:
+            old_shards = set(self._folders.values())
+            folders = {folder: self._folders.get(folder) or uuid.uuid4().hex for folder in folders_data}
+            for folder, notes in folders_data.items():
+                shard = folders[folder]
+                note_ids = [note.get("id") for note in notes]
+                if all(note.get("saved") for note in notes) and self._shard_ids.get(shard) == note_ids:
+                    refs.update((note_id, self._note_refs[note_id][1:]) for note_id in note_ids)
+                    continue  # unchanged folder
+                saved_parts = {}
+                if any(note.get("saved") for note in notes):
+                    saved_parts = {row[0]: (raw, row) for raw, row in self._shard_parts(shard)}
+                parts = []
+                for note in notes:
+                    if note.pop("saved", False) and note["id"] in saved_parts:
+                        parts.append(saved_parts[note["id"]])
+                        continue
+                    if "content_blocks" not in note:
+                        note["content_blocks"] = self._read_note(note["id"]).get("content_blocks", [])
+                    parts.append((_encode(note), _index_row(note)))
+                refs.update(self._write_shard(shard, parts))
+            self._folders = folders
+            self._write_manifest()
+            for shard in old_shards - set(folders.values()):
+                self._remove_shard(shard)
+        return refs
+
+
+def _encode(note):
+    """Encode one note for a shard file (ASCII JSON, so byte ranges match)."""
+    return json.dumps(note, separators=(",", ":")).encode("ascii")
+
+
+def _index_row(note):
+    """Return the index fields of a note: [id, title, tags, link]."""
+    return [note.get("id"), note.get("title", ""), note.get("tags", []), note.get("link", [])]
+
+
+# ================== Import / export ================== #
+
+def import_json(json_path, shards_path=SHARDS_FOLDER):
+    """
+    Copy every folder and note of a JSON data file (and its journal) into a shards folder.
+    Notes saved without an id get one. Returns the number of notes imported.
+    """
+    from note_storage import JournalStore
+
+    data = JournalStore(json_path).load()
+    for notes in data.values():
+        for note in notes:
+            if not note.get("id"):
+                note["id"] = uuid.uuid4().hex
+    ShardedStore(shards_path).compact(data)
+    return sum(len(notes) for notes in data.values())
+
+
+def export_json(shards_path, json_path):
+    """Write every folder and note of a shards folder as a JSON data file. Returns the number of notes."""
+    from note_storage import JournalStore
+
+    data = ShardedStore(shards_path).load()
+    JournalStore(json_path).compact(data)
+    return sum(len(notes) for notes in data.values())
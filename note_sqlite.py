@@ -0,0 +1,444 @@
+import os
+import json
+import sqlite3
+import threading
+from urllib.request import pathname2url
+
+from note_search import parse_query, tokenize
+
+# ================== SQLite Storage ================== #
+
+DATABASE_FILE = "notes_data.db"
+
+# Field holding the value of each block type (other layouts are kept as JSON)
+BLOCK_VALUE_FIELDS = {"text": "content", "image": "path", "link": "url"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS folders (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    position INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS notes (
+    num INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    folder_id INTEGER NOT NULL REFERENCES folders(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    link TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS notes_by_folder ON notes(folder_id, position);
+CREATE TABLE IF NOT EXISTS blocks (
+    note_num INTEGER NOT NULL REFERENCES notes(num) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    type TEXT,
+    value TEXT,
+    data TEXT,
+    PRIMARY KEY (note_num, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tags (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS note_tags (
+    note_num INTEGER NOT NULL REFERENCES notes(num) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    tag_id INTEGER NOT NULL REFERENCES tags(id),
+    PRIMARY KEY (note_num, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS note_tags_by_tag ON note_tags(tag_id);
+CREATE TABLE IF NOT EXISTS sidecars (
+    suffix TEXT PRIMARY KEY,
+    snapshot TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+    title, tags, body, links,
+    tokenize = "unicode61 remove_diacritics 0 tokenchars '_'"
+);
+"""
+
+FTS_WEIGHTS = (3.0, 2.0, 1.0, 0.5)  # title, tags, text, link URLs (like note_search.FIELD_WEIGHTS)
+
+
+class SQLiteStore:
+    """
+    SQLite persistence engine for the NoteApp (same interface as JournalStore).
+    Tables:
+      - folders, notes (one row each, ordered by position)
+      - blocks (content blocks of every note) and tags / note_tags
+      - notes_fts (FTS5 full-text index over title, tags, text and links)
+    Every change is a small transaction, so there is no journal to compact.
+    load(lazy=True) only reads titles and tags; bodies are read per note
+    with read_saved_note(), and search() answers ranked queries from FTS5.
+
+    The connection is shared by the UI thread and the background writer
+    (see WriteBehind), so every use of it holds a lock.
+
+    read_only=True opens an existing database in SQLite's read-only mode: the
+    schema is not created and every write raises sqlite3.OperationalError.
+    """
+
+    def __init__(self, path=DATABASE_FILE, read_only=False):
+        """
+        :param path: Database file path (created if missing, unless read_only).
+        :param read_only: Only read the database (e.g. for commands that list or export notes).
+        """
+        self._path = path
+        self._lock = threading.Lock()
+        if read_only:
+            uri = "file:" + pathname2url(os.path.abspath(path)) + "?mode=ro"
+            self._connection = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None)
+        else:
+            self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA foreign_keys=ON")
+            self._connection.executescript(SCHEMA)
+        row = self._connection.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        self._generation = int(row[0]) if row else 0  # bumped by every write
+
+    # ===== Getter methods ===== #
+
+    def get_path(self):
+        """Return the database file path."""
+        return self._path
+
+    def get_snapshot_digest(self):
+        """Return a version of the stored data (changes with every write)."""
+        return str(self._generation)
+
+    def has_index(self):
+        """Return True: titles and tags can always be read without the bodies."""
+        return True
+
+    def needs_compaction(self):
+        """Return False: changes are written in place, nothing to compact."""
+        return False
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+
+    # ================== Loading ================== #
+
+    def load(self, lazy=False):
+        """
+        Load all folders as plain dictionaries: {folder: [note dict, ...]}.
+        In lazy mode notes have no 'content_blocks' but a 'ref' entry; their
+        body is read later with read_saved_note().
+        """
+        with self._lock:
+            connection = self._connection
+            data = {}
+            notes_by_folder = {}
+            for folder_id, name in connection.execute("SELECT id, name FROM folders ORDER BY position"):
+                notes_by_folder[folder_id] = data[name] = []
+
+            tags = {}
+            for num, name in connection.execute(
+                    "SELECT note_tags.note_num, tags.name FROM note_tags JOIN tags ON tags.id = note_tags.tag_id "
+                    "ORDER BY note_tags.note_num, note_tags.position"):
+                tags.setdefault(num, []).append(name)
+
+            bodies = {}
+            if not lazy:
+                for num, kind, value, block_data in connection.execute(
+                        "SELECT note_num, type, value, data FROM blocks ORDER BY note_num, position"):
+                    bodies.setdefault(num, []).append(_block_from_row(kind, value, block_data))
+
+            for num, note_id, folder_id, title, link in connection.execute(
+                    "SELECT num, id, folder_id, title, link FROM notes ORDER BY folder_id, position"):
+                note = {"type": "note", "id": note_id, "title": title, "tags": tags.get(num, []),
+                        "link": json.loads(link)}
+                if lazy:
+                    note["ref"] = num
+                else:
+                    note["content_blocks"] = bodies.get(num, [])
+                notes_by_folder[folder_id].append(note)
+            return data
+
+    def has_saved_note(self, note_id):
+        """Return True if the database has a row for the note."""
+        with self._lock:
+            return self._connection.execute("SELECT 1 FROM notes WHERE id = ?", (note_id,)).fetchone() is not None
+
+    def read_saved_note(self, note_id):
+        """Read the saved copy of a note's body: {'content_blocks': [...]}."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT blocks.type, blocks.value, blocks.data FROM blocks JOIN notes ON notes.num = blocks.note_num "
+                "WHERE notes.id = ? ORDER BY blocks.position", (note_id,)).fetchall()
+        return {"content_blocks": [_block_from_row(*row) for row in rows]}
+
+    def read_sidecar(self, suffix):
+        """Return sidecar data saved for the current data version, or None if outdated."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT snapshot, data FROM sidecars WHERE suffix = ?", (suffix,)).fetchone()
+        if row is None or row[0] != self.get_snapshot_digest():
+            return None
+        return json.loads(row[1])
+
+    def write_sidecar(self, suffix, data, snapshot=None):
+        """Save extra data (e.g. a search index) that belongs to the current data version."""
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO sidecars (suffix, snapshot, data) VALUES (?, ?, ?)",
+                (suffix, snapshot or self.get_snapshot_digest(), json.dumps(data, separators=(",", ":"))))
+
+    # ================== Searching ================== #
+
+    def search(self, query, limit=50):
+        """
+        Return up to limit (note id, score) pairs matching the query, best first.
+        Same query syntax as InvertedIndex.search(); ranked by FTS5 bm25 with
+        title and tag matches weighted higher.
+        """
+        expression = fts_query(query)
+        if not expression:
+            return []
+        weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+        try:
+            with self._lock:
+                rows = self._connection.execute(
+                    f"SELECT notes.id, -bm25(notes_fts, {weights}) AS score FROM notes_fts "
+                    "JOIN notes ON notes.num = notes_fts.rowid WHERE notes_fts MATCH ? "
+                    "ORDER BY score DESC LIMIT ?", (expression, limit)).fetchall()
+        except sqlite3.OperationalError:
+            return []  # query FTS5 cannot parse
+        return rows
+
+    # ================ Incremental writes ================ #
+
+    def put_note(self, folder, note_data):
+        """Store a new or edited note (identified by note_data['id'])."""
+        with self._transaction() as connection:
+            self._put(connection, self._folder_id(connection, folder), note_data)
+
+    def delete_note(self, folder, note_id):
+        """Remove a note."""
+        with self._transaction() as connection:
+            row = connection.execute("SELECT num FROM notes WHERE id = ?", (note_id,)).fetchone()
+            if row is not None:
+                connection.execute("DELETE FROM notes_fts WHERE rowid = ?", row)
+                connection.execute("DELETE FROM notes WHERE num = ?", row)
+
+    def add_folder(self, folder):
+        """Create a new empty folder."""
+        with self._transaction() as connection:
+            self._folder_id(connection, folder)
+
+    def delete_folder(self, folder):
+        """Remove a folder and all its notes."""
+        with self._transaction() as connection:
+            connection.execute(
+                "DELETE FROM notes_fts WHERE rowid IN (SELECT num FROM notes WHERE folder_id = "
+                "(SELECT id FROM folders WHERE name = ?))", (folder,))
+            connection.execute("DELETE FROM folders WHERE name = ?", (folder,))
+
+    def rename_folder(self, old_name, new_name):
+        """Rename a folder (it moves to the end, like a re-inserted dictionary key)."""
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE folders SET name = ?, position = (SELECT COALESCE(MAX(position), -1) + 1 FROM folders) "
+                "WHERE name = ?", (new_name, old_name))
+
+    def compact(self, folders_data):
+        """
+        Replace all data with folders_data in one transaction (used for imports).
+        :param folders_data: {folder: [note dict, ...]}. Notes without
+            'content_blocks' keep their saved body.
+        :return: {note id: ref} of every note.
+        """
+        refs = {}
+        with self._transaction() as connection:
+            connection.execute("CREATE TEMP TABLE IF NOT EXISTS kept (id TEXT PRIMARY KEY)")
+            connection.execute("DELETE FROM kept")
+            connection.execute("UPDATE folders SET position = -1 - position")  # free positions 0..n
+            for folder_position, (folder, notes) in enumerate(folders_data.items()):
+                folder_id = self._folder_id(connection, folder)
+                connection.execute("UPDATE folders SET position = ? WHERE id = ?", (folder_position, folder_id))
+                for position, note in enumerate(notes):
+                    refs[note["id"]] = self._put(connection, folder_id, note, position)
+                connection.executemany("INSERT OR IGNORE INTO kept (id) VALUES (?)", [(note["id"],) for note in notes])
+            connection.execute("DELETE FROM notes_fts WHERE rowid IN (SELECT num FROM notes WHERE id NOT IN kept)")
+            connection.execute("DELETE FROM notes WHERE id NOT IN kept")
+            connection.execute("DELETE FROM folders WHERE position < 0")
+        return refs
+
+    def _put(self, connection, folder_id, note, position=None):
+        """Insert or update one note row with its blocks, tags and full-text entry."""
+        row = connection.execute("SELECT num, folder_id, position FROM notes WHERE id = ?", (note["id"],)).fetchone()
+        if position is None:
+            if row is not None and row[1] == folder_id:
+                position = row[2]  # edited notes keep their place
+            else:
+                position = connection.execute(
+                    "SELECT COALESCE(MAX(position), -1) + 1 FROM notes WHERE folder_id = ?", (folder_id,)).fetchone()[0]
+
+        values = (folder_id, position, note.get("title", ""), json.dumps(note.get("link", [])))
+        if row is None:
+            num = connection.execute(
+                "INSERT INTO notes (id, folder_id, position, title, link) VALUES (?, ?, ?, ?, ?)",
+                (note["id"],) + values).lastrowid
+        else:
+            num = row[0]
+            connection.execute(
+                "UPDATE notes SET folder_id = ?, position = ?, title = ?, link = ? WHERE num = ?", values + (num,))
+
+        # Content blocks (notes without them keep the saved body)
+        if "content_blocks" in note:
+            blocks = note["content_blocks"]
+            connection.execute("DELETE FROM blocks WHERE note_num = ?", (num,))
+            connection.executemany(
+                "INSERT INTO blocks (note_num, position, type, value, data) VALUES (?, ?, ?, ?, ?)",
+                [(num, block_position) + _block_to_row(block) for block_position, block in enumerate(blocks)])
+        else:
+            blocks = [_block_from_row(*block_row) for block_row in connection.execute(
+                "SELECT type, value, data FROM blocks WHERE note_num = ? ORDER BY position", (num,))]
+
+        # Tags
+        tags = note.get("tags", [])
+        connection.execute("DELETE FROM note_tags WHERE note_num = ?", (num,))
+        connection.executemany("INSERT OR IGNORE INTO tags (name) VALUES (?)", [(tag,) for tag in tags])
+        connection.executemany(
+            "INSERT INTO note_tags (note_num, position, tag_id) VALUES (?, ?, (SELECT id FROM tags WHERE name = ?))",
+            [(num, tag_position, tag) for tag_position, tag in enumerate(tags)])
+
+        # Full-text entry
+        texts = "".join(block.get("content", "") for block in blocks if block.get("type") == "text")
+        urls = " ".join(block.get("url", "") for block in blocks if block.get("type") == "link")
+        connection.execute("DELETE FROM notes_fts WHERE rowid = ?", (num,))
+        connection.execute(
+            "INSERT INTO notes_fts (rowid, title, tags, body, links) VALUES (?, ?, ?, ?, ?)",
+            (num, note.get("title", ""), " ".join(tags), texts, urls))
+        return num
+
+    @staticmethod
+    def _folder_id(connection, folder):
+        """Return the id of a folder, creating it (at the end) if needed."""
+        row = connection.execute("SELECT id FROM folders WHERE name = ?", (folder,)).fetchone()
+        if row is not None:
+            return row[0]
+        return connection.execute(
+            "INSERT INTO folders (name, position) VALUES (?, (SELECT COALESCE(MAX(position), -1) + 1 FROM folders))",
+            (folder,)).lastrowid
+
+    def _transaction(self):
+        """Context manager: one write transaction that also bumps the data version."""
+        return _Transaction(self)
+
+
+class _Transaction:
+    """Runs a block of writes as one SQLite transaction (holding the store lock)."""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __enter__(self):
+        self._store._lock.acquire()
+        connection = self._store._connection
+        connection.execute("BEGIN IMMEDIATE")
+        return connection
+
+    def __exit__(self, error_type, error, traceback):
+        store = self._store
+        try:
+            if error_type is None:
+                store._connection.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('generation', ?)", (str(store._generation + 1),))
+                store._connection.execute("COMMIT")
+                store._generation += 1
+            else:
+                store._connection.execute("ROLLBACK")
+        finally:
+            store._lock.release()
+        return False
+
+
+def _block_to_row(block):
+    """Return (type, value, data) columns of a content block."""
+    kind = block.get("type")
+    field = BLOCK_VALUE_FIELDS.get(kind)
+    if field is not None and len(block) == 2 and field in block:
+        return kind, block[field], None
+    return kind, None, json.dumps(block)
+
+
+def _block_from_row(kind, value, data):
+    """Rebuild a content block dictionary from its columns."""
+    if data is not None:
+        return json.loads(data)
+    return {"type": kind, BLOCK_VALUE_FIELDS[kind]: value}
+
+
+def fts_query(query):
+    """
+    Translate a search box query (see InvertedIndex.search) into an FTS5 expression.
+    Returns '' if nothing can be searched (e.g. only excluded words).
+    """
+    expressions = []
+    for group in parse_query(query):
+        positive = [_fts_clause(clause) for negate, clause in group if not negate]
+        negative = [_fts_clause(clause) for negate, clause in group if negate]
+        positive = [clause for clause in positive if clause]
+        negative = [clause for clause in negative if clause]
+        if not positive:
+            continue  # FTS5 cannot search for exclusions alone
+        expression = " AND ".join(positive)
+        if negative:
+            expression = f"({expression}) NOT ({' OR '.join(negative)})"
+        expressions.append(f"({expression})")
+    return " OR ".join(expressions)
+
+
+def _fts_clause(clause):
+    """Return a quoted FTS5 phrase (or prefix) for one word, prefix or phrase."""
+    tokens = tokenize(clause)
+    if not tokens:
+        return ""
+    phrase = '"' + " ".join(tokens) + '"'
+    if clause.endswith("*") and not clause.startswith('"'):
+        return phrase + "*"
+    return phrase
+
+
+# ================== Import / export ================== #
+
+def import_json(json_path, db_path=DATABASE_FILE):
+    """
+    Copy every folder and note of a JSON data file (and its journal) into the database.
+    Notes saved without an id get one. Returns the number of notes imported.
+    """
+    import uuid
+    from note_storage import JournalStore
+
+    data = JournalStore(json_path).load()
+    for notes in data.values():
+        for note in notes:
+            if not note.get("id"):
+                note["id"] = uuid.uuid4().hex
+    store = SQLiteStore(db_path)
+    try:
+        store.compact(data)
+    finally:
+        store.close()
+    return sum(len(notes) for notes in data.values())
+
+
+def export_json(db_path, json_path):
+    """Write every folder and note of the database as a JSON data file. Returns the number of notes."""
+    from note_storage import JournalStore
+
+    store = SQLiteStore(db_path)
+    try:
+        data = store.load()
+    finally:
+        store.close()
+    JournalStore(json_path).compact(data)
+    return sum(len(notes) for notes in data.values())
@@ -0,0 +1,1232 @@
+import re
+import json
+import os
+import sys
+import codecs
+import uuid
+import queue
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+
+from note_profile import PROFILER
+
+try:
+    import msgpack  # optional: compact binary snapshot format
+except ImportError:
+    msgpack = None
+
+# ================== Storage Engine ================== #
+
+DATA_FILE = "notes_data.json"
+INDEX_VERSION = 2  # version of the '.index' file layout
+SETTINGS_FILE = "notes_settings.json"
+DEFAULT_SETTINGS = {
+    "storage": "json",              # "json" (snapshot + journal), "sqlite" or "shards"
+    "database": "notes_data.db",    # database file of the sqlite storage
+    "shards": "notes_data.shards",  # folder of the shards storage (one file per folder)
+    "images": "notes_images",       # image store of attached images (see note_blobs)
+    "autosave_seconds": 0,          # save edits in the editor every N seconds (0 = only on Save)
+}
+
+
+def find_data_file(base="notes_data"):
+    """
+    Return the snapshot file to use: 'notes_data.msgpack' if it exists, otherwise
+    'notes_data.json'.
+    A .msgpack snapshot is used even if msgpack is not installed (JournalStore then
+    raises ImportError): the .json file next to it is an older copy.
+    """
+    binary_path = base + ".msgpack"
+    if os.path.exists(binary_path):
+        return binary_path
+    return base + ".json"
+
+
+def load_settings(path=SETTINGS_FILE):
+    """
+    Return the app settings: DEFAULT_SETTINGS updated with 'notes_settings.json'.
+    A missing or unreadable settings file gives the defaults.
+    """
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            settings.update(json.load(file))
+    except (OSError, ValueError):
+        pass
+    return settings
+
+
+def open_store(settings=None, read_only=False):
+    """
+    Return the storage engine selected in the settings.
+    - 'json': JournalStore on notes_data.json (or .msgpack)
+    - 'sqlite': SQLiteStore; on first use the notes of notes_data.json are imported
+    - 'shards': ShardedStore (one file per folder); imported the same way on first use
+    read_only=True opens the storage without writing to it: nothing is imported
+    (notes_data.json is read directly until the app imports it) and no file is created.
+    """
+    settings = settings or load_settings()
+    if settings.get("storage") == "shards":
+        from note_shards import ShardedStore, import_json, MANIFEST_FILE
+
+        folder = settings.get("shards") or DEFAULT_SETTINGS["shards"]
+        json_path = find_data_file()
+        if not os.path.exists(os.path.join(folder, MANIFEST_FILE)) and os.path.exists(json_path):
+            if read_only:
+                return JournalStore(json_path, read_only=True)
+            import_json(json_path, folder)
+        return ShardedStore(folder)  # only writes files when notes are saved
+    if settings.get("storage") == "sqlite":
+        from note_sqlite import SQLiteStore, import_json
+
+        database = settings.get("database") or DEFAULT_SETTINGS["database"]
+        json_path = find_data_file()
+        if not os.path.exists(database):
+            if read_only:
+                return JournalStore(json_path, read_only=True)  # empty if there is no data file either
+            if os.path.exists(json_path):
+                import_json(json_path, database)
+        return SQLiteStore(database, read_only=read_only)
+    return JournalStore(find_data_file(), read_only=read_only)
+
+
+def data_folder(settings=None):
+    """Return the folder holding the data of the storage selected in the settings."""
+    settings = settings or load_settings()
+    if settings.get("storage") == "shards":
+        path = settings.get("shards") or DEFAULT_SETTINGS["shards"]
+    elif settings.get("storage") == "sqlite":
+        path = settings.get("database") or DEFAULT_SETTINGS["database"]
+    else:
+        path = find_data_file()
+    return os.path.dirname(os.path.abspath(path))
+
+
+def _fsync_dir(path):
+    """Flush a directory entry to disk (no-op where the OS does not support it)."""
+    if not hasattr(os, "O_DIRECTORY"):
+        return  # e.g. Windows: os.replace is already durable enough there
+    fd = os.open(path or ".", os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_temp(path, data):
+    """Write bytes into a temporary file next to path, fsync it and return its path."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    return tmp_path
+
+
+def atomic_write(path, data):
+    """
+    Write bytes to a file atomically.
+    - Writes into a temporary file next to the target
+    - fsyncs it, then renames it over the target
+    A crash leaves either the old file or the new one, never a half-written file.
+    """
+    os.replace(_write_temp(path, data), path)
+    _fsync_dir(os.path.dirname(path))
+
+
+# ================== Streaming reader ================== #
+
+STREAM_CHUNK = 1 << 20  # bytes read at a time by the streaming loader
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class _HashingReader:
+    """Binary file wrapper that hashes and counts every byte read through it."""
+
+    def __init__(self, file):
+        self._file = file
+        self.digest = hashlib.sha1()
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = self._file.read(size)
+        self.digest.update(chunk)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+class JsonStream:
+    """
+    Reads a JSON document one value at a time, without loading the whole file.
+    The caller walks the structure with peek()/expect() and decodes the values
+    it wants (e.g. one note) with value(). Only the current chunk of text and
+    the value being decoded are in memory.
+    """
+
+    def __init__(self, file, chunk_size=STREAM_CHUNK):
+        """
+        :param file: Binary file (UTF-8 JSON) opened for reading.
+        """
+        self._file = file
+        self._chunk_size = chunk_size
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, at_least=0):
+        """Append the next chunk to the buffer (at least at_least bytes)."""
+        chunk = self._file.read(max(self._chunk_size, at_least))
+        self._eof = not chunk
+        self._buffer = self._buffer[self._pos:] + self._utf8.decode(chunk, final=self._eof)
+        self._pos = 0
+
+    def peek(self):
+        """Return the next non-whitespace character ('' at the end) without consuming it."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if self._eof:
+                return ""
+            self._fill()
+
+    def expect(self, char):
+        """Consume the next non-whitespace character, which must be char."""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} but found {found!r} in the data file")
+        self._pos += 1
+
+    def value(self):
+        """Decode and return the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+                # Value continues in the next chunk: read as much again (no quadratic re-parsing)
+                self._fill(len(self._buffer) - self._pos)
+                continue
+            if end == len(self._buffer) and not self._eof:
+                self._fill()  # a number at the end of the buffer may go on
+                continue
+            self._pos = end
+            return value
+
+    def iter_object(self):
+        """Yield the keys of the next JSON object; the caller must consume each value."""
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self._pos += 1
+                continue
+            self.expect("}")
+            return
+
+    def iter_array(self):
+        """Yield the values of the next JSON array one by one."""
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ",":
+                self._pos += 1
+                continue
+            self.expect("]")
+            return
+
+
+def iter_folder_items(stream):
+    """
+    Walk a {folder: [item, ...]} object of a JsonStream.
+    Yields (folder, None) when a folder starts, then (folder, item) for each of its items.
+    """
+    for folder in stream.iter_object():
+        yield folder, None
+        for item in stream.iter_array():
+            yield folder, item
+
+
+class JournalStore:
+    """
+    Append-only persistence engine for the NoteApp.
+    Data is kept in two files:
+      - the snapshot ('notes_data.json'), in the original folder -> notes layout
+      - the journal ('notes_data.journal'), one JSON record per change
+    Every add/rename/delete/save only appends a small record to the journal.
+    Once the journal grows too big it is folded back into the snapshot (compaction).
+
+    The first journal line stores a digest of the snapshot it belongs to, so a
+    journal left behind by an interrupted compaction is never replayed twice.
+    An existing 'notes_data.json' needs no migration: it simply becomes the snapshot.
+
+    Compaction also writes an index ('notes_data.index') with the id, title, tags
+    and byte range of every note, which lets load(lazy=True) skip the note bodies.
+
+    Journal records name notes by their persistent id, never by list position.
+
+    Snapshots are compact JSON; a path ending in '.msgpack' stores the snapshot
+    in the binary msgpack format instead (requires the msgpack package).
+
+    A store opened with read_only=True never touches the files: a stale journal
+    or a torn record is skipped instead of repaired, and writes raise OSError.
+
+    Writes may run on a background thread (see WriteBehind) while the UI thread
+    reads saved note bodies: read_saved_note() and the snapshot swap in
+    compact() share a lock, so a body is always read with the byte ranges of
+    the snapshot file that is actually on disk.
+    """
+
+    def __init__(self, path=DATA_FILE, max_records=1000, read_only=False):
+        """
+        :param path: Snapshot file path.
+        :param max_records: Number of journal records that triggers compaction.
+        :param read_only: Only read the files (e.g. for commands that list or export notes).
+        """
+        self._path = path
+        self._read_only = read_only
+        self._binary = path.endswith(".msgpack")
+        if self._binary and msgpack is None:
+            raise ImportError(f"{path} can only be read with the msgpack package (pip install msgpack).")
+        self._journal_path = os.path.splitext(path)[0] + ".journal"
+        self._index_path = os.path.splitext(path)[0] + ".index"
+        self._max_records = max_records
+        self._snapshot_digest = ""   # digest of the snapshot on disk
+        self._snapshot_size = 0
+        self._journal_records = 0    # records appended since the last compaction
+        self._journal_size = 0
+        self._note_refs = {}  # note id -> (offset, length) in the snapshot on disk
+        self._lock = threading.Lock()  # guards the snapshot file and _note_refs
+
+    # ===== Getter methods ===== #
+
+    def get_path(self):
+        """Return the snapshot file path."""
+        return self._path
+
+    def get_journal_path(self):
+        """Return the journal file path."""
+        return self._journal_path
+
+    def get_snapshot_digest(self):
+        """Return the digest of the snapshot on disk."""
+        return self._snapshot_digest
+
+    def has_index(self):
+        """Return True if the note index matches the snapshot on disk (only its header is read)."""
+        if not os.path.exists(self._index_path):
+            return False
+        with open(self._index_path, "rb") as file:
+            return self._read_index_header(JsonStream(file, chunk_size=4096)) is not None
+
+    # ================== Loading ================== #
+
+    def load(self, lazy=False):
+        """
+        Load all folders as plain dictionaries: {folder: [note dict, ...]}.
+        - Reads the snapshot (or only its index when lazy=True)
+        - Replays the journal records on top of it
+        In lazy mode, notes coming from the index have no 'content_blocks' but a
+        'ref' entry (offset, length); read_saved_note() returns their body later. Without a valid
+        index the whole snapshot is read as usual.
+        Raises ValueError (e.g. json.JSONDecodeError) if the snapshot itself is corrupted.
+        """
+        index = self._read_index() if lazy else None
+        if index is not None:
+            data = {
+                folder: [
+                    {"type": "note", "id": note_id, "title": title, "tags": tags, "link": link,
+                     "ref": (offset, length)}
+                    for note_id, title, tags, link, offset, length in notes
+                ]
+                for folder, notes in index["folders"].items()
+            }
+            self._snapshot_digest = index["snapshot"]
+            self._snapshot_size = index["size"]
+            self._note_refs = {
+                note["id"]: note["ref"] for notes in data.values() for note in notes
+            }
+            return self._replay(data, self._read_journal())
+
+        data = {}
+        self._snapshot_digest = ""
+        self._snapshot_size = 0
+        if os.path.exists(self._path):
+            with open(self._path, "rb") as file:
+                raw = file.read()
+            self._snapshot_digest = hashlib.sha1(raw).hexdigest()
+            self._snapshot_size = len(raw)
+            if raw.strip():
+                data = self._decode(raw)
+        self._note_refs = self._read_index_refs()
+        return self._replay(data, self._read_journal())
+
+    def iter_load(self, lazy=False):
+        """
+        Stream the data note by note instead of decoding the whole file at once
+        (same result as load(), for big files and progressive UIs).
+        Yields (kind, folder, payload, progress) events, progress being the
+        fraction (0.0-1.0) of the file read so far:
+          - ("folder", name, None, progress) when a folder starts
+          - ("note", folder, note dict, progress) for each of its notes
+          - ("journal", None, records, 1.0) last: the changes to apply on top
+        Like load(lazy=True), notes read from the index have a 'ref' instead of
+        'content_blocks'. Raises ValueError if the snapshot is corrupted.
+        """
+        if lazy and os.path.exists(self._index_path):
+            index_events = self._iter_index()
+            first = next(index_events, None)
+            if first is not None:  # the index matches the snapshot
+                yield first
+                yield from index_events
+                yield "journal", None, self._read_journal(), 1.0
+                return
+
+        self._snapshot_digest = ""
+        self._snapshot_size = 0
+        if os.path.exists(self._path):
+            total = os.path.getsize(self._path) or 1
+            with open(self._path, "rb") as file:
+                reader = _HashingReader(file)
+                if self._binary:
+                    events = self._iter_msgpack(reader)
+                else:
+                    stream = JsonStream(reader)
+                    events = iter_folder_items(stream) if stream.peek() else ()
+                for folder, note in events:
+                    progress = reader.bytes_read / total
+                    if note is None:
+                        yield "folder", folder, None, progress
+                    else:
+                        yield "note", folder, note, progress
+                reader.read()  # hash trailing bytes
+            self._snapshot_digest = reader.digest.hexdigest()
+            self._snapshot_size = reader.bytes_read
+        self._note_refs = self._read_index_refs()
+        yield "journal", None, self._read_journal(), 1.0
+
+    @staticmethod
+    def _iter_msgpack(reader):
+        """Walk a msgpack snapshot like iter_folder_items()."""
+        unpacker = msgpack.Unpacker(reader, raw=False, strict_map_key=False, read_size=STREAM_CHUNK)
+        try:
+            for _ in range(unpacker.read_map_header()):
+                folder = unpacker.unpack()
+                yield folder, None
+                for _ in range(unpacker.read_array_header()):
+                    yield folder, unpacker.unpack()
+        except msgpack.OutOfData:
+            return  # empty file
+        except (msgpack.UnpackException, TypeError) as e:
+            raise ValueError(f"Corrupted data file: {e}") from e
+
+    def _iter_index(self):
+        """
+        Stream the note index like iter_load() streams the snapshot.
+        Yields nothing if the index does not match the snapshot on disk.
+        """
+        total = os.path.getsize(self._index_path) or 1
+        with open(self._index_path, "rb") as file:
+            reader = _HashingReader(file)
+            stream = JsonStream(reader)
+            header = self._read_index_header(stream)
+            if header is None:
+                return  # outdated index: read the snapshot instead
+            self._snapshot_digest = header["snapshot"]
+            self._snapshot_size = header["size"]
+            note_refs = self._note_refs = {}
+            for folder, row in iter_folder_items(stream):
+                progress = reader.bytes_read / total
+                if row is None:
+                    yield "folder", folder, None, progress
+                    continue
+                note_id, title, tags, link, offset, length = row
+                note_refs[note_id] = (offset, length)
+                yield "note", folder, {"type": "note", "id": note_id, "title": title, "tags": tags,
+                                       "link": link, "ref": (offset, length)}, progress
+
+    def _read_index_header(self, stream):
+        """
+        Read the index fields before 'folders' (written last) from a JsonStream.
+        Returns them if the index matches the snapshot on disk, else None; the
+        stream is then positioned at the folders.
+        """
+        if not os.path.exists(self._path):
+            return None
+        header = {}
+        try:
+            stream.expect("{")
+            while stream.peek() == "\"":
+                key = stream.value()
+                stream.expect(":")
+                if key == "folders":
+                    break
+                header[key] = stream.value()
+                if stream.peek() == ",":
+                    stream.expect(",")
+            else:
+                return None
+        except ValueError:
+            return None
+        stat = os.stat(self._path)
+        if header.get("version") != INDEX_VERSION:
+            return None  # written by an older version
+        if header.get("size") != stat.st_size or header.get("mtime_ns") != stat.st_mtime_ns:
+            return None  # snapshot was changed without us (or compaction was interrupted)
+        return header
+
+    def _read_journal(self):
+        """
+        Return the valid records of the journal.
+        - A journal written for another snapshot is ignored (already compacted)
+        - A torn record at the end (crash while appending) is cut off
+        """
+        self._journal_records = 0
+        self._journal_size = 0
+        if not os.path.exists(self._journal_path):
+            return []
+
+        records = []
+        good_size = 0
+        with open(self._journal_path, "rb") as file:
+            header = file.readline()
+            try:
+                header_data = json.loads(header)
+            except ValueError:
+                header_data = {}  # unreadable header: journal is unusable
+            if header_data.get("snapshot") != self._snapshot_digest:
+                stale = True  # journal from before the last compaction
+            else:
+                stale = False
+                good_size = len(header)
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        break  # incomplete last record
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        break
+                    good_size += len(line)
+
+        if stale:
+            if not self._read_only:
+                self._reset_journal()
+            return []
+
+        # Drop a torn tail so new records are appended after valid data
+        if not self._read_only and good_size < os.path.getsize(self._journal_path):
+            with open(self._journal_path, "r+b") as file:
+                file.truncate(good_size)
+
+        self._journal_records = len(records)
+        self._journal_size = good_size
+        return records
+
+    def _read_index(self):
+        """Return the note index, or None if it is missing or out of date."""
+        if not os.path.exists(self._index_path) or not os.path.exists(self._path):
+            return None
+        try:
+            with open(self._index_path, "rb") as file:
+                index = json.load(file)
+        except ValueError:
+            return None
+        stat = os.stat(self._path)
+        if index.get("version") != INDEX_VERSION:
+            return None  # written by an older version
+        if index.get("size") != stat.st_size or index.get("mtime_ns") != stat.st_mtime_ns:
+            return None  # snapshot was changed without us (or compaction was interrupted)
+        return index
+
+    def _read_index_refs(self):
+        """
+        Return {note id: (offset, length)} of the snapshot notes from the note index
+        (empty if the index is out of date), so a full load can copy saved notes too.
+        """
+        index = self._read_index()
+        if index is None:
+            return {}
+        return {row[0]: (row[4], row[5]) for rows in index["folders"].values() for row in rows}
+
+    def has_saved_note(self, note_id):
+        """Return True if the snapshot on disk holds a copy of the note that can be read back."""
+        return note_id in self._note_refs
+
+    def write_sidecar(self, suffix, data, snapshot=None):
+        """
+        Save extra data (e.g. a search index) that belongs to the current snapshot.
+        :param suffix: File extension of the sidecar file, e.g. '.search'.
+        :param snapshot: Digest of the snapshot the data belongs to (default: current).
+        """
+        self._check_writable()
+        payload = {"snapshot": snapshot or self._snapshot_digest, "data": data}
+        path = os.path.splitext(self._path)[0] + suffix
+        atomic_write(path, json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+
+    def read_sidecar(self, suffix):
+        """Return sidecar data saved for the current snapshot, or None if outdated."""
+        path = os.path.splitext(self._path)[0] + suffix
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as file:
+                payload = json.load(file)
+        except ValueError:
+            return None
+        if payload.get("snapshot") != self._snapshot_digest:
+            return None
+        return payload.get("data")
+
+    def read_saved_note(self, note_id):
+        """Read the saved copy of a note (as a dictionary) from the snapshot on disk."""
+        with self._lock:
+            offset, length = self._note_refs[note_id]
+            with open(self._path, "rb") as file:
+                file.seek(offset)
+                return self._decode(file.read(length))
+
+    def _decode(self, raw):
+        """Decode snapshot bytes (a whole snapshot or a single note)."""
+        if self._binary:
+            return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+        return json.loads(raw)
+
+    @classmethod
+    def _replay(cls, data, records):
+        """
+        Apply journal records to {folder: [note dict, ...]}.
+        Notes are keyed by id while replaying, so every record costs O(1).
+        """
+        if not records:
+            return data
+        folders = {folder: _key_notes(notes) for folder, notes in data.items()}
+        for record in records:
+            cls._apply(folders, record)
+        return {folder: list(notes.values()) for folder, notes in folders.items()}
+
+    @staticmethod
+    def _apply(folders, record):
+        """Apply one journal record to {folder: {note id: note dict}}."""
+        op = record.get("op")
+        if op == "put":
+            notes = folders.setdefault(record["folder"], {})
+            if "index" in record:
+                # Record written before notes had ids: position in the folder
+                note_list = list(notes.values())
+                if record["index"] >= len(note_list):
+                    note_list.append(record["note"])
+                else:
+                    note_list[record["index"]] = record["note"]
+                folders[record["folder"]] = _key_notes(note_list)
+            else:
+                notes[record["id"]] = record["note"]  # edited notes keep their place
+        elif op == "del":
+            notes = folders.get(record["folder"], {})
+            if "index" in record:
+                note_list = list(notes.values())
+                if record["index"] < len(note_list):
+                    del note_list[record["index"]]
+                folders[record["folder"]] = _key_notes(note_list)
+            else:
+                notes.pop(record["id"], None)
+        elif op == "mkdir":
+            folders.setdefault(record["folder"], {})
+        elif op == "rmdir":
+            folders.pop(record["folder"], None)
+        elif op == "mv":
+            if record["old"] in folders:
+                folders[record["new"]] = folders.pop(record["old"])
+
+    # ================ Incremental writes ================ #
+
+    def put_note(self, folder, note_data):
+        """Store a new or edited note (identified by note_data['id'])."""
+        self._append({"op": "put", "folder": folder, "id": note_data["id"], "note": note_data})
+
+    def delete_note(self, folder, note_id):
+        """Record that a note was removed from the folder."""
+        self._append({"op": "del", "folder": folder, "id": note_id})
+
+    def add_folder(self, folder):
+        """Record a new empty folder."""
+        self._append({"op": "mkdir", "folder": folder})
+
+    def delete_folder(self, folder):
+        """Record that a folder and all its notes were removed."""
+        self._append({"op": "rmdir", "folder": folder})
+
+    def rename_folder(self, old_name, new_name):
+        """Record a folder rename."""
+        self._append({"op": "mv", "old": old_name, "new": new_name})
+
+    def _append(self, record):
+        """Append one record to the journal and flush it to disk."""
+        self._check_writable()
+        if not os.path.exists(self._journal_path):
+            self._reset_journal()
+
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+        with open(self._journal_path, "ab") as file:
+            file.write(line)
+            file.flush()
+            os.fsync(file.fileno())
+        self._journal_records += 1
+        self._journal_size += len(line)
+
+    def _check_writable(self):
+        """Raise OSError if the store was opened read-only."""
+        if self._read_only:
+            raise OSError(f"{self._path} was opened read-only")
+
+    def _reset_journal(self):
+        """Start an empty journal bound to the current snapshot."""
+        header = json.dumps({"snapshot": self._snapshot_digest}) + "\n"
+        atomic_write(self._journal_path, header.encode("utf-8"))
+        self._journal_records = 0
+        self._journal_size = len(header)
+
+    # ================== Compaction ================== #
+
+    def needs_compaction(self):
+        """
+        Return True once replaying the journal costs more than a full rewrite:
+        too many records, or a journal bigger than the snapshot itself.
+        """
+        if self._journal_records >= self._max_records:
+            return True
+        return self._journal_records > 0 and self._journal_size > max(self._snapshot_size, 64 * 1024)
+
+    def compact(self, folders_data):
+        """
+        Write the full state as a new snapshot and start an empty journal.
+        :param folders_data: {folder: [note dict, ...]} for every folder. Notes
+            without 'content_blocks' keep the body of their saved copy; notes
+            marked 'saved' (unchanged since the last full save) are copied from
+            the snapshot byte for byte instead of being encoded again.
+        :return: {note id: (offset, length)} byte range of every note.
+        """
+        self._check_writable()
+        saved_raw = self._read_saved_raw(folders_data)
+        for notes in folders_data.values():
+            for note in notes:
+                note.pop("saved", None)
+                if "content_blocks" not in note and note["id"] not in saved_raw:
+                    note["content_blocks"] = self.read_saved_note(note["id"]).get("content_blocks", [])
+
+        raw, refs = self._encode_snapshot(folders_data, saved_raw)
+        note_refs = {
+            note["id"]: ref
+            for folder, notes in folders_data.items()
+            for note, ref in zip(notes, refs[folder])
+            if "id" in note
+        }
+        tmp_path = _write_temp(self._path, raw)
+        with self._lock:
+            os.replace(tmp_path, self._path)
+            self._note_refs = note_refs
+        _fsync_dir(os.path.dirname(self._path))
+        self._snapshot_digest = hashlib.sha1(raw).hexdigest()
+        self._snapshot_size = len(raw)
+        self._reset_journal()
+        self._write_index(folders_data, refs)
+        return note_refs
+
+    def _read_saved_raw(self, folders_data):
+        """Return {note id: saved bytes} of the notes marked 'saved' (snapshot read once)."""
+        saved_ids = [note["id"] for notes in folders_data.values() for note in notes
+                     if note.get("saved") and note["id"] in self._note_refs]
+        if not saved_ids:
+            return {}
+        with self._lock:
+            with open(self._path, "rb") as file:
+                snapshot = file.read()
+            refs = self._note_refs
+            return {note_id: snapshot[refs[note_id][0]:refs[note_id][0] + refs[note_id][1]] for note_id in saved_ids}
+
+    def _encode_snapshot(self, folders_data, saved_raw=None):
+        """
+        Serialize folders as compact JSON (or msgpack), recording where every
+        note starts and ends in the output.
+        :param saved_raw: {note id: bytes} of notes to copy instead of encoding.
+        """
+        saved_raw = saved_raw or {}
+        parts = []
+        refs = {}
+        size = 0
+
+        def write(chunk):
+            nonlocal size
+            parts.append(chunk)
+            size += len(chunk)
+
+        if self._binary:
+            packer = msgpack.Packer(use_bin_type=True)
+            write(packer.pack_map_header(len(folders_data)))
+            for folder, notes in folders_data.items():
+                write(packer.pack(folder))
+                write(packer.pack_array_header(len(notes)))
+                folder_refs = refs[folder] = []
+                for note in notes:
+                    start = size
+                    write(saved_raw.get(note.get("id")) or packer.pack(note))
+                    folder_refs.append((start, size - start))
+            return b"".join(parts), refs
+
+        separators = (",", ":")
+        write(b"{")
+        for folder_number, (folder, notes) in enumerate(folders_data.items()):
+            if folder_number:
+                write(b",")
+            write(json.dumps(folder).encode("utf-8") + b":[")
+            folder_refs = refs[folder] = []
+            for note_number, note in enumerate(notes):
+                if note_number:
+                    write(b",")
+                start = size
+                write(saved_raw.get(note.get("id")) or json.dumps(note, separators=separators).encode("utf-8"))
+                folder_refs.append((start, size - start))
+            write(b"]")
+        write(b"}")
+        return b"".join(parts), refs
+
+    def _write_index(self, folders_data, refs):
+        """Write the title/tags/byte-range index that goes with the snapshot."""
+        stat = os.stat(self._path)
+        index = {
+            "version": INDEX_VERSION,
+            "snapshot": self._snapshot_digest,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "folders": {
+                folder: [
+                    [note.get("id"), note.get("title", ""), note.get("tags", []), note.get("link", []), offset, length]
+                    for note, (offset, length) in zip(notes, refs[folder])
+                ]
+                for folder, notes in folders_data.items()
+            },
+        }
+        atomic_write(self._index_path, json.dumps(index, separators=(",", ":")).encode("utf-8"))
+
+
+def _key_notes(notes):
+    """Return {note id: note dict} (notes saved without an id are keyed by position)."""
+    return {note.get("id", position): note for position, note in enumerate(notes)}
+
+
+class BodyCache:
+    """
+    Keeps the content blocks of lazily loaded notes in memory.
+    - Bodies are read from the snapshot the first time a note is opened
+    - The least recently used bodies are unloaded when too many are in memory
+    Notes edited since the last compaction have no snapshot ref and stay loaded.
+    """
+
+    def __init__(self, store, max_loaded=200):
+        """
+        :param store: JournalStore the bodies are read from.
+        :param max_loaded: Number of bodies kept in memory.
+        """
+        self._store = store
+        self._max_loaded = max_loaded
+        self._recent = OrderedDict()  # note id -> note, oldest first
+
+    def load_body(self, note_id):
+        """Read the saved content blocks of a note."""
+        return self._store.read_saved_note(note_id).get("content_blocks", [])
+
+    def touch(self, note):
+        """Mark a note body as recently used and unload the oldest ones."""
+        key = note.get_id()
+        self._recent[key] = note
+        self._recent.move_to_end(key)
+        while len(self._recent) > self._max_loaded:
+            _, old_note = self._recent.popitem(last=False)
+            old_note.unload_content()
+
+    def forget(self, note):
+        """Stop tracking a note (e.g. after it was deleted)."""
+        self._recent.pop(note.get_id(), None)
+
+
+# ================== Write-behind saving ================== #
+
+class WriteBehind:
+    """
+    Runs the writes of a JournalStore on a background thread.
+    - The UI thread only queues small tasks; fsync and snapshot writes happen on the thread
+    - The queue is bounded, so a long burst of saves waits instead of growing without limit
+    - Bursts are coalesced: repeated saves of one note become one journal record, and a
+      queued full save makes the journal records queued before it unnecessary
+      (they are still written if the full save fails)
+    - flush() waits until everything queued is on disk (call it before exiting)
+    Results and errors are handed to callbacks on the Tk main thread (after() polling).
+    """
+
+    def __init__(self, store, widget, on_error=None, max_pending=256, poll_ms=50):
+        """
+        :param store: JournalStore to write to (only this thread writes to it afterwards).
+        :param widget: Any Tk widget (used for after() polling).
+        :param on_error: Called with the exception when a write fails.
+        :param max_pending: Number of queued tasks before submitting waits.
+        """
+        self._store = store
+        self._widget = widget
+        self._on_error = on_error
+        self._tasks = queue.Queue(maxsize=max_pending)
+        self._finished = queue.Queue()  # (callback, result) ready for the main thread
+        self._pending = 0
+        self._poll_ms = poll_ms
+        self._polling = False
+        self._thread = threading.Thread(target=self._run, name="note-writer", daemon=True)
+        self._thread.start()
+
+    # ===== Tasks (called on the main thread) ===== #
+
+    def put_note(self, folder, note_data):
+        """Queue a new or edited note."""
+        self._submit(("put", folder, note_data["id"], note_data))
+
+    def delete_note(self, folder, note_id):
+        """Queue a note removal."""
+        self._submit(("del", folder, note_id))
+
+    def add_folder(self, folder):
+        """Queue a new empty folder."""
+        self._submit(("mkdir", folder))
+
+    def delete_folder(self, folder):
+        """Queue a folder removal."""
+        self._submit(("rmdir", folder))
+
+    def rename_folder(self, old_name, new_name):
+        """Queue a folder rename."""
+        self._submit(("mv", old_name, new_name))
+
+    def compact(self, folders_data, callback=None):
+        """
+        Queue a full save of folders_data (see JournalStore.compact).
+        callback(refs, snapshot digest) is called on the main thread when it is written.
+        """
+        self._submit(("compact", folders_data, callback))
+
+    def write_sidecar(self, suffix, data, snapshot):
+        """Queue a sidecar file write (see JournalStore.write_sidecar)."""
+        self._submit(("sidecar", suffix, data, snapshot))
+
+    def _submit(self, task):
+        """Queue a task (waits while the queue is full)."""
+        self._tasks.put(task)
+        self._pending += 1
+        if not self._polling:
+            self._polling = True
+            self._widget.after(self._poll_ms, self._poll)
+
+    def flush(self):
+        """Wait until every queued task is written, then run the pending callbacks."""
+        self._tasks.join()
+        self._deliver()
+
+    def close(self):
+        """Write everything still queued and stop the thread."""
+        self._tasks.put(None)
+        self._thread.join()
+        self._deliver()
+
+    # ===== Results (main thread) ===== #
+
+    def _poll(self):
+        """Hand finished tasks to their callbacks while work is pending."""
+        self._deliver()
+        if self._pending > 0:
+            self._widget.after(self._poll_ms, self._poll)
+        else:
+            self._polling = False
+
+    def _deliver(self):
+        """Run callbacks of finished tasks (main thread)."""
+        while True:
+            try:
+                done, callback, result = self._finished.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= done
+            if isinstance(result, Exception):
+                if self._on_error is not None:
+                    self._on_error(result)
+            elif callback is not None:
+                callback(*result)
+
+    # ===== Writer thread ===== #
+
+    def _run(self):
+        """Take every queued task, coalesce them and write them."""
+        while True:
+            batch = [self._tasks.get()]
+            while True:
+                try:
+                    batch.append(self._tasks.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            tasks = self._coalesce([task for task in batch if task is not None])
+            done = len(batch) - stop
+            for task, callbacks, replaced in tasks:
+                result = self._try_write(task)
+                if isinstance(result, Exception):
+                    self._finished.put((0, None, result))
+                    # The full save did not happen: journal the changes it replaced
+                    for earlier in replaced:
+                        error = self._try_write(earlier)
+                        if isinstance(error, Exception):
+                            self._finished.put((0, None, error))
+                else:
+                    for callback in callbacks:
+                        self._finished.put((0, callback, result))
+            self._finished.put((done, None, ()))
+            for _ in batch:
+                self._tasks.task_done()
+            if stop:
+                return
+
+    @staticmethod
+    def _coalesce(batch):
+        """
+        Return the tasks that still have to be written as (task, callbacks, replaced).
+        - Everything before the last full save is already part of it; those changes
+          are its `replaced` tasks, written to the journal only if the full save fails
+        - A note saved several times in a row is written once, with its last state
+        """
+        compacts = [i for i, task in enumerate(batch) if task[0] == "compact"]
+        if not compacts:
+            return [(task, [], []) for task in WriteBehind._merge_puts(batch)]
+        last = compacts[-1]
+        callbacks = [task[2] for task in batch if task[0] == "compact" and task[2] is not None]
+        replaced = WriteBehind._merge_puts([task for task in batch[:last] if task[0] in JOURNAL_TASKS])
+        later = WriteBehind._merge_puts([task for task in batch[last + 1:] if task[0] != "compact"])
+        return [(batch[last], callbacks, replaced)] + [(task, [], []) for task in later]
+
+    @staticmethod
+    def _merge_puts(batch):
+        """Return the tasks with repeated saves of a note (no other change between) written once."""
+        tasks = []
+        put_positions = {}  # (folder, note id) -> position in tasks, since the last other record
+        for task in batch:
+            if task[0] == "put":
+                position = put_positions.get(task[1:3])
+                if position is not None:
+                    tasks[position] = task  # keep the first position (note order)
+                    continue
+                put_positions[task[1:3]] = len(tasks)
+            elif task[0] in JOURNAL_TASKS:
+                put_positions = {}
+            tasks.append(task)
+        return tasks
+
+    def _try_write(self, task):
+        """Write one task; returns its callback arguments or the exception it raised."""
+        try:
+            return self._write(task)
+        except Exception as e:
+            return e
+
+    def _write(self, task):
+        """Write one task; returns the arguments for its callback."""
+        with PROFILER.span(WRITE_SPANS[task[0]]):
+            return self._write_task(task)
+
+    def _write_task(self, task):
+        """Run the store method of a task."""
+        kind = task[0]
+        if kind == "put":
+            self._store.put_note(task[1], task[3])
+        elif kind == "del":
+            self._store.delete_note(task[1], task[2])
+        elif kind == "mkdir":
+            self._store.add_folder(task[1])
+        elif kind == "rmdir":
+            self._store.delete_folder(task[1])
+        elif kind == "mv":
+            self._store.rename_folder(task[1], task[2])
+        elif kind == "compact":
+            refs = self._store.compact(task[1])
+            return refs, self._store.get_snapshot_digest()
+        elif kind == "sidecar":
+            self._store.write_sidecar(task[1], task[2], task[3])
+        return ()
+
+
+# Writer tasks that are journal records
+JOURNAL_TASKS = ("put", "del", "mkdir", "rmdir", "mv")
+
+# Span names (note_profile) of the writer tasks
+WRITE_SPANS = {
+    "put": "store.put_note",
+    "del": "store.delete_note",
+    "mkdir": "store.add_folder",
+    "rmdir": "store.delete_folder",
+    "mv": "store.rename_folder",
+    "compact": "store.compact",
+    "sidecar": "store.write_sidecar",
+}
+
+
+class DirectWriter:
+    """
+    Same interface as WriteBehind, but writes immediately on the calling thread.
+    Used without a UI (scripts, command line, benchmarks); write errors are raised
+    unless on_error is given.
+    """
+
+    def __init__(self, store, on_error=None):
+        self._store = store
+        self._on_error = on_error
+
+    def put_note(self, folder, note_data):
+        """Write a new or edited note."""
+        self._write(self._store.put_note, folder, note_data)
+
+    def delete_note(self, folder, note_id):
+        """Write a note removal."""
+        self._write(self._store.delete_note, folder, note_id)
+
+    def add_folder(self, folder):
+        """Write a new empty folder."""
+        self._write(self._store.add_folder, folder)
+
+    def delete_folder(self, folder):
+        """Write a folder removal."""
+        self._write(self._store.delete_folder, folder)
+
+    def rename_folder(self, old_name, new_name):
+        """Write a folder rename."""
+        self._write(self._store.rename_folder, old_name, new_name)
+
+    def compact(self, folders_data, callback=None):
+        """Write a full save; callback(refs, snapshot digest) is called when done."""
+        refs = self._write(self._store.compact, folders_data)
+        if refs is not None and callback is not None:
+            callback(refs, self._store.get_snapshot_digest())
+
+    def write_sidecar(self, suffix, data, snapshot):
+        """Write a sidecar file."""
+        self._write(self._store.write_sidecar, suffix, data, snapshot)
+
+    def flush(self):
+        """Nothing is queued."""
+
+    def close(self):
+        """Nothing is queued."""
+
+    def _write(self, write, *args):
+        """Run one write, handing errors to on_error if given."""
+        if self._on_error is None:
+            with PROFILER.span(f"store.{write.__name__}"):
+                return write(*args)
+        try:
+            with PROFILER.span(f"store.{write.__name__}"):
+                return write(*args)
+        except Exception as e:
+            self._on_error(e)
+            return None
+
+
+# ================== Compaction command ================== #
+
+def compact_data_file(path, snapshot_format=None):
+    """
+    One-shot compaction of a data file:
+      - replays the journal into the snapshot
+      - merges text runs and drops duplicate link blocks in every note
+      - gives notes saved without an id their persistent id
+      - writes the compact format (JSON without indentation, or msgpack)
+    :param snapshot_format: 'json' or 'msgpack' to convert, None to keep the format.
+    :return: (bytes before, bytes after, new snapshot path)
+    """
+    from note_blocks import normalize_blocks
+
+    old_store = JournalStore(path)
+    data = old_store.load()
+    for notes in data.values():
+        for note in notes:
+            note["content_blocks"] = normalize_blocks(note.get("content_blocks", []))
+            if not note.get("id"):
+                note["id"] = uuid.uuid4().hex  # notes saved before notes had ids
+
+    new_path = path
+    if snapshot_format is not None:
+        new_path = os.path.splitext(path)[0] + "." + snapshot_format
+    before = sum(os.path.getsize(p) for p in (path, old_store.get_journal_path()) if os.path.exists(p))
+
+    new_store = JournalStore(new_path)
+    new_store.compact(data)
+    if new_path != path and os.path.exists(path):
+        os.replace(path, path + ".bak")  # keep the old file, but never load it again
+    return before, os.path.getsize(new_path), new_path
+
+
+def main(argv=None):
+    """
+    Command line:
+      python note_storage.py compact [--file F] [--format json|msgpack]
+      python note_storage.py to-db [--file F] [--db D]     (JSON -> SQLite)
+      python note_storage.py from-db [--file F] [--db D]   (SQLite -> JSON)
+      python note_storage.py to-db --shards [--file F] [--db DIR]     (JSON -> shards folder)
+      python note_storage.py from-db --shards [--file F] [--db DIR]   (shards folder -> JSON)
+    (note_core.py import / export work on notes instead: text files in, JSON out.)
+    """
+    parser = argparse.ArgumentParser(description="NoteApp data file tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compact_parser = commands.add_parser("compact", help="compact the data file and normalize all notes")
+    compact_parser.add_argument("--file", default=None, help="snapshot file (default: notes_data.json/.msgpack)")
+    compact_parser.add_argument("--format", choices=("json", "msgpack"), default=None, help="convert to this format")
+    for name, help_text in (("to-db", "copy the JSON data file into the SQLite database (or shards)"),
+                            ("from-db", "write the SQLite database (or shards) as a JSON data file")):
+        sub_parser = commands.add_parser(name, help=help_text)
+        sub_parser.add_argument("--file", default=None, help="JSON data file (default: notes_data.json)")
+        sub_parser.add_argument("--db", default=None, help="SQLite database file, or shards folder with --shards")
+        sub_parser.add_argument("--shards", action="store_true", help="use the shards storage instead of SQLite")
+    args = parser.parse_args(argv)
+
+    if args.command in ("to-db", "from-db"):
+        if args.shards:
+            from note_shards import import_json, export_json
+            args.db = args.db or DEFAULT_SETTINGS["shards"]
+        else:
+            from note_sqlite import import_json, export_json
+            args.db = args.db or DEFAULT_SETTINGS["database"]
+
+        if args.command == "to-db":
+            path = args.file or find_data_file()
+            count = import_json(path, args.db)
+            print(f"{path} -> {args.db}: {count} notes")
+        else:
+            path = args.file or DATA_FILE
+            count = export_json(args.db, path)
+            print(f"{args.db} -> {path}: {count} notes")
+        return 0
+
+    path = args.file or find_data_file()
+    if (args.format == "msgpack" or path.endswith(".msgpack")) and msgpack is None:
+        print("The msgpack package is not installed (pip install msgpack).", file=sys.stderr)
+        return 1
+    before, after, new_path = compact_data_file(path, args.format)
+    print(f"{path}: {before} bytes -> {new_path}: {after} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
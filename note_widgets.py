@@ -0,0 +1,457 @@
+import re
+import time
+import tkinter as tk
+from tkinter import font as tkfont
+from tkinter import filedialog, messagebox
+
+URL_PATTERN = re.compile(r"https?://[^\s]+")  # links highlighted in notes
+
+# ================== Virtual List ================== #
+
+class VirtualList(tk.Frame):
+    """
+    Listbox replacement for very long lists.
+    - Keeps all rows in Python and only puts the visible rows into the Tk Listbox
+    - Supports single-row updates (insert/delete/move/set) without a full redraw
+    - Keeps highlighted rows as a flag per row; only visible highlighted rows cost a Tk call
+    Indexes used by the public methods are always positions in the full list.
+    """
+
+    def __init__(self, parent, highlight_color="yellow", **listbox_options):
+        super().__init__(parent)
+        self._items = []        # text of every row
+        self._highlights = []   # highlight flag of every row
+        self._top = 0           # first row shown in the listbox
+        self._selected = None   # selected row (full-list index)
+        self._highlight_color = highlight_color
+
+        self._listbox = tk.Listbox(self, exportselection=False, **listbox_options)
+        self._scrollbar = tk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self._scrollbar.pack(side="right", fill="y")
+        self._listbox.pack(side="left", fill="both", expand=True)
+
+        list_font = tkfont.Font(font=self._listbox.cget("font"))
+        self._row_height = list_font.metrics("linespace") + 1
+
+        self._listbox.bind("<Configure>", lambda event: self._render())
+        self._listbox.bind("<<ListboxSelect>>", self._on_select)
+        self._listbox.bind("<MouseWheel>", self._on_mousewheel)
+        self._listbox.bind("<Button-4>", lambda event: self._scroll_rows(-3))
+        self._listbox.bind("<Button-5>", lambda event: self._scroll_rows(3))
+        self._listbox.bind("<Up>", lambda event: self._move_selection(-1))
+        self._listbox.bind("<Down>", lambda event: self._move_selection(1))
+        self._listbox.bind("<Prior>", lambda event: self._scroll_rows(-self._visible_rows()))
+        self._listbox.bind("<Next>", lambda event: self._scroll_rows(self._visible_rows()))
+
+    # ================== Listbox-like API ================== #
+
+    def bind(self, sequence=None, func=None, add=None):
+        """Bind events on the inner listbox (where clicks happen)."""
+        return self._listbox.bind(sequence, func, add)
+
+    def size(self):
+        """Return the number of rows."""
+        return len(self._items)
+
+    def get(self, index):
+        """Return the text of a row."""
+        return self._items[index]
+
+    def curselection(self):
+        """Return the selected row as a tuple, like tk.Listbox."""
+        return () if self._selected is None else (self._selected,)
+
+    def nearest(self, y):
+        """Return the row closest to a y coordinate of the widget."""
+        if not self._items:
+            return 0
+        return min(self._top + self._listbox.nearest(y), len(self._items) - 1)
+
+    def selection_clear(self, first=0, last=None):
+        """Clear the selection."""
+        self._selected = None
+        self._listbox.selection_clear(0, tk.END)
+
+    def selection_set(self, index):
+        """Select a row, scrolling it into view."""
+        if not 0 <= index < len(self._items):
+            return
+        self._selected = index
+        self.see(index)
+        self._listbox.selection_clear(0, tk.END)
+        self._listbox.selection_set(index - self._top)
+
+    def activate(self, index):
+        """Give the keyboard focus cursor to a visible row."""
+        if self._top <= index < self._top + self._visible_rows():
+            self._listbox.activate(index - self._top)
+
+    def see(self, index):
+        """Scroll so that the row is visible."""
+        rows = self._visible_rows()
+        if index < self._top:
+            self._set_top(index)
+        elif index >= self._top + rows:
+            self._set_top(index - rows + 1)
+
+    # ================== Updating rows ================== #
+
+    def set_items(self, items, highlighted=None):
+        """
+        Replace all rows.
+        :param items: Texts of the rows.
+        :param highlighted: Optional list of highlight flags (one per row).
+        """
+        self._items = list(items)
+        self._highlights = list(highlighted) if highlighted is not None else [False] * len(self._items)
+        self._selected = None
+        self._top = 0
+        self._render()
+
+    def insert(self, index, text, highlighted=False):
+        """Insert one row (index may be tk.END)."""
+        if index == tk.END:
+            index = len(self._items)
+        self._items.insert(index, text)
+        self._highlights.insert(index, highlighted)
+        if self._selected is not None and self._selected >= index:
+            self._selected += 1
+        self._refresh_from(index)
+
+    def delete(self, index):
+        """Delete one row."""
+        del self._items[index]
+        del self._highlights[index]
+        if self._selected == index:
+            self._selected = None
+        elif self._selected is not None and self._selected > index:
+            self._selected -= 1
+        self._top = max(0, min(self._top, len(self._items) - self._visible_rows()))
+        self._refresh_from(index)
+
+    def move(self, old_index, new_index):
+        """Move one row to another position."""
+        if new_index == tk.END:
+            new_index = len(self._items) - 1
+        text = self._items.pop(old_index)
+        highlighted = self._highlights.pop(old_index)
+        self._items.insert(new_index, text)
+        self._highlights.insert(new_index, highlighted)
+        if self._selected == old_index:
+            self._selected = new_index
+        elif self._selected is not None:
+            if old_index < self._selected <= new_index:
+                self._selected -= 1
+            elif new_index <= self._selected < old_index:
+                self._selected += 1
+        self._refresh_from(min(old_index, new_index))
+
+    def set(self, index, text, highlighted=None):
+        """Change the text (and optionally the highlight) of one row."""
+        self._items[index] = text
+        if highlighted is not None:
+            self._highlights[index] = highlighted
+        if self._top <= index < self._top + self._visible_rows():
+            self._render()
+
+    def _refresh_from(self, index):
+        """Redraw only if a change at index can affect the visible rows."""
+        if index < self._top + self._visible_rows():
+            self._render()
+        else:
+            self._update_scrollbar()
+
+    # ================== Rendering ================== #
+
+    def _visible_rows(self):
+        """Return how many rows fit in the listbox (plus a partly visible one)."""
+        height = self._listbox.winfo_height()
+        if height <= 1:
+            height = int(self._listbox.cget("height")) * self._row_height  # not mapped yet
+        return max(1, height // self._row_height + 1)
+
+    def _render(self):
+        """Put the visible window of rows into the listbox."""
+        rows = self._visible_rows()
+        self._top = max(0, min(self._top, len(self._items) - rows + 1))
+        window = self._items[self._top:self._top + rows]
+
+        self._listbox.delete(0, tk.END)
+        if window:
+            self._listbox.insert(0, *window)  # one Tk call for all visible rows
+        for offset, highlighted in enumerate(self._highlights[self._top:self._top + rows]):
+            if highlighted:
+                self._listbox.itemconfig(offset, bg=self._highlight_color)
+        if self._selected is not None and self._top <= self._selected < self._top + rows:
+            self._listbox.selection_set(self._selected - self._top)
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        """Show the position of the visible window in the full list."""
+        total = len(self._items)
+        if total == 0:
+            self._scrollbar.set(0.0, 1.0)
+            return
+        rows = self._visible_rows() - 1
+        self._scrollbar.set(self._top / total, min(1.0, (self._top + rows) / total))
+
+    def _set_top(self, top):
+        """Scroll to a new first visible row."""
+        top = max(0, min(top, len(self._items) - self._visible_rows() + 1))
+        if top != self._top:
+            self._top = top
+            self._render()
+
+    # ================== Event handlers ================== #
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        """Handle scrollbar drags ('moveto') and clicks ('scroll')."""
+        if action == "moveto":
+            self._set_top(int(float(amount) * len(self._items)))
+        elif action == "scroll":
+            step = self._visible_rows() - 1 if unit == "pages" else 1
+            self._set_top(self._top + int(amount) * step)
+
+    def _on_mousewheel(self, event):
+        """Scroll with the mouse wheel (Windows/macOS)."""
+        self._scroll_rows(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def _scroll_rows(self, rows):
+        """Scroll by a number of rows."""
+        self._set_top(self._top + rows)
+        return "break"
+
+    def _on_select(self, event):
+        """Translate a click in the listbox to a full-list index."""
+        selection = self._listbox.curselection()
+        if selection:
+            self._selected = self._top + selection[0]
+
+    def _move_selection(self, step):
+        """Move the selection with the arrow keys, scrolling when needed."""
+        if not self._items:
+            return "break"
+        current = self._selected if self._selected is not None else self._top - step
+        self.selection_set(max(0, min(current + step, len(self._items) - 1)))
+        self._listbox.event_generate("<<ListboxSelect>>")
+        return "break"
+
+
+# ================== Tracked Text ================== #
+
+class TrackedText(tk.Text):
+    """
+    Text widget that remembers which lines were changed.
+    Every insert/delete/replace (typing, pasting, code) goes through a proxy
+    command that widens a dirty line range, so expensive work like link
+    detection only needs to look at the changed lines.
+    """
+
+    def __init__(self, parent, **options):
+        super().__init__(parent, **options)
+        self._dirty_first = None  # first changed line (None = nothing changed)
+        self._dirty_last = None   # last changed line
+        self._change_count = 0  # edits so far (tells whether the content changed since a point)
+
+        # Route the widget's Tcl command through _proxy
+        self._original_command = self._w + "_original"
+        self.tk.call("rename", self._w, self._original_command)
+        self.tk.createcommand(self._w, self._proxy)
+
+    def destroy(self):
+        """Remove the proxy command before destroying the widget."""
+        self.tk.deletecommand(self._w)
+        self.tk.call("rename", self._original_command, self._w)
+        super().destroy()
+
+    def _proxy(self, command, *args):
+        """Run a widget command and record the lines it changes."""
+        if command in ("insert", "delete", "replace") and args:
+            self._change_count += 1
+            first_line = self._line_of(args[0])
+            if command in ("delete", "replace"):
+                # Before the edit: afterwards index2 may point into the new text
+                last_line = self._line_of(args[1]) if len(args) > 1 else first_line
+            result = self.tk.call((self._original_command, command) + args)
+            if command == "insert":
+                # insert index chars ?tags? chars ?tags? ...
+                added = sum(chars.count("\n") for chars in args[1::2])
+                self._mark_dirty(first_line, added)
+            elif command == "delete":
+                self._mark_dirty(first_line, -(last_line - first_line))
+            else:
+                # replace index1 index2 chars ?tags? ...: a delete, then an insert
+                added = sum(chars.count("\n") for chars in args[2::2])
+                self._mark_dirty(first_line, -(last_line - first_line))
+                self._mark_dirty(first_line, added)
+            return result
+        if command == "image" and args and args[0] == "create":
+            self._change_count += 1
+            self._mark_dirty(self._line_of(args[1]), 0)
+        return self.tk.call((self._original_command, command) + args)
+
+    def _line_of(self, index):
+        """Return the line number of a text index."""
+        return int(str(self.tk.call(self._original_command, "index", index)).split(".")[0])
+
+    def _mark_dirty(self, line, line_delta):
+        """
+        Widen the dirty range with an edit at line that added (or removed,
+        if negative) line_delta lines; lines after the edit shift with it.
+        """
+        last_changed = line + max(line_delta, 0)
+        if self._dirty_first is None:
+            self._dirty_first, self._dirty_last = line, last_changed
+            return
+        if self._dirty_last >= line:
+            self._dirty_last = max(line, self._dirty_last + line_delta)
+        self._dirty_first = min(self._dirty_first, line)
+        self._dirty_last = max(self._dirty_last, last_changed)
+
+    def get_change_count(self):
+        """Return the number of edits (inserts, deletes, embedded images) made so far."""
+        return self._change_count
+
+    def take_dirty_lines(self):
+        """Return (first, last) changed lines since the last call, or None."""
+        if self._dirty_first is None:
+            return None
+        dirty = (self._dirty_first, self._dirty_last)
+        self._dirty_first = self._dirty_last = None
+        return dirty
+
+    def retag_dirty_lines(self, tag, pattern):
+        """
+        Re-apply tag to the matches of pattern on the changed lines only.
+        Returns the number of lines scanned.
+        """
+        dirty = self.take_dirty_lines()
+        if dirty is None:
+            return 0
+        first, last = dirty
+        last = min(last, self._line_of("end-1c"))
+        if last < first:
+            return 0
+
+        start, end = f"{first}.0", f"{last}.end"
+        self.tag_remove(tag, start, end)
+        lines = self.get(start, end).split("\n")  # one Tk call for all changed lines
+        for offset, line_text in enumerate(lines):
+            for match in pattern.finditer(line_text):
+                line = first + offset
+                self.tag_add(tag, f"{line}.{match.start()}", f"{line}.{match.end()}")
+        return len(lines)
+
+
+# ================== Debug Overlay ================== #
+
+class DebugOverlay(tk.Toplevel):
+    """
+    Window showing what the app spent its time on (toggle with F12).
+    - Recent operations (all or only the slow ones) with their duration and
+      counters (Tk calls when NOTEAPP_DEBUG=1)
+    - Per-operation statistics: count, average and longest duration
+    - cProfile capture of the UI thread and export of the log as JSON
+    """
+
+    def __init__(self, parent, profiler, refresh_ms=1000):
+        super().__init__(parent)
+        self.title("NoteApp Debug")
+        self.geometry("620x520")
+        self._profiler = profiler
+        self._refresh_ms = refresh_ms
+        self._slow_only = tk.BooleanVar(value=True)
+        self._after_id = None  # pending refresh
+
+        buttons = tk.Frame(self)
+        buttons.pack(fill="x", padx=6, pady=4)
+        self._capture_btn = tk.Button(buttons, text="Start cProfile", command=self.toggle_capture)
+        self._capture_btn.pack(side="left")
+        tk.Button(buttons, text="Export Log", command=self.export_log).pack(side="left", padx=4)
+        tk.Button(buttons, text="Clear", command=self.clear).pack(side="left")
+        tk.Checkbutton(buttons, text=f"Slow only (>= {profiler.get_slow_ms()} ms)",
+                       variable=self._slow_only, command=self.refresh).pack(side="right")
+
+        self._stats_text = tk.Text(self, height=10, font=("Courier", 9), wrap="none")
+        self._stats_text.pack(fill="x", padx=6)
+        self._recent_text = tk.Text(self, font=("Courier", 9), wrap="none")
+        self._recent_text.pack(fill="both", expand=True, padx=6, pady=(4, 6))
+
+        self.protocol("WM_DELETE_WINDOW", self.hide)
+        self.refresh()
+
+    def refresh(self):
+        """Show the current statistics and recent operations (every refresh_ms while shown)."""
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+        lines = [f"{'operation':32} {'count':>7} {'avg ms':>10} {'max ms':>10}"]
+        for name, (count, avg, longest) in self._profiler.get_stats().items():
+            lines.append(f"{name:32} {count:7} {avg:10.2f} {longest:10.2f}")
+        counters = self._profiler.get_counters()
+        if counters:
+            lines.append("  ".join(f"{name}={value}" for name, value in counters.items()))
+        self._set_text(self._stats_text, "\n".join(lines))
+
+        lines = []
+        for span in self._profiler.recent(self._slow_only.get()):
+            clock = time.strftime("%H:%M:%S", time.localtime(span["end"]))
+            counters = " ".join(f"{name}={value}" for name, value in span["counters"].items())
+            lines.append(f"{clock} {span['name']:32} {span['ms']:10.2f} ms  {span['thread']:12} {counters}")
+        self._set_text(self._recent_text, "\n".join(lines) or "No operations recorded yet.")
+
+        if self.state() != "withdrawn":
+            self._after_id = self.after(self._refresh_ms, self.refresh)
+
+    def _set_text(self, text_widget, content):
+        """Replace the content of a read-only text area."""
+        text_widget.config(state="normal")
+        text_widget.delete("1.0", tk.END)
+        text_widget.insert("1.0", content)
+        text_widget.config(state="disabled")
+
+    def show(self):
+        """Bring the overlay to the front and restart the refreshes."""
+        self.deiconify()
+        self.lift()
+        self.refresh()
+
+    def hide(self):
+        """Hide the overlay (recording goes on)."""
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+        self.withdraw()
+
+    def toggle_capture(self):
+        """Start cProfile, or stop it and show (and optionally save) the report."""
+        if not self._profiler.is_capturing():
+            self._profiler.start_capture()
+            self._capture_btn.config(text="Stop cProfile")
+            return
+        path = filedialog.asksaveasfilename(parent=self, title="Save profile (optional)",
+                                            defaultextension=".prof", filetypes=[("Profile", "*.prof")])
+        report = self._profiler.stop_capture(path or None)
+        self._capture_btn.config(text="Start cProfile")
+        # Keep the report on screen until the overlay is shown again
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+        self._set_text(self._recent_text, report)
+
+    def export_log(self):
+        """Save statistics and recent operations as a JSON file."""
+        path = filedialog.asksaveasfilename(parent=self, title="Export Log",
+                                            defaultextension=".json", filetypes=[("JSON", "*.json")])
+        if not path:
+            return
+        try:
+            self._profiler.export_log(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to export log: {e}", parent=self)
+
+    def clear(self):
+        """Forget all recorded operations."""
+        self._profiler.clear()
+        self.refresh()
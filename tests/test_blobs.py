@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+from note_blobs import ImageStore
+
+
+@pytest.fixture
+def images(tmp_path):
+    return ImageStore(str(tmp_path / "images"))
+
+
+def picture(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def image_blocks(*paths):
+    return [{"type": "image", "path": path} for path in paths]
+
+
+# ================== Adding images ================== #
+
+def test_same_content_is_stored_once(tmp_path, images):
+    first = images.ingest(picture(tmp_path, "a.png", b"screenshot"))
+    second = images.ingest(picture(tmp_path, "copy of a.PNG", b"screenshot"))
+    other = images.ingest(picture(tmp_path, "b.png", b"another one"))
+    assert first == second != other
+    assert images.image_name(first) and os.path.isfile(first)
+    assert images.image_name(str(tmp_path / "a.png")) is None  # not in the store
+
+
+# ================== Reference counts ================== #
+
+def test_ref_counts_follow_the_notes(tmp_path, images):
+    shared = images.ingest(picture(tmp_path, "a.png", b"shared"))
+    own = images.ingest(picture(tmp_path, "b.png", b"own"))
+    images.set_note_images("n1", images.images_of(image_blocks(shared, own)))
+    images.set_note_images("n2", images.images_of(image_blocks(shared, shared, "C:/old/path.png")))
+    assert images.get_ref_count(shared) == 2
+    assert images.get_ref_count(own) == 1
+
+    images.set_note_images("n1", images.images_of(image_blocks(shared)))
+    images.release_note("n2")
+    assert images.get_ref_count(shared) == 1
+    assert images.get_ref_count(own) == 0
+
+    reopened = ImageStore(images.get_folder())  # counts are read back from refs.json
+    assert reopened.get_ref_count(shared) == 1
+
+
+# ================== Garbage collection ================== #
+
+def test_unreferenced_image_is_deleted_with_its_thumbnails(tmp_path, images):
+    path = images.ingest(picture(tmp_path, "a.png", b"pixels"))
+    images.set_note_images("n1", images.images_of(image_blocks(path)))
+    thumbnail = images.thumbnail_path(path, (64, 64))
+    os.makedirs(os.path.dirname(thumbnail))
+    open(thumbnail, "wb").close()
+
+    images.release_note("n1")
+    assert images.collect_garbage() == 1
+    assert not os.path.exists(path) and not os.path.exists(thumbnail)
+
+
+def test_image_used_by_another_note_is_kept(tmp_path, images):
+    path = images.ingest(picture(tmp_path, "a.png", b"pixels"))
+    images.set_note_images("n1", images.images_of(image_blocks(path)))
+    images.set_note_images("n2", images.images_of(image_blocks(path)))
+
+    images.release_note("n1")
+    assert images.collect_garbage() == 0
+    assert os.path.isfile(path)
+
+
+def test_unused_images_of_earlier_sessions_need_a_full_collection(tmp_path, images):
+    unused = images.ingest(picture(tmp_path, "a.png", b"never saved"))
+    assert images.collect_garbage() == 1  # added this session, no note uses it
+    assert not os.path.exists(unused)
+
+    left_behind = images.ingest(picture(tmp_path, "b.png", b"left by a crash"))
+    reopened = ImageStore(images.get_folder())
+    assert reopened.collect_garbage() == 0  # only this session's images are checked
+    assert reopened.rebuild([]) == 0
+    assert reopened.collect_garbage(everything=True) == 1
+    assert not os.path.exists(left_behind)
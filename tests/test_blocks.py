@@ -0,0 +1,110 @@
+import pytest
+
+from note_blocks import blocks_from_dump, editor_segments, normalize_blocks, split_text
+
+
+def text(content):
+    return {"type": "text", "content": content}
+
+
+def image(path):
+    return {"type": "image", "path": path}
+
+
+def link(url):
+    return {"type": "link", "url": url}
+
+
+# ================== Normalizing ================== #
+
+def test_adjacent_text_runs_are_merged():
+    blocks = [text("Hello "), text(""), text("world"), image("a.png"), text("after"), text("!")]
+    assert normalize_blocks(blocks) == [text("Hello world"), image("a.png"), text("after!")]
+
+
+def test_links_already_in_the_text_are_dropped():
+    url = "https://example.com/page"
+    blocks = [text(f"See {url} for more"), link(url), link(url), link("https://other.example")]
+    assert normalize_blocks(blocks) == [text(f"See {url} for more"), link("https://other.example")]
+
+
+def test_links_are_only_matched_with_text_between_the_same_images():
+    url = "https://example.com"
+    blocks = [text(url), image("a.png"), link(url)]
+    assert normalize_blocks(blocks) == blocks  # the link is not next to that text
+
+
+def test_normalizing_twice_changes_nothing():
+    blocks = normalize_blocks([text("a"), text("b"), link("https://x.example"), image("i.png"), text("")])
+    assert normalize_blocks(blocks) == blocks
+    assert blocks == [text("ab"), link("https://x.example"), image("i.png")]
+
+
+# ================== Editor dumps ================== #
+
+def test_tk_dump_becomes_blocks():
+    dump = [
+        ("mark", "insert", "1.0"),
+        ("text", "First line\n", "1.0"),
+        ("tagon", "link", "2.0"),
+        ("text", "https://example.com", "2.0"),
+        ("tagoff", "link", "2.19"),
+        ("text", "\n", "2.19"),
+        ("image", "img1", "3.0"),
+        ("image", "img_unknown", "3.1"),
+        ("text", "", "3.2"),
+        ("text", "after\n", "3.2"),
+    ]
+    assert blocks_from_dump(dump, {"img1": "notes_images/ab/abc.png"}) == [
+        text("First line\nhttps://example.com\n"),
+        image("notes_images/ab/abc.png"),
+        text("after\n"),
+    ]
+
+
+def test_links_removed_from_the_text_do_not_come_back():
+    # The editor never dumps link blocks: a URL deleted by the user is gone
+    before = blocks_from_dump([("text", "Go to https://example.com\n", "1.0")], {})
+    after = blocks_from_dump([("text", "Go to\n", "1.0")], {})
+    assert before == [text("Go to https://example.com\n")]
+    assert after == [text("Go to\n")]
+
+
+# ================== Editor segments ================== #
+
+def test_text_between_images_is_one_segment():
+    url = "https://example.com"
+    blocks = [text("Intro\n"), image("a.png"), text("middle "), link(url), image("missing.png"),
+              text(" end"), image("b.png")]
+    shown = {"a.png", "b.png"}
+    assert editor_segments(blocks, shown.__contains__) == [
+        ("text", "Intro\n"),
+        ("image", "a.png"),
+        ("text", f"middle {url}[Image not found: missing.png] end"),
+        ("image", "b.png"),
+    ]
+
+
+def test_no_blocks_give_no_segments():
+    assert editor_segments([], bool) == []
+    assert editor_segments([image("a.png"), image("b.png")], bool) == [("image", "a.png"), ("image", "b.png")]
+
+
+# ================== Splitting text ================== #
+
+def test_text_is_cut_after_a_newline():
+    assert split_text("one\ntwo\nthree", 9) == ["one\ntwo\n", "three"]
+    assert split_text("abcdefgh", 3) == ["abc", "def", "gh"]  # no newline: cut at size
+
+
+@pytest.mark.parametrize("text_value", ["abcdef", "ab\ncd\n", "ü中文😀" * 5, "\n" * 7])
+def test_pieces_are_never_longer_than_size_and_keep_the_text(text_value):
+    for size in (1, 2, 3, len(text_value)):
+        pieces = split_text(text_value, size)
+        assert "".join(pieces) == text_value
+        assert all(0 < len(piece) <= size for piece in pieces)
+
+
+def test_exact_size_is_one_piece():
+    assert split_text("abc", 3) == ["abc"]
+    assert split_text("", 3) == []
@@ -0,0 +1,192 @@
+import os
+import json
+
+import pytest
+
+from note_blobs import ImageStore
+from note_core import NoteLibrary, main
+from note_storage import JournalStore
+
+
+def open_library(tmp_path, store=None, lazy_load=True, on_error=None):
+    store = store or JournalStore(str(tmp_path / "notes_data.json"))
+    return NoteLibrary(store, lazy_load=lazy_load, on_error=on_error, images=ImageStore(str(tmp_path / "images")))
+
+
+def titles(notes):
+    return sorted(note.get_title() for note in notes)
+
+
+@pytest.fixture
+def saved_library(tmp_path):
+    """A data file with two folders, saved by the library."""
+    library = open_library(tmp_path)
+    library.load()
+    library.add_folder("Computer Science")
+    library.add_folder("Cooking")
+    library.add_note("Computer Science", "Operating System", tags=["kernel"])
+    library.add_note("Cooking", "Bread")
+    library.save_to_file()
+    library.close()
+    return tmp_path
+
+
+# ================== Loading ================== #
+
+@pytest.mark.parametrize("lazy_load", [True, False])
+def test_unchanged_notes_are_clean_after_loading(saved_library, lazy_load):
+    library = open_library(saved_library, lazy_load=lazy_load)
+    library.load()
+    assert not library.is_dirty()
+    assert library.get_dirty_folders() == []
+
+    note = library.list_notes("Cooking")[0]
+    library.update_note(note.get_id(), title="Rye bread")
+    library.save_to_file()
+    library.close()
+
+    reloaded = open_library(saved_library, lazy_load=lazy_load)
+    reloaded.load()
+    assert [note.get_title() for note in reloaded.list_notes("Cooking")] == ["Rye bread"]
+    assert reloaded.list_notes("Computer Science")[0].get_content_blocks() is not None
+    reloaded.close()
+
+
+# ================== Searching ================== #
+
+def test_search_falls_back_to_typos(saved_library):
+    library = open_library(saved_library)
+    library.load()
+    assert [note.get_title() for note in library.find_notes("Computer Science", "opertaing")] == ["Operating System"]
+    assert [note.get_title() for note in library.find_notes("Computer Science", "kernal")] == ["Operating System"]
+    assert library.find_folders("cook") == ["Cooking"]
+    assert library.find_folders("cokign") == ["Cooking"]
+
+    library.rename_folder("Cooking", "Baking")
+    assert library.find_folders("cokign") == []
+    assert library.find_folders("bakng") == ["Baking"]
+    library.delete_folder("Baking")
+    assert library.find_folders("bakng") == []
+    library.close()
+
+
+def test_empty_query_finds_nothing(tmp_path):
+    library = open_library(tmp_path)
+    library.load()
+    library.add_folder("A")
+    library.add_note("A", "First")
+    assert library.find_notes("A", "") == []
+    assert library.find_notes("A", "   ") == []
+    library.close()
+
+
+# ================== Tags ================== #
+
+def test_rename_tag_changes_only_the_notes_having_it(tmp_path):
+    library = open_library(tmp_path)
+    library.load()
+    library.add_folder("A")
+    library.add_folder("B")
+    first = library.add_note("A", "First", tags=["Lab", "Exam"])
+    second = library.add_note("B", "Second", tags=["Lab"])
+    third = library.add_note("B", "Third", tags=["Practice", "Lab"])
+    other = library.add_note("B", "Other", tags=["Todo"])
+
+    assert library.rename_tag("Lab", "Practice") == 3
+    assert first.get_tags() == ["Practice", "Exam"]
+    assert second.get_tags() == ["Practice"]
+    assert third.get_tags() == ["Practice"]  # merged, not doubled
+    assert other.get_tags() == ["Todo"]
+    assert library.get_tag_index().notes_with("Lab") == set()
+    assert titles(note for _, note in library.filter_notes_by_tags(["Practice"])) == ["First", "Second", "Third"]
+    library.close()
+
+    reloaded = open_library(tmp_path)
+    reloaded.load()
+    assert dict(reloaded.get_tag_index().counts()) == {"Practice": 3, "Exam": 1, "Todo": 1}
+    reloaded.close()
+
+
+def test_rename_of_unused_tag_changes_nothing(tmp_path):
+    library = open_library(tmp_path)
+    library.load()
+    library.add_folder("A")
+    library.add_note("A", "First", tags=["Lab"])
+    assert library.rename_tag("Missing", "Lab") == 0
+    assert dict(library.get_tag_index().counts()) == {"Lab": 1}
+    library.close()
+
+
+# ================== Saving ================== #
+
+class FlakyStore(JournalStore):
+    """JournalStore whose full saves fail until fail is cleared."""
+    fail = True
+
+    def compact(self, folders_data):
+        if self.fail:
+            raise OSError("disk full")
+        return super().compact(folders_data)
+
+
+def test_failed_batch_save_is_retried_on_close(tmp_path):
+    store = FlakyStore(str(tmp_path / "notes_data.json"))
+    errors = []
+    library = open_library(tmp_path, store=store, on_error=errors.append)
+    library.load()
+    with library.batch():
+        library.add_folder("A")
+        library.add_note("A", "Only in the full save")
+    assert len(errors) == 1
+
+    store.fail = False
+    library.close()
+    reloaded = open_library(tmp_path)
+    reloaded.load()
+    assert [note.get_title() for note in reloaded.list_notes("A")] == ["Only in the full save"]
+    reloaded.close()
+
+
+# ================== Read-only commands ================== #
+
+def write_old_data_file(tmp_path):
+    """Write a data file from before notes had ids (loading it normally migrates it)."""
+    path = tmp_path / "notes_data.json"
+    path.write_text(json.dumps({"A": [{"type": "note", "title": "Old kernel", "tags": [], "content_blocks": []}]}))
+    return path
+
+
+def test_read_only_load_does_not_migrate(tmp_path):
+    path = write_old_data_file(tmp_path)
+    before = path.read_bytes()
+
+    library = open_library(tmp_path, store=JournalStore(str(path), read_only=True))
+    library.load(read_only=True)
+    library.close()
+    assert library.is_migration_pending()
+    assert path.read_bytes() == before
+    assert sorted(os.listdir(tmp_path)) == ["notes_data.json"]
+
+    library = open_library(tmp_path)
+    library.load()
+    library.close()
+    assert not library.is_migration_pending()
+    assert path.read_bytes() != before
+
+
+def test_read_only_commands_write_nothing(tmp_path, monkeypatch, capsys):
+    write_old_data_file(tmp_path)
+    settings = tmp_path / "settings.json"
+    settings.write_text(json.dumps({"storage": "sqlite", "images": str(tmp_path / "images")}))
+    monkeypatch.chdir(tmp_path)
+    before = sorted(os.listdir(tmp_path))
+
+    assert main(["--settings", str(settings), "list", "A"]) == 0
+    assert main(["--settings", str(settings), "search", "kernel"]) == 0
+    assert "Old kernel" in capsys.readouterr().out
+    assert sorted(os.listdir(tmp_path)) == before  # no database imported, no ids saved
+
+    text_file = tmp_path / "lecture.txt"
+    text_file.write_text("Threads")
+    assert main(["--settings", str(settings), "import", "--folder", "A", str(text_file)]) == 0
+    assert "notes_data.db" in os.listdir(tmp_path)  # commands that write import the data file first
@@ -0,0 +1,46 @@
+from note_instance import SingleInstance
+
+
+def test_second_copy_finds_the_running_instance(tmp_path):
+    first = SingleInstance("app", str(tmp_path))
+    assert first.acquire()
+    lock = tmp_path / "app.lock"
+    assert len(lock.read_text().split()) == 2  # written before it appeared
+
+    second = SingleInstance("app", str(tmp_path))
+    assert not second.acquire()
+
+    first.release()
+    assert not lock.exists()
+    assert second.acquire()
+    second.release()
+
+
+def test_stale_lock_is_replaced(tmp_path):
+    (tmp_path / "app.lock").write_text("1 1")  # nobody listens on port 1
+    instance = SingleInstance("app", str(tmp_path))
+    assert instance.acquire()
+    instance.release()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_lock_without_hard_links(tmp_path, monkeypatch):
+    def no_link(source, target):
+        raise PermissionError("hard links are not supported")
+
+    monkeypatch.setattr("note_instance.os.link", no_link)
+    first = SingleInstance("app", str(tmp_path))
+    assert first.acquire()
+    assert len((tmp_path / "app.lock").read_text().split()) == 2
+    assert not SingleInstance("app", str(tmp_path)).acquire()
+    first.release()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_lock_folder_is_the_data_folder(tmp_path, monkeypatch):
+    from note_storage import data_folder
+
+    monkeypatch.chdir(tmp_path)
+    assert data_folder({"storage": "json"}) == str(tmp_path)
+    assert data_folder({"storage": "sqlite", "database": str(tmp_path / "db" / "notes.db")}) == str(tmp_path / "db")
+    assert data_folder({"storage": "shards", "shards": "data/notes.shards"}) == str(tmp_path / "data")
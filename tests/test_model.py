@@ -0,0 +1,107 @@
+from note_model import TAGS, Note
+from note_storage import BodyCache
+
+
+class SavedNotes:
+    """Stand-in for the store: returns saved notes and counts the reads."""
+
+    def __init__(self, notes):
+        self.notes = {note["id"]: note for note in notes}
+        self.reads = 0
+
+    def read_saved_note(self, note_id):
+        self.reads += 1
+        return self.notes[note_id]
+
+
+def note_data(note_id="n1"):
+    return {
+        "type": "note",
+        "id": note_id,
+        "title": "Week 3",
+        "content_blocks": [
+            {"type": "text", "content": "Kernel notes\n"},
+            {"type": "image", "path": "images/ab12.png"},
+            {"type": "link", "url": "https://example.com"},
+            {"type": "text", "content": "styled", "tags": ["bold"]},  # not one of the compact layouts
+        ],
+        "tags": ["Lecture", "Exam"],
+        "link": ["https://example.com/slides"],
+    }
+
+
+# ================== Serialization ================== #
+
+def test_to_dict_from_dict_round_trip():
+    data = note_data()
+    note = Note.from_dict(data)
+    assert note.to_dict() == data
+    assert note.get_id() == "n1"
+
+
+def test_missing_fields_get_defaults():
+    note = Note.from_dict({"title": "Old"})
+    data = note.to_dict()
+    assert data["content_blocks"] == [] and data["tags"] == [] and data["link"] == []
+    assert note.get_id()  # notes saved without an id get a new one
+
+
+def test_getters_return_copies():
+    note = Note.from_dict(note_data())
+    note.get_content_blocks()[0]["content"] = "changed"
+    note.get_link().append("https://other.example")
+    assert note.to_dict() == note_data()
+
+
+def test_to_dict_without_content():
+    data = Note.from_dict(note_data()).to_dict(with_content=False)
+    assert "content_blocks" not in data and data["tags"] == ["Lecture", "Exam"]
+
+
+# ================== Tag interning ================== #
+
+def test_tags_are_stored_once():
+    first = Note("a")
+    second = Note("b")
+    first.set_tags(["Practice", "Tips"])
+    second.set_tags(["".join(["Prac", "tice"])])  # equal but a different string object
+    assert first.get_tag_ids()[0] == second.get_tag_ids()[0] == TAGS.find("Practice")
+    assert first.get_tags()[0] is second.get_tags()[0]
+
+
+def test_unknown_tag_is_not_registered_by_find():
+    assert TAGS.find("never-used-tag") is None
+    assert TAGS.id_of("never-used-tag") == TAGS.find("never-used-tag")
+
+
+# ================== Lazy body ================== #
+
+def test_unloaded_body_is_read_again_on_access():
+    store = SavedNotes([note_data()])
+    note = Note.from_dict(note_data())
+    note.set_body_ref((0, 100), BodyCache(store))
+    note.unload_content()
+    assert not note.is_content_loaded()
+    assert note.get_content_blocks() == note_data()["content_blocks"]
+    assert note.is_content_loaded() and store.reads == 1
+
+
+def test_body_cache_unloads_least_recently_used():
+    store = SavedNotes([note_data("n1"), note_data("n2")])
+    cache = BodyCache(store, max_loaded=1)
+    first = Note.from_dict(note_data("n1"))
+    second = Note.from_dict(note_data("n2"))
+    first.set_body_ref((0, 100), cache)
+    second.set_body_ref((100, 100), cache)
+    first.get_content_blocks()
+    second.get_content_blocks()
+    assert not first.is_content_loaded() and second.is_content_loaded()
+
+
+def test_edited_body_stays_loaded():
+    note = Note.from_dict(note_data())
+    note.set_body_ref((0, 100), BodyCache(SavedNotes([])))
+    note.set_content_blocks([{"type": "text", "content": "new"}])
+    note.unload_content()  # no saved copy of the edit, so nothing is dropped
+    assert note.is_content_loaded()
+    assert note.get_body_ref() is None and note.is_dirty()
@@ -0,0 +1,348 @@
+import pytest
+
+from note_search import FuzzyIndex, InvertedIndex, SearchScheduler, TagIndex, allows_typos, edit_distance, is_refinement
+
+
+@pytest.fixture
+def index():
+    """Index of three small documents (title, tags, text, link URLs)."""
+    index = InvertedIndex()
+    index.add("os", ["Operating System", "kernel", "The kernel schedules every process.", ""])
+    index.add("net", ["Networks", "tcp", "Packets go through a router; the kernel sends them.", ""])
+    index.add("cook", ["Bread", "", "Knead the dough, then operate the oven.", "http://bread.example"])
+    return index
+
+
+# ================== Full-text index ================== #
+
+def test_words_are_and_ed(index):
+    assert index.search("kernel") == {"os", "net"}
+    assert index.search("kernel process") == {"os"}
+    assert index.search("Kernel PROCESS") == {"os"}
+    assert index.search("missing") == set()
+
+
+def test_prefix_queries(index):
+    assert index.search("oper*") == {"os", "cook"}
+    assert index.search("pack*") == {"net"}
+    assert index.search("*") == set()
+
+
+def test_phrase_queries(index):
+    assert index.search('"operating system"') == {"os"}
+    assert index.search('"system operating"') == set()
+    assert index.search('"kernel sends"') == {"net"}
+    # Phrases never span two fields (title "Operating System" + tags "kernel")
+    assert index.search('"system kernel"') == set()
+
+
+def test_or_and_not_queries(index):
+    assert index.search("bread OR networks") == {"cook", "net"}
+    assert index.search("kernel -tcp") == {"os"}
+    assert index.search("kernel NOT tcp") == {"os"}
+    assert index.search("kernel -tcp OR dough") == {"os", "cook"}
+
+
+def test_documents_are_updated_incrementally(index):
+    index.add("os", ["Operating System", "", "Now about memory pages.", ""])  # re-indexed
+    assert index.search("process") == set()
+    assert index.search("memory") == {"os"}
+
+    index.remove("net")
+    index.remove("missing")
+    assert len(index) == 2
+    assert "net" not in index
+    assert index.search("pack*") == set()
+    assert index.search("kernel") == set()
+
+
+def test_saved_data_round_trip(index):
+    data = index.to_data({"os": "id-os", "cook": "id-cook"})  # "net" is not saved
+    assert [doc[0] for doc in data["docs"]] == ["id-os", "id-cook"]
+
+    loaded = InvertedIndex()
+    loaded.load_data(data, {"id-os": "os", "id-cook": "cook"})
+    assert len(loaded) == 2
+    for query in ("kernel", "oper*", '"operating system"', "dough OR process", "kernel -tcp"):
+        assert loaded.search(query) == index.search(query) - {"net"}
+    assert [key for key, _ in loaded.rank("kernel")] == ["os"]
+
+    loaded.remove("os")  # loaded documents can be updated like added ones
+    assert loaded.search("kernel") == set()
+
+
+def test_saved_data_of_another_version_is_ignored(index):
+    data = dict(index.to_data({"os": "id-os"}), version=-1)
+    loaded = InvertedIndex()
+    loaded.load_data(data, {"id-os": "os"})
+    assert len(loaded) == 0
+
+
+# ================== Ranked search ================== #
+
+def make_note(note_id, title, text, tags=()):
+    return {"type": "note", "id": note_id, "title": title, "tags": list(tags), "link": [],
+            "content_blocks": [{"type": "text", "content": text}]}
+
+
+RANKED_NOTES = [
+    make_note("title", "Kernel basics", "An introduction."),
+    make_note("text", "Misc", "Some words, then the kernel once."),
+    make_note("other", "Bread", "Flour and water."),
+]
+
+
+def ranked_index():
+    index = InvertedIndex()
+    for note in RANKED_NOTES:
+        index.add(note["id"], [note["title"], " ".join(note["tags"]), note["content_blocks"][0]["content"], ""])
+    return index
+
+
+def test_bm25_ranks_title_matches_first():
+    ranked = ranked_index().rank("kernel")
+    assert [key for key, _ in ranked] == ["title", "text"]
+    assert ranked[0][1] > ranked[1][1] > 0
+    assert ranked_index().rank("kernel", limit=1) == ranked[:1]
+
+
+def test_bm25_prefers_rare_words():
+    index = ranked_index()
+    index.add("both", ["Both", "", "kernel flour", ""])
+    ranked = dict(index.rank("kernel OR flour"))
+    # 'flour' is in fewer notes than 'kernel', so it adds more to the score
+    assert ranked["other"] > ranked["text"]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("-kernel", []),
+    ("NOT kernel", []),
+    ("flour OR -kernel", ["other"]),
+    ("kernel -basics", ["text"]),
+])
+def test_exclusions_rank_the_same_in_both_backends(tmp_path, query, expected):
+    from note_sqlite import SQLiteStore
+
+    store = SQLiteStore(str(tmp_path / "notes.db"))
+    store.compact({"A": [dict(note) for note in RANKED_NOTES]})
+    try:
+        assert [key for key, _ in store.search(query)] == expected
+    finally:
+        store.close()
+    assert [key for key, _ in ranked_index().rank(query)] == expected
+
+
+def test_exclusions_alone_still_filter_unranked_search():
+    assert ranked_index().search("-kernel") == {"other"}
+
+
+# ================== Live search ================== #
+
+class FakeEntry:
+    """Entry stand-in: holds the text and runs after() callbacks when told to."""
+
+    def __init__(self):
+        self.text = ""
+        self.pending = {}
+        self._next_id = 0
+
+    def get(self):
+        return self.text
+
+    def after(self, ms, callback):
+        self._next_id += 1
+        self.pending[self._next_id] = callback
+        return self._next_id
+
+    def after_cancel(self, after_id):
+        self.pending.pop(after_id, None)
+
+    def run_pending(self):
+        callbacks, self.pending = list(self.pending.values()), {}
+        for callback in callbacks:
+            callback()
+
+
+class KeyEvent:
+    def __init__(self, keysym):
+        self.keysym = keysym
+
+
+def make_scheduler(search):
+    entry = FakeEntry()
+    shown = []
+    scheduler = SearchScheduler(entry, search, lambda query, results: shown.append((query, results)))
+    return entry, scheduler, shown
+
+
+def test_is_refinement():
+    assert is_refinement("ker", "kern")
+    assert is_refinement("Ker", "kernel")
+    assert not is_refinement("kern", "ker")
+    assert not is_refinement("kernel", "kernel OR disk")
+    assert not is_refinement("kernel", "kernel -disk")
+    assert not is_refinement("", "kernel")
+
+
+def test_refined_query_searches_only_the_previous_results():
+    calls = []
+
+    def search(query, candidates):
+        calls.append((query, candidates))
+        words = ["kernel", "kettle", "kernels"]
+        return [word for word in (candidates if candidates is not None else words) if word.startswith(query)]
+
+    entry, scheduler, shown = make_scheduler(search)
+    entry.text = "ke"
+    scheduler.run_now()
+    entry.text = "ker"
+    scheduler.run_now()
+    entry.text = "k"  # broader: searches everything again
+    scheduler.run_now()
+
+    assert calls == [("ke", None), ("ker", ["kernel", "kettle", "kernels"]), ("k", None)]
+    assert shown[1] == ("ker", ["kernel", "kernels"])
+
+
+def test_keystrokes_are_coalesced_and_non_text_keys_ignored():
+    calls = []
+    entry, scheduler, shown = make_scheduler(lambda query, candidates: calls.append(query) or [])
+
+    for keysym in ("Shift_L", "Left", "Escape"):
+        scheduler.on_key(KeyEvent(keysym))
+    assert entry.pending == {}
+
+    for text in ("o", "op", "ope"):
+        entry.text = text
+        scheduler.on_key(KeyEvent(text[-1]))
+    assert len(entry.pending) == 1  # earlier searches were cancelled
+    entry.run_pending()
+    assert calls == ["ope"]
+
+    scheduler.on_key(KeyEvent("e"))  # text did not change
+    entry.run_pending()
+    assert calls == ["ope"]
+
+    entry.text = ""
+    scheduler.run_now()
+    assert shown[-1] == ("", None)  # empty box: show everything
+
+
+def test_refined_query_still_finds_typos(tmp_path):
+    from note_blobs import ImageStore
+    from note_core import NoteLibrary
+    from note_storage import JournalStore
+
+    library = NoteLibrary(JournalStore(str(tmp_path / "notes_data.json")), images=ImageStore(str(tmp_path / "images")))
+    library.load()
+    library.add_folder("A")
+    library.add_note("A", "Operating System")
+    library.add_note("A", "Opera tickets")
+
+    entry, scheduler, shown = make_scheduler(lambda query, candidates: library.find_notes("A", query, candidates))
+    entry.text = "opera"
+    scheduler.run_now()
+    entry.text = "operat"  # refinement: only "Operating System" is left
+    scheduler.run_now()
+    entry.text = "operatnig"  # a typo: no exact match among the previous results
+    scheduler.run_now()
+    library.close()
+
+    assert [[note.get_title() for note in results] for _, results in shown] == [
+        ["Operating System", "Opera tickets"], ["Operating System"], ["Operating System"]]
+
+
+# ================== Tag index ================== #
+
+@pytest.fixture
+def tags():
+    tag_index = TagIndex()
+    tag_index.add("n1", ["Lecture", "Exam"])
+    tag_index.add("n2", ["Lecture", "Lab", "Lecture"])
+    tag_index.add("n3", ["Todo"])
+    return tag_index
+
+
+def test_tag_counts_and_lookup(tags):
+    assert len(tags) == 4
+    assert tags.counts() == [("Lecture", 2), ("Exam", 1), ("Lab", 1), ("Todo", 1)]
+    assert tags.notes_with("Lecture") == {"n1", "n2"}
+    assert tags.notes_with("Missing") == set()
+    assert sorted(tags.tags_matching("LA")) == ["Lab"]
+
+
+def test_tag_filter_all_and_any(tags):
+    assert tags.filter(["Lecture", "Exam"]) == {"n1"}
+    assert tags.filter(["Exam", "Todo"]) == set()
+    assert tags.filter(["Exam", "Todo"], match_all=False) == {"n1", "n3"}
+    assert tags.filter(["Lecture", "Missing"]) == set()
+    assert tags.filter([]) == set()
+
+
+def test_tags_are_reindexed_and_removed(tags):
+    tags.add("n1", ["Exam"])
+    assert tags.notes_with("Lecture") == {"n2"}
+    tags.remove("n3")
+    tags.remove("n3")  # not indexed any more: ignored
+    assert "Todo" not in dict(tags.counts())
+    tags.add("n2", [])
+    assert tags.counts() == [("Exam", 1)]
+
+
+def test_renamed_tags_merge_into_an_existing_tag(tags):
+    assert tags.renamed_tags("n2", "Lab", "Practice") == ["Lecture", "Practice"]
+    assert tags.renamed_tags("n1", "Exam", "Lecture") == ["Lecture"]
+    assert tags.renamed_tags("unknown", "Exam", "Lecture") == []
+
+
+# ================== Fuzzy search ================== #
+
+def test_edit_distance_counts_a_swap_as_one_typo():
+    assert edit_distance("opertaing", "operating", 2) == 1
+    assert edit_distance("kernal", "kernel", 1) == 1
+    assert edit_distance("graph", "paragraph", 2) is None
+    assert edit_distance("sys", "system", 1, prefix=True) == 0
+    assert edit_distance("sytem", "systems", 1, prefix=True) == 1
+
+
+def test_fuzzy_search_finds_near_misses():
+    index = FuzzyIndex()
+    index.add(1, "Operating System kernel")
+    index.add(2, "Cooking recipes")
+    index.add(3, "Operations research")
+
+    assert index.search("opertaing") == [(1, 1)]
+    assert index.search("opertaing sys") == [(1, 1)]  # last word is a prefix
+    assert index.search("recipse") == [(2, 1)]
+    assert index.search("xyzzy") == []
+
+
+def test_fuzzy_index_follows_renames_and_removals():
+    index = FuzzyIndex()
+    index.add("a", "Operating System")
+    index.add("b", "Networks")
+    index.add("a", "Databases")  # renamed
+
+    assert index.search("opertaing") == []
+    assert index.search("databse") == [("a", 1)]
+    assert len(index) == 2
+
+    index.remove("a")
+    index.remove("missing")
+    assert index.search("databse") == []
+    assert "a" not in index and "b" in index
+
+
+def test_fuzzy_index_drops_unused_trigrams():
+    index = FuzzyIndex()
+    index.add(1, "alpha")
+    index.remove(1)
+    assert index._words_by_trigram == {} and index._keys_by_word == {}
+
+
+def test_queries_with_operators_or_short_words_allow_no_typos():
+    assert allows_typos("opertaing")
+    assert not allows_typos("os")
+    assert not allows_typos('"operating system"')
+    assert not allows_typos("kernel -disk")
+    assert not allows_typos("kernel OR disk")
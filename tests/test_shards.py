@@ -0,0 +1,71 @@
+import os
+
+from note_shards import ShardedStore
+
+
+def make_note(note_id, title="Note", text="body"):
+    return {"type": "note", "id": note_id, "title": title, "tags": ["t"], "link": [],
+            "content_blocks": [{"type": "text", "content": text}]}
+
+
+def titles(data):
+    return {folder: [note["title"] for note in notes] for folder, notes in data.items()}
+
+
+def test_put_rename_delete_round_trip(tmp_path):
+    path = str(tmp_path / "shards")
+    store = ShardedStore(path)
+    store.add_folder("A")
+    store.put_note("A", make_note("1", "one"))
+    store.put_note("A", make_note("2", "two"))
+    store.put_note("A", make_note("1", "uno"))  # edited notes keep their place
+    store.add_folder("B")
+    store.put_note("B", make_note("3", "three"))
+    store.rename_folder("A", "C")
+    store.delete_note("C", "2")
+
+    assert titles(ShardedStore(path).load()) == {"B": ["three"], "C": ["uno"]}
+
+    store.delete_folder("B")
+    reloaded = ShardedStore(path)
+    assert titles(reloaded.load()) == {"C": ["uno"]}
+    assert reloaded.read_saved_note("1")["content_blocks"] == [{"type": "text", "content": "body"}]
+
+
+def test_lazy_load_reads_bodies_on_demand(tmp_path):
+    path = str(tmp_path / "shards")
+    ShardedStore(path).compact({"A": [make_note("1", "one", "first"), make_note("2", "two", "second")]})
+
+    store = ShardedStore(path)
+    data = store.load(lazy=True)
+    assert all("content_blocks" not in note and "ref" in note for note in data["A"])
+    assert store.has_saved_note("2")
+    assert store.read_saved_note("2")["content_blocks"][0]["content"] == "second"
+
+
+def test_saving_a_note_rewrites_only_its_shard(tmp_path):
+    path = tmp_path / "shards"
+    store = ShardedStore(str(path))
+    store.compact({"A": [make_note("1")], "B": [make_note("2")]})
+    before = {name: (path / name).read_bytes() for name in os.listdir(path)}
+
+    store.put_note("A", make_note("1", "edited"))
+    store.rename_folder("B", "C")
+    changed = {name for name in os.listdir(path) if (path / name).read_bytes() != before.get(name)}
+    assert len(changed) == 3  # the shard of A, its index and the manifest
+    assert "manifest.json" in changed
+    assert titles(ShardedStore(str(path)).load()) == {"A": ["edited"], "C": ["Note"]}
+
+
+def test_compact_copies_saved_notes(tmp_path):
+    path = str(tmp_path / "shards")
+    store = ShardedStore(path)
+    store.compact({"A": [make_note("1", "one")], "B": [make_note("2", "two")]})
+    store.load()
+
+    saved = {"type": "note", "id": "1", "title": "one", "tags": ["t"], "link": [], "saved": True}
+    store.compact({"A": [saved], "B": [make_note("2", "changed")]})
+
+    data = ShardedStore(path).load()
+    assert titles(data) == {"A": ["one"], "B": ["changed"]}
+    assert data["A"][0]["content_blocks"] == [{"type": "text", "content": "body"}]
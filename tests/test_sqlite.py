@@ -0,0 +1,152 @@
+import os
+import json
+import sqlite3
+
+import pytest
+
+from note_sqlite import SQLiteStore, export_json, fts_query, import_json
+from note_storage import JournalStore
+
+
+def make_note(note_id, title="Note", text="body", tags=()):
+    return {"type": "note", "id": note_id, "title": title, "tags": list(tags), "link": [],
+            "content_blocks": [{"type": "text", "content": text}]}
+
+
+def reload(path):
+    """Read the database through a new connection."""
+    reopened = SQLiteStore(path)
+    try:
+        return reopened.load()
+    finally:
+        reopened.close()
+
+
+@pytest.fixture
+def store(tmp_path):
+    sqlite_store = SQLiteStore(str(tmp_path / "notes.db"))
+    yield sqlite_store
+    sqlite_store.close()
+
+
+# ================== Schema ================== #
+
+def test_schema_is_created_on_open(tmp_path):
+    path = str(tmp_path / "notes.db")
+    SQLiteStore(path).close()
+    connection = sqlite3.connect(path)
+    names = {row[0] for row in connection.execute("SELECT name FROM sqlite_master")}
+    connection.close()
+    assert {"meta", "folders", "notes", "blocks", "tags", "note_tags", "sidecars", "notes_fts"} <= names
+
+    assert reload(path) == {}  # existing tables are kept
+
+
+def test_read_only_database_rejects_writes(store):
+    store.put_note("A", make_note("1", "Kernel"))
+    reader = SQLiteStore(store.get_path(), read_only=True)
+    try:
+        assert [note["title"] for note in reader.load()["A"]] == ["Kernel"]
+        with pytest.raises(sqlite3.OperationalError):
+            reader.put_note("A", make_note("2"))
+    finally:
+        reader.close()
+
+
+def test_missing_database_is_not_created_read_only(tmp_path):
+    with pytest.raises(sqlite3.OperationalError):
+        SQLiteStore(str(tmp_path / "notes.db"), read_only=True)
+    assert os.listdir(tmp_path) == []
+
+
+# ================== Writes ================== #
+
+def test_notes_and_folders_round_trip(store):
+    styled = {"type": "text", "content": "bold", "style": "b"}
+    note = make_note("1", "Kernel", tags=["Lecture", "Exam"])
+    note["content_blocks"] += [{"type": "image", "path": "images/ab.png"}, styled]
+    note["link"] = ["https://example.com"]
+    store.add_folder("A")
+    store.add_folder("B")
+    store.put_note("A", note)
+    store.put_note("A", make_note("2", "Second"))
+    store.put_note("A", make_note("1", "Kernel 2"))  # edited notes keep their place
+    store.rename_folder("B", "C")
+
+    data = reload(store.get_path())
+    assert list(data) == ["A", "C"]
+    assert [saved["title"] for saved in data["A"]] == ["Kernel 2", "Second"]
+    assert data["C"] == []
+
+    store.put_note("A", note)
+    assert reload(store.get_path())["A"][0] == note
+    assert store.read_saved_note("1") == {"content_blocks": note["content_blocks"]}
+
+
+def test_deletes_remove_notes_and_search_entries(store):
+    store.put_note("A", make_note("1", "Kernel"))
+    store.put_note("B", make_note("2", "Kernel threads"))
+    store.delete_note("A", "1")
+    assert not store.has_saved_note("1")
+    assert [note_id for note_id, _ in store.search("kernel")] == ["2"]
+
+    store.delete_folder("B")
+    assert store.search("kernel") == []
+    assert store.load() == {"A": []}
+
+
+def test_lazy_load_reads_bodies_per_note(store):
+    store.put_note("A", make_note("1", text="later"))
+    note = store.load(lazy=True)["A"][0]
+    assert "content_blocks" not in note and "ref" in note
+    assert store.read_saved_note("1")["content_blocks"] == [{"type": "text", "content": "later"}]
+
+
+# ================== Query translation ================== #
+
+@pytest.mark.parametrize("query, expected", [
+    ("kernel", '("kernel")'),
+    ("Kernel Memory", '("kernel" AND "memory")'),
+    ("kern*", '("kern"*)'),
+    ('"virtual memory"', '("virtual memory")'),
+    ("kernel OR thread", '("kernel") OR ("thread")'),
+    ("kernel -thread", '(("kernel") NOT ("thread"))'),
+    ("-thread", ""),
+    ("", ""),
+])
+def test_fts_query(query, expected):
+    assert fts_query(query) == expected
+
+
+# ================== Import / export ================== #
+
+def test_import_and_export_json(tmp_path):
+    json_path = str(tmp_path / "notes_data.json")
+    old_note = {"type": "note", "title": "No id", "tags": [], "link": [], "content_blocks": []}
+    with open(json_path, "w", encoding="utf-8") as file:
+        json.dump({"A": [make_note("1", "Kernel")], "B": [old_note]}, file)
+
+    db_path = str(tmp_path / "notes.db")
+    assert import_json(json_path, db_path) == 2
+    store = SQLiteStore(db_path)
+    data = store.load()
+    assert [note["title"] for note in data["A"]] == ["Kernel"]
+    assert data["B"][0]["id"]  # notes saved without an id get one
+    assert [note_id for note_id, _ in store.search("kernel")] == ["1"]
+    store.close()
+
+    out_path = str(tmp_path / "exported.json")
+    assert export_json(db_path, out_path) == 2
+    assert JournalStore(out_path).load() == data
+
+
+def test_storage_command_converts_both_ways(tmp_path):
+    from note_storage import main
+
+    json_path = str(tmp_path / "notes_data.json")
+    JournalStore(json_path).compact({"A": [make_note("1", "Kernel")]})
+    db_path = str(tmp_path / "notes.db")
+    assert main(["to-db", "--file", json_path, "--db", db_path]) == 0
+    out_path = str(tmp_path / "back.json")
+    assert main(["from-db", "--file", out_path, "--db", db_path]) == 0
+    assert JournalStore(out_path).load() == JournalStore(json_path).load()
@@ -0,0 +1,235 @@
+import io
+import json
+
+import pytest
+
+from note_storage import JournalStore, JsonStream, WriteBehind, iter_folder_items
+
+
+def make_note(note_id, title="Note", text="body"):
+    return {"type": "note", "id": note_id, "title": title, "tags": [], "link": [],
+            "content_blocks": [{"type": "text", "content": text}]}
+
+
+# ================== Journal ================== #
+
+def test_journal_records_are_replayed_on_the_snapshot(tmp_path):
+    path = str(tmp_path / "notes_data.json")
+    store = JournalStore(path)
+    store.load()
+    store.compact({"A": [make_note("1", "one")]})
+    store.put_note("A", make_note("1", "uno"))
+    store.put_note("A", make_note("2", "two"))
+    store.add_folder("B")
+    store.rename_folder("B", "C")
+    store.delete_note("A", "2")
+
+    data = JournalStore(path).load()
+    assert list(data) == ["A", "C"]
+    assert [note["title"] for note in data["A"]] == ["uno"]
+    assert data["C"] == []
+
+
+def test_journal_of_another_snapshot_is_ignored(tmp_path):
+    path = str(tmp_path / "notes_data.json")
+    store = JournalStore(path)
+    store.load()
+    store.compact({"A": [make_note("1", "one")]})
+    store.put_note("A", make_note("1", "journaled"))
+
+    # Snapshot replaced without the journal (e.g. compaction interrupted after the rename)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"A": [make_note("1", "snapshot")]}, file)
+
+    data = JournalStore(path).load()
+    assert [note["title"] for note in data["A"]] == ["snapshot"]
+
+
+def test_torn_journal_record_is_cut_off(tmp_path):
+    path = str(tmp_path / "notes_data.json")
+    store = JournalStore(path)
+    store.load()
+    store.compact({"A": []})
+    store.put_note("A", make_note("1", "kept"))
+    with open(store.get_journal_path(), "ab") as file:
+        file.write(b'{"op": "put", "folder": "A"')  # crash while appending
+
+    reloaded = JournalStore(path)
+    assert [note["title"] for note in reloaded.load()["A"]] == ["kept"]
+    reloaded.put_note("A", make_note("2", "after"))
+    assert [note["title"] for note in JournalStore(path).load()["A"]] == ["kept", "after"]
+
+
+def test_compaction_folds_the_journal_into_the_snapshot(tmp_path):
+    path = str(tmp_path / "notes_data.json")
+    store = JournalStore(path, max_records=3)
+    store.load()
+    for number in range(3):
+        store.put_note("A", make_note(str(number)))
+    assert store.needs_compaction()
+
+    store.compact(store.load())
+    assert not store.needs_compaction()
+    with open(store.get_journal_path(), "rb") as file:
+        assert len(file.readlines()) == 1  # only the header
+    assert [note["id"] for note in JournalStore(path).load()["A"]] == ["0", "1", "2"]
+
+
+def test_full_load_can_copy_saved_notes(tmp_path):
+    path = str(tmp_path / "notes_data.json")
+    store = JournalStore(path)
+    store.load()
+    store.compact({"A": [make_note("1"), make_note("2")]})
+
+    reloaded = JournalStore(path)
+    reloaded.load(lazy=False)
+    assert reloaded.has_saved_note("1") and reloaded.has_saved_note("2")
+    assert reloaded.read_saved_note("2")["id"] == "2"
+
+
+def test_read_only_store_leaves_the_journal_as_it_is(tmp_path):
+    path = str(tmp_path / "notes_data.json")
+    store = JournalStore(path)
+    store.load()
+    store.compact({"A": []})
+    store.put_note("A", make_note("1", "kept"))
+    with open(store.get_journal_path(), "ab") as file:
+        file.write(b'{"op": "put", "folder": "A"')  # torn record
+    with open(store.get_journal_path(), "rb") as file:
+        before = file.read()
+
+    reader = JournalStore(path, read_only=True)
+    assert [note["title"] for note in reader.load()["A"]] == ["kept"]
+    with open(store.get_journal_path(), "rb") as file:
+        assert file.read() == before
+    with pytest.raises(OSError):
+        reader.put_note("A", make_note("2"))
+    with pytest.raises(OSError):
+        reader.compact({})
+
+    # A stale journal (another snapshot) is skipped, not reset
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"A": []}, file)
+    assert JournalStore(path, read_only=True).load() == {"A": []}
+    with open(store.get_journal_path(), "rb") as file:
+        assert file.read() == before
+
+
+# ================== Streaming JSON ================== #
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64])
+def test_json_stream_values_across_chunks(chunk_size):
+    data = {"Folder é": [{"n": 12345, "s": "ü" * 20}, [1.5, True, None]], "": [], "x": ["中文"]}
+    raw = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    stream = JsonStream(io.BytesIO(raw), chunk_size=chunk_size)
+
+    read = {}
+    for folder, item in iter_folder_items(stream):
+        if item is None:
+            read[folder] = []
+        else:
+            read[folder].append(item)
+    assert read == data
+
+
+def test_json_stream_reports_broken_data():
+    stream = JsonStream(io.BytesIO(b'{"A": [{"id": 1}, {"id": '), chunk_size=4)
+    with pytest.raises(ValueError):
+        list(iter_folder_items(stream))
+
+
+# ================== Write-behind ================== #
+
+def test_coalesce_keeps_tasks_replaced_by_a_full_save():
+    put = ("put", "A", "1", make_note("1"))
+    delete = ("del", "A", "2")
+    later = ("put", "A", "3", make_note("3"))
+    tasks = WriteBehind._coalesce([put, delete, ("compact", {}, None), later])
+
+    assert [task[0] for task, _, _ in tasks] == ["compact", "put"]
+    assert tasks[0][2] == [put, delete]  # written only if the full save fails
+    assert tasks[1][2] == []
+
+
+def test_coalesce_writes_repeated_saves_once():
+    first = ("put", "A", "1", make_note("1", "first"))
+    last = ("put", "A", "1", make_note("1", "last"))
+    other = ("put", "A", "2", make_note("2"))
+    tasks = [task for task, _, _ in WriteBehind._coalesce([first, other, last])]
+    assert tasks == [last, other]
+
+
+class FakeWidget:
+    """Stands in for the Tk widget WriteBehind polls with."""
+
+    def after(self, ms, callback):
+        pass
+
+
+class FailingStore(JournalStore):
+    """JournalStore whose full saves fail (e.g. disk full)."""
+
+    def compact(self, folders_data):
+        raise OSError("disk full")
+
+
+class IdleThread:
+    """Thread that never starts: the test runs the writer loop itself."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def start(self):
+        pass
+
+
+def test_failed_full_save_journals_the_replaced_changes(tmp_path, monkeypatch):
+    path = str(tmp_path / "notes_data.json")
+    JournalStore(path).compact({"A": [make_note("1", "one")]})
+    store = FailingStore(path)
+    store.load()
+    errors = []
+    monkeypatch.setattr("note_storage.threading.Thread", IdleThread)
+    writer = WriteBehind(store, FakeWidget(), on_error=errors.append)
+    writer.put_note("A", make_note("1", "edited"))
+    writer.compact({"A": []})
+    writer._tasks.put(None)
+    writer._run()  # one batch: the edit is coalesced into the failing full save
+    writer._deliver()
+
+    assert [str(error) for error in errors] == ["disk full"]
+    assert [note["title"] for note in JournalStore(path).load()["A"]] == ["edited"]
+
+
+# ================== Compact format ================== #
+
+def test_compact_data_file_normalizes_notes_and_adds_ids(tmp_path):
+    from note_storage import compact_data_file
+
+    path = tmp_path / "notes_data.json"
+    old_note = {"type": "note", "title": "Old", "tags": [], "link": [], "content_blocks": [
+        {"type": "text", "content": "a "}, {"type": "text", "content": "http://x.example"},
+        {"type": "link", "url": "http://x.example"}]}
+    path.write_text(json.dumps({"A": [old_note]}, indent=4), encoding="utf-8")
+
+    before, after, new_path = compact_data_file(str(path))
+    assert new_path == str(path) and after < before
+    note = JournalStore(str(path)).load()["A"][0]
+    assert note["id"]
+    assert note["content_blocks"] == [{"type": "text", "content": "a http://x.example"}]
+
+
+def test_msgpack_snapshot_is_chosen_when_present(tmp_path, monkeypatch):
+    import note_storage
+
+    monkeypatch.chdir(tmp_path)
+    assert note_storage.find_data_file() == "notes_data.json"
+    (tmp_path / "notes_data.msgpack").write_bytes(b"")
+    (tmp_path / "notes_data.json").write_text("{}")
+    assert note_storage.find_data_file() == "notes_data.msgpack"
+
+    # Without the package the .msgpack file is not silently skipped
+    monkeypatch.setattr(note_storage, "msgpack", None)
+    assert note_storage.find_data_file() == "notes_data.msgpack"
+    with pytest.raises(ImportError):
+        JournalStore("notes_data.msgpack")
@@ -0,0 +1,80 @@
+from note_widgets import TrackedText
+
+
+class FakeTextCommand:
+    """
+    Plain-Python stand-in for the Tcl command of a Text widget (no display needed):
+    index, insert, delete and replace on 'line.char', 'line.end', 'end' and 'end-1c'.
+    """
+
+    def __init__(self, text):
+        self.text = text
+
+    def call(self, *args):
+        if len(args) == 1:
+            args = args[0]  # tk.call((command, ...)) form
+        _, command, *rest = args
+        if command == "index":
+            return self._index(rest[0])
+        if command == "insert":
+            at = self._offset(rest[0])
+            chars = "".join(rest[1::2])
+            self.text = self.text[:at] + chars + self.text[at:]
+        elif command == "delete":
+            start = self._offset(rest[0])
+            end = self._offset(rest[1]) if len(rest) > 1 else start + 1
+            self.text = self.text[:start] + self.text[end:]
+        elif command == "replace":
+            start, end = self._offset(rest[0]), self._offset(rest[1])
+            self.text = self.text[:start] + "".join(rest[2::2]) + self.text[end:]
+        return ""
+
+    def _index(self, index):
+        offset = self._offset(index)
+        before = self.text[:offset]
+        return f"{before.count(chr(10)) + 1}.{len(before) - before.rfind(chr(10)) - 1}"
+
+    def _offset(self, index):
+        lines = self.text.split("\n")
+        if index in ("end", "end-1c"):
+            return len(self.text)
+        line, char = index.split(".")
+        line = min(int(line), len(lines))
+        start = sum(len(text) + 1 for text in lines[:line - 1])
+        return start + (len(lines[line - 1]) if char == "end" else min(int(char), len(lines[line - 1])))
+
+
+def make_text(text):
+    widget = object.__new__(TrackedText)  # no Tk window: only the proxy logic
+    widget.tk = FakeTextCommand(text)
+    widget._original_command = "text_original"
+    widget._dirty_first = widget._dirty_last = None
+    widget._change_count = 0
+    return widget
+
+
+TEN_LINES = "\n".join(f"line {number}" for number in range(1, 11))
+
+
+def test_insert_and_delete_mark_the_changed_lines():
+    text = make_text(TEN_LINES)
+    text._proxy("insert", "2.0", "a\nb\n")
+    assert text.take_dirty_lines() == (2, 4)
+    text._proxy("delete", "2.0", "4.0")
+    assert text.take_dirty_lines() == (2, 2)
+    assert text.tk.text == TEN_LINES
+    assert text.get_change_count() == 2
+
+
+def test_multi_line_replace_marks_the_new_lines():
+    text = make_text(TEN_LINES)
+    text._proxy("replace", "3.0", "end-1c", "a\nb")  # 8 lines become 2
+    assert text.tk.text.split("\n")[2:] == ["a", "b"]
+    assert text.take_dirty_lines() == (3, 4)
+
+
+def test_replace_shifts_earlier_dirty_lines():
+    text = make_text(TEN_LINES)
+    text._proxy("insert", "9.0", "x")
+    text._proxy("replace", "2.0", "6.0", "new\n")  # lines 2-5 become one line: line 9 is now 6
+    assert text.take_dirty_lines() == (2, 6)